@@ -4,7 +4,8 @@ Main application file
 """
 import streamlit as st
 from modules import ui_components
-from modules.tts_engine import TTSEngine
+from modules.async_tts_engine import create_tts_engine
+from modules.tts_engine import TrackGenerationError
 from modules.audio_player import render_audio_player
 from modules.cache_inspector import render_cache_inspector
 
@@ -61,20 +62,32 @@ def _handle_auto_play_next():
         st.session_state.current_track = next_track
 
 
-def _generate_track_audio_cached(text, voice, api_key):
+def _generate_tracks_audio_cached(texts, voice, api_key):
     """
-    Wrapper for audio generation with session-level statistics tracking
+    Batch wrapper: one cache pass for all texts, synthesis only for misses,
+    with per-item session-level statistics tracking
+
+    Raises:
+        TrackGenerationError: If any track could not be generated (the
+            others are in its results)
     """
-    tts_engine = TTSEngine(api_key=api_key)
-    audio_bytes, duration, cache_hit = tts_engine.generate_audio(text, voice)
+    tts_engine = create_tts_engine(api_key=api_key)
+    try:
+        results = tts_engine.generate_many(texts, voice)
+    except TrackGenerationError as e:
+        # The other tracks were still served or synthesized
+        _record_session_stats([result[2] for result in e.results if result is not None])
+        raise
 
-    # Update session-level stats (more reliable than cache manager stats)
-    if cache_hit:
-        st.session_state.session_cache_hits = st.session_state.get('session_cache_hits', 0) + 1
-    else:
-        st.session_state.session_api_calls = st.session_state.get('session_api_calls', 0) + 1
+    _record_session_stats([cache_hit for _, _, cache_hit in results])
+    return results
 
-    return audio_bytes, duration, cache_hit
+
+def _record_session_stats(cache_hits):
+    """Update session-level hit/API-call counters from per-item results"""
+    hits = sum(1 for hit in cache_hits if hit)
+    st.session_state.session_cache_hits = st.session_state.get('session_cache_hits', 0) + hits
+    st.session_state.session_api_calls = st.session_state.get('session_api_calls', 0) + len(cache_hits) - hits
 
 
 def render_upload_screen():
@@ -120,7 +133,7 @@ def render_upload_screen():
 
     with tab5:
         # Cache Inspector tab (API key not required for viewing cache)
-        tts_engine = TTSEngine(api_key=st.session_state.get('api_key'))
+        tts_engine = create_tts_engine(api_key=st.session_state.get('api_key'))
         render_cache_inspector(tts_engine)
 
 
@@ -146,7 +159,7 @@ def render_player_screen():
         return
 
     # Initialize TTS engine (needed for actions)
-    tts_engine = TTSEngine(api_key=st.session_state.get('api_key'))
+    tts_engine = create_tts_engine(api_key=st.session_state.get('api_key'))
 
     # Track info
     current_idx = st.session_state.current_track
@@ -189,49 +202,63 @@ def render_player_screen():
         else:
             # Need to load audio - try cache first, then generate
             # Initialize TTS engine (API key optional for cache access)
-            tts_engine = TTSEngine(api_key=st.session_state.get('api_key'))
+            tts_engine = create_tts_engine(api_key=st.session_state.get('api_key'))
 
             audio_bytes_list = []
             cache_hits_list = []
             all_cached = True
 
             with st.spinner(f"Loading audio for {max_tracks_to_load} tracks..."):
-                for i, t in enumerate(tracks_to_load):
-                    try:
-                        # Try to load from cache or generate
-                        audio_bytes, duration, cache_hit = _generate_track_audio_cached(
-                            text=t['english'],
-                            voice=selected_voice,
-                            api_key=st.session_state.get('api_key')
-                        )
-                        audio_bytes_list.append(audio_bytes)
-                        cache_hits_list.append(cache_hit)
-                        if not cache_hit:
-                            all_cached = False
-
-                        # Show cache status for current track only
-                        if i == current_idx and cache_hit:
-                            st.sidebar.success("✅ Loaded from cache")
-
-                    except Exception as e:
-                        error_msg = str(e)
-                        if "No API key" in error_msg or "API key required" in error_msg:
-                            # API key missing and cache miss
-                            st.error(f"⚠️ No cached audio for track {i+1}: \"{t['english'][:50]}...\"")
-                            st.error("Please enter your Google Cloud TTS API key in the sidebar to generate new audio.")
-                            st.info("💡 Tip: Previously generated tracks are cached and can be played without an API key.")
-                            return
-                        else:
-                            st.error(f"Error loading track {i+1}: {error_msg}")
-                            return
-
-                # Successfully loaded all tracks
+                failed = {}
+                try:
+                    # One cache pass for all tracks, then generate the misses
+                    results = _generate_tracks_audio_cached(
+                        texts=[t['english'] for t in tracks_to_load],
+                        voice=selected_voice,
+                        api_key=st.session_state.get('api_key')
+                    )
+                except TrackGenerationError as e:
+                    # Play the tracks that did load; failed ones are skipped
+                    results = e.results
+                    failed = e.errors
+                    i = e.index
+                    t = tracks_to_load[i]
+                    error_msg = str(e)
+                    if "No API key" in error_msg or "API key required" in error_msg:
+                        # API key missing and cache miss
+                        st.error(f"⚠️ No cached audio for track {i+1}: \"{t['english'][:50]}...\"")
+                        st.error("Please enter your Google Cloud TTS API key in the sidebar to generate new audio.")
+                        st.info("💡 Tip: Previously generated tracks are cached and can be played without an API key.")
+                    else:
+                        st.error(f"Error loading track {i+1}: {error_msg}")
+                        st.info("💡 Tracks that did load are cached; try again shortly for the rest.")
+                    if len(failed) > 1:
+                        st.error(f"{len(failed) - 1} more tracks could not be loaded.")
+                    if len(failed) == len(results):
+                        return
+
+                for i, result in enumerate(results):
+                    if result is None:
+                        audio_bytes_list.append(None)
+                        continue
+                    audio_bytes, duration, cache_hit = result
+                    audio_bytes_list.append(audio_bytes)
+                    cache_hits_list.append(cache_hit)
+                    if not cache_hit:
+                        all_cached = False
+
+                    # Show cache status for current track only
+                    if i == current_idx and cache_hit:
+                        st.sidebar.success("✅ Loaded from cache")
+
                 cache_hits_count = sum(1 for hit in cache_hits_list if hit)
                 cache_misses_count = len(cache_hits_list) - cache_hits_count
 
-                # Save to session cache
-                st.session_state.loaded_audio_cache = audio_bytes_list
-                st.session_state.loaded_audio_cache_key = current_cache_key
+                # Save to session cache once every track loaded; otherwise
+                # the failed ones are retried on the next run
+                if not failed:
+                    st.session_state.loaded_audio_cache = audio_bytes_list
+                    st.session_state.loaded_audio_cache_key = current_cache_key
 
                 # Save batch summary
                 st.session_state.batch_load_summary = {
@@ -302,7 +329,7 @@ def main():
 
     # Voice selection (only if API key present - requires API call)
     if st.session_state.get('api_key'):
-        tts_engine = TTSEngine(api_key=st.session_state.get('api_key'))
+        tts_engine = create_tts_engine(api_key=st.session_state.get('api_key'))
         ui_components.render_voice_selection(tts_engine)
         st.sidebar.markdown("---")
 
@@ -310,12 +337,16 @@ def main():
     st.sidebar.markdown("### 💾 Cache Stats")
 
     # Initialize TTS engine for cache access (no API key needed)
-    tts_engine = TTSEngine(api_key=st.session_state.get('api_key'))
+    tts_engine = create_tts_engine(api_key=st.session_state.get('api_key'))
     stats = tts_engine.get_cache_stats()
 
     st.sidebar.metric("Cached Items", stats['items'])
     st.sidebar.metric("Cache Size", f"{stats['size_mb']:.1f} MB / {stats['max_size_mb']} MB")
     st.sidebar.progress(stats['usage_percent'] / 100)
+    st.sidebar.caption(
+        f"L1 (memory) hits {stats['l1_hit_rate']:.1f}% · "
+        f"L2 (disk) hits {stats['l2_hit_rate']:.1f}%"
+    )
 
     # Session statistics (primary source of truth)
     st.sidebar.markdown("---")
@@ -0,0 +1,218 @@
+"""
+Asyncio variant of the TTS engine
+API calls are coroutines on a non-blocking HTTP client; cache I/O runs in
+worker threads so it never blocks the event loop
+"""
+import asyncio
+import os
+import threading
+
+from modules.cache_keys import canonical_text
+from modules.tts_engine import SynthesisError, TTSEngine
+from utils.async_http import NETWORK_ERRORS, get_shared_async_http_client
+
+
+class AsyncTTSEngine(TTSEngine):
+    """TTSEngine whose generate_audio, generate_many and get_available_voices are coroutines
+
+    Requests go through the running loop's shared AsyncHttpClient (kept-alive
+    connections, no thread per request), and cache lookups and writes
+    through asyncio.to_thread. The cache, negative cache, rate limits and
+    revalidator are the same process-wide ones TTSEngine uses; background
+    refreshes of stale entries still run on the revalidator's thread.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Client of the loop this engine last ran on (for get_cache_stats)
+        self.async_http = None
+
+    def _client(self):
+        self.async_http = get_shared_async_http_client()
+        return self.async_http
+
+    async def generate_audio(self, text, voice='en-US-Standard-F', language_code='en-US'):
+        """
+        Generate audio from text (see TTSEngine.generate_audio)
+
+        Returns:
+            tuple: (audio_bytes, duration, cache_hit)
+        """
+        cache_key = self._generate_cache_key(text, voice, language_code)
+
+        cached = await asyncio.to_thread(
+            self.cache.get, cache_key, fallback=self._legacy_cache_key(text, voice),
+            tenant=self.tenant
+        )
+        if cached:
+            if cached.get('stale'):
+                self._revalidate(cache_key, text, voice, language_code)
+            return cached['audio'], cached['duration'], True
+
+        text = canonical_text(text)
+        audio_bytes, duration = await self._synthesize_key_async(
+            cache_key, text, voice, language_code
+        )
+
+        await asyncio.to_thread(
+            self.cache.set, cache_key, self._cache_value(text, voice, audio_bytes, duration),
+            tenant=self.tenant
+        )
+
+        return audio_bytes, duration, False
+
+    async def generate_many(self, texts, voice='en-US-Standard-F', language_code='en-US'):
+        """
+        Generate audio for many texts (see TTSEngine.generate_many)
+
+        Misses are requested concurrently, up to max_workers at a time.
+
+        Returns:
+            list: (audio_bytes, duration, cache_hit) per text, in order
+
+        Raises:
+            TrackGenerationError: If any text could not be generated
+        """
+        keys, fallbacks = self._batch_keys(texts, voice, language_code)
+        cached = await asyncio.to_thread(
+            self.cache.get_many, keys, fallbacks=fallbacks, tenant=self.tenant
+        )
+        misses = self._batch_misses(texts, keys, cached, voice, language_code)
+
+        synthesized, failed = {}, {}
+        try:
+            await self._synthesize_many_async(misses, voice, language_code, synthesized, failed)
+        finally:
+            await asyncio.to_thread(self.cache.set_many, synthesized, tenant=self.tenant)
+
+        return self._batch_results(keys, cached, synthesized, failed)
+
+    async def _synthesize_many_async(self, misses, voice, language_code, synthesized, failed):
+        """Coroutine version of TTSEngine._synthesize_many"""
+        limit = asyncio.Semaphore(self.max_workers)
+
+        async def synthesize(key, text):
+            async with limit:
+                try:
+                    audio_bytes, duration = await self._synthesize_key_async(
+                        key, text, voice, language_code
+                    )
+                except Exception as e:
+                    failed[key] = e
+                    return
+            synthesized[key] = self._cache_value(text, voice, audio_bytes, duration)
+
+        await asyncio.gather(*(synthesize(key, text) for key, text in misses.items()))
+
+    async def _synthesize_key_async(self, key, text, voice, language_code):
+        """Coroutine version of TTSEngine._synthesize_key"""
+        self._raise_remembered_failure(key)
+        try:
+            return await self._synthesize_async(text, voice, language_code)
+        except SynthesisError as e:
+            self._remember_failure(key, e)
+            raise
+
+    async def _synthesize_async(self, text, voice, language_code):
+        """Coroutine version of TTSEngine._synthesize"""
+        url, data = self._synthesize_request(text, voice, language_code)
+
+        # Wait for our turn under the request and character quotas
+        await asyncio.sleep(self.rate_limiter.reserve(len(text)))
+
+        try:
+            response = await self._client().post(url, json=data)
+            return self._synthesize_result(response, text)
+
+        except NETWORK_ERRORS as e:
+            raise SynthesisError(f"Network error: {str(e) or type(e).__name__}") from e
+        except Exception as e:
+            raise SynthesisError(
+                f"TTS generation failed: {str(e)}",
+                status_code=getattr(e, 'status_code', None),
+                retry_after=getattr(e, 'retry_after', None)
+            ) from e
+
+    async def get_available_voices(self, language_code='en'):
+        """
+        Fetch available voices (see TTSEngine.get_available_voices)
+
+        Returns:
+            list: List of voice dictionaries
+        """
+        if not self.api_key:
+            return []
+
+        try:
+            response = await self._client().get(self._voices_url(language_code))
+
+            if response.status_code != 200:
+                print(f"Error fetching voices: {response.status_code}")
+                return []
+
+            return self._parse_voices(response.json())
+
+        except Exception as e:
+            print(f"Error fetching voices: {e}")
+            return []
+
+    def get_cache_stats(self):
+        """Cache statistics, with the async client's request stats as 'http'"""
+        stats = super().get_cache_stats()
+        if self.async_http is not None:
+            stats['http'] = self.async_http.get_stats()
+        return stats
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    """Process-wide event loop running the engines behind SyncTTSEngine"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='tts-event-loop', daemon=True).start()
+        return _loop
+
+
+def run_sync(coroutine):
+    """Run a coroutine on the background loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coroutine, _background_loop()).result()
+
+
+class SyncTTSEngine:
+    """Blocking facade over an AsyncTTSEngine, with TTSEngine's interface
+
+    Calls from any number of Streamlit script threads run concurrently on
+    one background event loop, so waiting on the API ties up no threads
+    of its own. Everything other than the three coroutines (cache, tenant,
+    get_cache_stats, ...) is the engine's, for reading and assigning.
+    """
+
+    def __init__(self, *args, **kwargs):
+        object.__setattr__(self, 'engine', AsyncTTSEngine(*args, **kwargs))
+
+    def generate_audio(self, *args, **kwargs):
+        return run_sync(self.engine.generate_audio(*args, **kwargs))
+
+    def generate_many(self, *args, **kwargs):
+        return run_sync(self.engine.generate_many(*args, **kwargs))
+
+    def get_available_voices(self, *args, **kwargs):
+        return run_sync(self.engine.get_available_voices(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.engine, name, value)
+
+
+def create_tts_engine(**kwargs):
+    """TTSEngine, or with TTS_ENGINE=async a SyncTTSEngine (same interface)"""
+    if os.environ.get('TTS_ENGINE') == 'async':
+        return SyncTTSEngine(**kwargs)
+    return TTSEngine(**kwargs)
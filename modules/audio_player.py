@@ -259,6 +259,15 @@ def render_audio_player(audio_bytes_list, tracks, current_track_idx, show_downlo
       }}
 
 
+      // Next track with audio from i on (tracks that failed to load are null)
+      function playableFrom(i) {{
+        for (let step = 0; step < tracks.length; step++) {{
+          const j = (i + step) % tracks.length;
+          if (tracks[j]) return j;
+        }}
+        return -1;
+      }}
+
       function loadTrack(i) {{
         if (i < 0 || i >= tracks.length || !tracks[i]) return;
         index = i;
@@ -274,7 +283,7 @@ def render_audio_player(audio_bytes_list, tracks, current_track_idx, show_downlo
       }}
 
       // 초기 로드
-      loadTrack({current_track_idx});
+      loadTrack(playableFrom({current_track_idx}));
 
       btn.onclick = () => playCurrent();
 
@@ -291,7 +300,7 @@ def render_audio_player(audio_bytes_list, tracks, current_track_idx, show_downlo
           playCurrent();
         }} else {{
           // ✅ 전체 반복(다음 곡) - 마지막에서도 첫 번째로 돌아감
-          loadTrack((index + 1) % tracks.length);
+          loadTrack(playableFrom((index + 1) % tracks.length));
           playCurrent();
         }}
       }});
@@ -2,57 +2,325 @@
 Cache Inspector UI for debugging and validation
 Provides tools to view, inspect, and manage cached TTS audio
 """
+import sqlite3
 import streamlit as st
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from modules.storage import StorageManager
+
+# Entries listed per page
+PAGE_SIZE = 20
+
+SORT_OPTIONS = {
+    'Last accessed': 'last_accessed',
+    'Created': 'created_at',
+    'Size': 'size'
+}
+
+
+def _reset_page():
+    st.session_state['cache_page'] = 0
+
+
+def _change_page(delta):
+    st.session_state['cache_page'] = max(0, st.session_state.get('cache_page', 0) + delta)
+
+
+def _bulk_delete_filters(tts_engine, voice, older_than, newer_than, min_size_kb, search, unused):
+    """delete_matching arguments for the bulk delete form (0 / empty = no filter)
+
+    Returns None, after showing an error, if the "not in any saved
+    playlist" filter is on and the saved playlists can't be read.
+    """
+    now = datetime.now()
+    keep = None
+    if unused:
+        try:
+            texts = StorageManager().list_track_texts()
+        except (sqlite3.Error, ValueError, KeyError) as e:
+            st.error(f"❌ Can't read saved playlists, nothing was deleted: {e}")
+            return None
+        voices = [voice] if voice else tts_engine.cache.voices()
+        keep = tts_engine.cache_keys(texts, voices)
+    return {
+        'voice': voice,
+        'created_before': now - timedelta(days=older_than) if older_than else None,
+        'created_after': now - timedelta(days=newer_than) if newer_than else None,
+        'min_size': int(min_size_kb * 1024) if min_size_kb else None,
+        'search': search.strip() or None,
+        'keep': keep
+    }
 
 
 def render_cache_inspector(tts_engine):
-    """Render cache inspection and management UI"""
+    """Render cache inspection and management UI
+
+    Everything shown comes from the cache index; audio is never loaded.
+    """
     st.markdown("### 🔍 Cache Inspector")
 
-    # Get cache index
-    cache_index = tts_engine.cache.index
+    stats = tts_engine.get_cache_stats()
 
-    if not cache_index:
+    if not stats['items']:
         st.info("Cache is empty")
         return
 
-    st.markdown(f"**Total cached items**: {len(cache_index)}")
+    st.markdown(f"**Total cached items**: {stats['items']}")
+
+    # Hit rates per tier (L1 = shared memory, L2 = disk)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("L1 Hit Rate", f"{stats['l1_hit_rate']:.1f}%")
+    with col2:
+        st.metric("L2 Hit Rate", f"{stats['l2_hit_rate']:.1f}%")
+    with col3:
+        st.metric("L1 Memory", f"{stats['l1_size_mb']:.1f} / {stats['l1_max_mb']:.0f} MB")
 
-    # Sort by last accessed (most recent first)
-    sorted_items = sorted(
-        cache_index.items(),
-        key=lambda x: x[1]['last_accessed'],
-        reverse=True
+    # Shared remote backend behind the disk cache, if configured
+    remote = stats['remote']
+    if remote is not None:
+        status = "connected" if remote['available'] else "unavailable, retrying"
+        st.caption(
+            f"Remote cache {remote['url']} ({status}): "
+            f"{stats['remote_hit_rate']:.1f}% of requests served remotely, "
+            f"{remote['errors']} errors"
+        )
+
+    # Freshness: stale entries are still served, and refreshed in the
+    # background when a session has an API key
+    freshness = tts_engine.cache.freshness_counts()
+    stale_count = freshness['stale']
+    revalidation = stats['revalidation']
+    st.caption(
+        f"Freshness: {freshness['fresh']} fresh, {stale_count} stale "
+        f"(older than {stats['ttl_days']} days, served until {stats['hard_ttl_days']} days); "
+        f"{revalidation['refreshed']} refreshed, {revalidation['pending']} refresh pending"
     )
+    if stale_count and not tts_engine.api_key:
+        st.caption("Add an API key to refresh stale entries when they are played")
+
+    # Failed requests remembered so repeats don't call the API again
+    failures = stats['failures']
+    if failures['permanent'] or failures['transient']:
+        st.caption(
+            f"Remembered failures: {failures['permanent']} permanent (bad input), "
+            f"{failures['transient']} transient (quota, server or network); "
+            f"{failures['hits']} repeat requests failed fast"
+        )
+
+    # Usage per tenant (sessions are partitioned by a hash of their API key)
+    tenants = stats['tenants']
+    if tenants:
+        with st.expander(f"👥 Usage by tenant ({len(tenants)})"):
+            rows = []
+            for tenant, usage in tenants.items():
+                requests = usage['hits'] + usage['misses']
+                rows.append({
+                    'Tenant': f"{tenant} (you)" if tenant == tts_engine.tenant else tenant,
+                    'Entries': usage['items'],
+                    'Size (MB)': round(usage['size_mb'], 1),
+                    'Quota used': f"{usage['quota_percent']:.0f}%",
+                    'Hit rate': f"{usage['hits'] / requests * 100:.1f}%" if requests else "-"
+                })
+            st.table(rows)
+            st.caption(
+                f"Quota {stats['tenant_quota_mb']:.0f} MB per tenant; shared entries count "
+                f"for every tenant using them. {stats['quota_evictions']} entries released "
+                f"by tenants over quota."
+            )
 
-    # Display cached items (top 20)
-    st.markdown("**Recently accessed cache entries** (showing top 20):")
-
-    for cache_key, metadata in sorted_items[:20]:
-        # Load cache data to get text preview (don't track in stats)
-        cached_data = tts_engine.cache.get(cache_key, track_stats=False)
-
-        if cached_data:
-            text_preview = cached_data.get('text_preview', 'N/A')
-            voice = cached_data.get('voice', 'N/A')
-            size_kb = metadata['size'] / 1024
-            created = metadata['created_at'].strftime('%Y-%m-%d %H:%M')
-            accessed = metadata['last_accessed'].strftime('%Y-%m-%d %H:%M')
-
-            with st.expander(f"📝 {text_preview[:50]}..."):
-                st.text(f"Text: {text_preview}")
-                st.text(f"Voice: {voice}")
-                st.text(f"Size: {size_kb:.1f} KB")
-                st.text(f"Created: {created}")
-                st.text(f"Last accessed: {accessed}")
-                st.text(f"Cache key: {cache_key[:16]}...")
-
-                # Delete button
-                if st.button("🗑️ Delete", key=f"delete_{cache_key}"):
-                    tts_engine.cache.delete(cache_key)
-                    st.success("Deleted from cache")
-                    st.rerun()
+    # Latency percentiles and I/O counters
+    metrics = stats['metrics']
+    with st.expander("⏱️ Latency & I/O"):
+        # Cache operations, then API calls (connect = TCP + TLS handshake)
+        http = stats['http']
+        latencies = list(metrics['latency'].items()) + [
+            ('api_request', http['request']),
+            ('api_connect', http['handshake'])
+        ]
+        rows = [
+            {
+                'Operation': op,
+                'Count': summary['count'],
+                'Mean (ms)': round(summary['mean_ms'], 3),
+                'p50 (ms)': summary['p50_ms'],
+                'p95 (ms)': summary['p95_ms'],
+                'p99 (ms)': summary['p99_ms']
+            }
+            for op, summary in latencies if summary['count']
+        ]
+        if rows:
+            st.table(rows)
+        st.text(f"Read from disk: {metrics['bytes_read'] / (1024 * 1024):.1f} MB")
+        st.text(f"Written to disk: {metrics['bytes_written'] / (1024 * 1024):.1f} MB")
+        if http['requests']:
+            st.text(
+                f"API requests: {http['requests']} over {http['connections']} connections "
+                f"({http['errors']} network errors)"
+            )
+            limits = stats['rate_limit']
+            st.text(
+                f"Rate limits: {limits['requests_per_second']} requests/s, "
+                f"{limits['chars_per_minute']} characters/min; {limits['throttled']} requests "
+                f"waited {limits['wait_seconds']:.1f} s in total"
+            )
+        st.text(
+            f"Evictions: {metrics['evictions']} "
+            f"(policy: {stats['eviction_policy']}, {stats['rejected']} entries not admitted)"
+        )
+        segments = stats['segments']
+        if segments['segments']:
+            st.text(
+                f"Storage: {stats['storage']}; {segments['segments']} segment files, "
+                f"{segments['size_mb']:.1f} MB (live entries: {stats['size_mb']:.1f} MB)"
+            )
+        st.caption("Percentiles are bucket upper bounds (powers of two in µs)")
+
+    # Browse entries a page at a time; search and sorting run in the index
+    st.markdown("**Cache entries**")
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        search = st.text_input(
+            "Search text", key='cache_search', on_change=_reset_page,
+            placeholder="Any part of the text"
+        )
+    with col2:
+        sort_label = st.selectbox(
+            "Sort by", list(SORT_OPTIONS), key='cache_sort', on_change=_reset_page
+        )
+    with col3:
+        descending = st.checkbox(
+            "Descending", value=True, key='cache_descending', on_change=_reset_page
+        )
+
+    query = {
+        'search': search.strip() or None,
+        'sort': SORT_OPTIONS[sort_label],
+        'descending': descending,
+        'limit': PAGE_SIZE
+    }
+    page = st.session_state.get('cache_page', 0)
+    total, entries = tts_engine.cache.query_entries(offset=page * PAGE_SIZE, **query)
+    pages = max(1, -(-total // PAGE_SIZE))
+    if page >= pages:
+        # Entries were removed since the page was chosen
+        page = pages - 1
+        st.session_state['cache_page'] = page
+        total, entries = tts_engine.cache.query_entries(offset=page * PAGE_SIZE, **query)
+
+    if not entries:
+        st.info("No cached entries match the search")
+    else:
+        first = page * PAGE_SIZE + 1
+        st.caption(f"Showing {first}–{first + len(entries) - 1} of {total}")
+
+    for cache_key, metadata in entries:
+        text_preview = metadata.get('text_preview') or 'N/A'
+        voice = metadata.get('voice') or 'N/A'
+        size_kb = metadata['size'] / 1024
+        created = metadata['created_at'].strftime('%Y-%m-%d %H:%M')
+        accessed = metadata['last_accessed'].strftime('%Y-%m-%d %H:%M')
+        state = tts_engine.cache.freshness(metadata['created_at'])
+        if state == 'stale' and tts_engine.revalidator.is_pending(cache_key):
+            state = 'stale (refresh pending)'
+
+        with st.expander(f"📝 {text_preview[:50]}..."):
+            st.text(f"Text: {text_preview}")
+            if metadata.get('chars'):
+                st.text(f"Length: {metadata['chars']} characters")
+            st.text(f"Voice: {voice}")
+            st.text(f"Size: {size_kb:.1f} KB")
+            st.text(f"Created: {created}")
+            st.text(f"Freshness: {state}")
+            st.text(f"Last accessed: {accessed}")
+            st.text(f"Cache key: {cache_key[:16]}...")
+
+            # Delete button
+            if st.button("🗑️ Delete", key=f"delete_{cache_key}"):
+                tts_engine.cache.delete(cache_key)
+                st.success("Deleted from cache")
+                st.rerun()
+
+    if pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("◀ Previous", on_click=_change_page, args=(-1,), disabled=page == 0)
+        with col2:
+            st.caption(f"Page {page + 1} of {pages}")
+        with col3:
+            st.button("Next ▶", on_click=_change_page, args=(1,), disabled=page >= pages - 1)
+
+    # Bulk delete: every entry matching all the filters, in one pass
+    with st.expander("🧹 Bulk delete"):
+        col1, col2 = st.columns(2)
+        with col1:
+            voice = st.selectbox(
+                "Voice", ["Any voice"] + tts_engine.cache.voices(), key='bulk_voice'
+            )
+            older_than = st.number_input(
+                "Created more than N days ago (0 = any)", min_value=0, value=0, key='bulk_older'
+            )
+            newer_than = st.number_input(
+                "Created in the last N days (0 = any)", min_value=0, value=0, key='bulk_newer'
+            )
+        with col2:
+            min_size_kb = st.number_input(
+                "At least N KB (0 = any)", min_value=0, value=0, key='bulk_min_size'
+            )
+            bulk_search = st.text_input("Text contains", key='bulk_search')
+            unused = st.checkbox("Only entries not in any saved playlist", key='bulk_unused')
+
+        # Saved playlists are only read when a button is clicked
+        form = (
+            tts_engine, None if voice == "Any voice" else voice,
+            older_than, newer_than, min_size_kb, bulk_search, unused
+        )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            filters = _bulk_delete_filters(*form) if st.button("🔎 Preview") else None
+            if filters is not None:
+                preview = tts_engine.cache.delete_matching(dry_run=True, **filters)
+                st.info(
+                    f"{preview['entries']} entries match; deleting them frees "
+                    f"{preview['bytes'] / (1024 * 1024):.1f} MB"
+                )
+        with col2:
+            if st.button("🗑️ Delete matching", type="secondary"):
+                if st.session_state.get('confirm_bulk_delete'):
+                    st.session_state['confirm_bulk_delete'] = False
+                    filters = _bulk_delete_filters(*form)
+                    if filters is not None:
+                        result = tts_engine.cache.delete_matching(**filters)
+                        st.success(
+                            f"Deleted {result['entries']} entries "
+                            f"({result['bytes'] / (1024 * 1024):.1f} MB)"
+                        )
+                else:
+                    st.session_state['confirm_bulk_delete'] = True
+                    st.warning("⚠️ Click again to confirm")
+
+    # Integrity check: one bounded scrub slice per click, resuming where
+    # the previous one stopped
+    st.markdown("---")
+    st.markdown("**Integrity**")
+
+    if st.button("🩺 Check Integrity"):
+        with st.spinner("Verifying cached files..."):
+            report = tts_engine.cache.scrubber.run(budget=5, repair=True)
+        broken = report['missing'] + report['truncated'] + report['corrupt']
+        st.text(
+            f"Checked {report['checked']} entries ({report['bytes'] / (1024 * 1024):.1f} MB)"
+        )
+        if broken or report['orphans']:
+            st.warning(
+                f"Removed {report['missing']} missing, {report['truncated']} truncated, "
+                f"{report['corrupt']} corrupt entries and {report['orphans']} orphaned files"
+            )
+        else:
+            st.success("No problems found")
+        if not report['done']:
+            st.caption("Time budget reached; click again to continue")
 
     # Clear all cache button
     st.markdown("---")
@@ -0,0 +1,91 @@
+"""
+Canonical cache keys for synthesized audio
+Texts that sound the same and the same synthesis settings map to one key
+"""
+import hashlib
+import json
+import re
+import unicodedata
+
+# Bump when canonical_text or the key layout changes; old keys then stop
+# matching, so add the previous scheme as a fallback lookup
+KEY_VERSION = 2
+
+# audioConfig sent with every synthesize request unless overridden
+DEFAULT_AUDIO_CONFIG = {
+    'audioEncoding': 'MP3',
+    'speakingRate': 1.0,
+    'pitch': 0.0,
+    'volumeGainDb': 0.0
+}
+
+# Typographic variants that are spoken exactly like their ASCII forms
+_CHAR_MAP = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201b': "'", '\u2032': "'",
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u201f': '"', '\u2033': '"',
+    '\u00a0': ' ', '\u2007': ' ', '\u202f': ' ',
+    '\u200b': None, '\ufeff': None
+})
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def canonical_text(text):
+    """Normalize text without changing how it is spoken
+
+    NFC normalization, curly quotes and apostrophes to straight ones,
+    non-breaking and zero-width spaces removed or made plain, whitespace
+    runs collapsed and trimmed.
+    """
+    text = unicodedata.normalize('NFC', text).translate(_CHAR_MAP)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def make_audio_config(overrides=None):
+    """DEFAULT_AUDIO_CONFIG with overrides applied, numbers as floats"""
+    config = dict(DEFAULT_AUDIO_CONFIG, **(overrides or {}))
+    return {
+        name: float(value) if isinstance(value, (int, float)) else value
+        for name, value in config.items()
+    }
+
+
+def cache_key(text, voice, language_code, config):
+    """Versioned key over the canonical text and the full request settings
+
+    Args:
+        text: Text to speak (canonicalized here)
+        voice: Voice name
+        language_code: Language code the request is sent with
+        config: audioConfig dict (see make_audio_config)
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    payload = json.dumps({
+        'v': KEY_VERSION,
+        'text': canonical_text(text),
+        'voice': voice,
+        'language': language_code,
+        'audio': config
+    }, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def legacy_cache_key(text, voice):
+    """Version 1 key (raw text and voice only, same as the PWA)
+
+    Entries under it were all generated with DEFAULT_AUDIO_CONFIG.
+    """
+    combined = f"{text}_{voice}"
+    return hashlib.sha256(combined.encode()).hexdigest()
+
+
+def tenant_id(api_key):
+    """Cache tenant of a session: a short hash of its API key, never the key itself
+
+    Sessions without a key (playing cached audio only) share the 'public' tenant.
+    """
+    if not api_key:
+        return 'public'
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
@@ -146,6 +146,34 @@ class StorageManager:
             print(f"Error deleting playlist: {e}")
             return False
 
+    def list_track_texts(self):
+        """
+        Get the English text of every track in every saved playlist
+
+        Unlike the other readers this doesn't swallow errors: callers use
+        the result to decide what to keep, so an unreadable database must
+        not look like one without playlists.
+
+        Returns:
+            set: Track texts
+
+        Raises:
+            sqlite3.Error: The database is missing or can't be read
+        """
+        # Read-only, so a missing database is an error rather than created
+        conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            rows = conn.execute('SELECT tracks FROM playlists').fetchall()
+        finally:
+            conn.close()
+
+        return {
+            track['english']
+            for (tracks_json,) in rows
+            for track in json.loads(tracks_json)
+            if track.get('english')
+        }
+
     def export_playlist_csv(self, tracks):
         """
         Export playlist as CSV string
@@ -2,20 +2,113 @@
 TTS Engine with Google Cloud Text-to-Speech integration and caching
 Uses REST API with API key for authentication
 """
-import hashlib
+import os
 import requests
 import base64
-from utils.cache_manager import CacheManager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from modules.cache_keys import (
+    DEFAULT_AUDIO_CONFIG, cache_key, canonical_text, legacy_cache_key, make_audio_config,
+    tenant_id
+)
+from utils.cache_manager import get_cache_manager
 from utils.audio_utils import estimate_duration
+from utils.http_session import get_shared_http_client
+from utils.negative_cache import get_shared_negative_cache
+from utils.rate_limiter import get_shared_rate_limiter
+from utils.revalidator import get_shared_revalidator
+
+
+# Seconds a failed request is answered from the negative cache, by kind
+FAILURE_TTLS = {
+    'permanent': 3600,
+    'transient': 30
+}
+
+
+class SynthesisError(Exception):
+    """A synthesize request failed (API error reply or network error)"""
+
+    def __init__(self, message, status_code=None, retry_after=None, cached=False):
+        super().__init__(message)
+        self.status_code = status_code
+        # Seconds the API asked us to wait (Retry-After), if any
+        self.retry_after = retry_after
+        # Raised from the negative cache, without calling the API
+        self.cached = cached
+
+    @property
+    def kind(self):
+        """'permanent', 'transient', or None for failures not worth remembering
+
+        400 (text or SSML the API rejects, a voice that doesn't support it)
+        and 404 (unknown voice) fail the same way every time. Network
+        errors, 408, 429 (quota) and 5xx may succeed shortly. 401/403
+        depend on the API key, which the user can fix right away.
+        """
+        if self.status_code in (400, 404):
+            return 'permanent'
+        if self.status_code is None or self.status_code in (408, 429) or self.status_code >= 500:
+            return 'transient'
+        return None
+
+
+class TrackGenerationError(Exception):
+    """Audio for one or more texts in a batch could not be generated
+
+    index and the message are those of the first failed text. The texts
+    that did succeed are still in results, so callers can use them.
+    """
+
+    def __init__(self, index, message, results=None, errors=None):
+        super().__init__(message)
+        self.index = index
+        # (audio_bytes, duration, cache_hit) per text in order, None where it failed
+        self.results = results or []
+        # index -> error message, for every failed text
+        self.errors = errors or {index: message}
 
 
 class TTSEngine:
     """Google Cloud TTS engine with caching support (REST API)"""
 
-    def __init__(self, api_key=None, cache_dir='data/cache'):
+    def __init__(self, api_key=None, cache_dir='data/cache', cache_url=None, audio_config=None,
+                 max_workers=6, requests_per_second=10, chars_per_minute=150_000):
         self.api_key = api_key
-        self.cache = CacheManager(cache_dir=cache_dir, max_size_mb=100, ttl_days=30)
+        # Cache quota partition of this session (see CacheManager)
+        self.tenant = tenant_id(api_key)
+        # Concurrent API requests per generate_many call
+        self.max_workers = max_workers
+        # Requests per second and characters per minute sent with this API
+        # key, across all engines in the process; set them to fit the
+        # project's quotas (they apply when the key is first used)
+        self.rate_limiter = get_shared_rate_limiter(
+            self.tenant,
+            requests_per_second=requests_per_second,
+            chars_per_minute=chars_per_minute
+        )
+        # audioConfig for every request (speakingRate, pitch, ...); part of the cache key
+        self.audio_config = make_audio_config(audio_config)
+        # Shared by every engine (and session) in the process. With a
+        # cache URL (or TTS_CACHE_URL) hits are shared across hosts through
+        # a Redis-protocol server, with the local disk cache in front of it.
+        # TTS_CACHE_STORAGE=segments stores audio in segment files instead
+        # of one file per entry.
+        self.cache = get_cache_manager(
+            cache_dir=cache_dir,
+            remote_url=cache_url or os.environ.get('TTS_CACHE_URL'),
+            storage=os.environ.get('TTS_CACHE_STORAGE', 'files'),
+            max_size_mb=100,
+            ttl_days=30,
+            hard_ttl_days=90
+        )
         self.base_url = "https://texttospeech.googleapis.com/v1"
+        # Recent failures by cache key (transient ones also by tenant),
+        # shared by every engine in the process
+        self.failures = get_shared_negative_cache()
+        # Background regeneration of stale entries, shared likewise
+        self.revalidator = get_shared_revalidator()
+        # Pooled keep-alive connections to the API, shared likewise
+        self.http = get_shared_http_client()
 
     def generate_audio(self, text, voice='en-US-Standard-F', language_code='en-US'):
         """
@@ -29,83 +122,308 @@ class TTSEngine:
         Returns:
             tuple: (audio_bytes, duration, cache_hit)
         """
-        # Generate cache key
-        cache_key = self._generate_cache_key(text, voice)
+        # Generate cache key (texts that are spoken the same share one)
+        cache_key = self._generate_cache_key(text, voice, language_code)
 
-        # Check cache first
-        cached = self.cache.get(cache_key)
+        # Check cache first, including entries stored under the old key scheme
+        cached = self.cache.get(
+            cache_key, fallback=self._legacy_cache_key(text, voice), tenant=self.tenant
+        )
         if cached:
+            if cached.get('stale'):
+                self._revalidate(cache_key, text, voice, language_code)
             return cached['audio'], cached['duration'], True
 
-        # Check API key (only needed for new audio generation)
-        if not self.api_key:
-            raise Exception(
-                "No API key provided. Cannot generate new audio. "
-                "Please enter your Google Cloud TTS API key."
-            )
+        text = canonical_text(text)
+        audio_bytes, duration = self._synthesize_key(cache_key, text, voice, language_code)
+
+        # Cache for future use
+        self.cache.set(
+            cache_key, self._cache_value(text, voice, audio_bytes, duration), tenant=self.tenant
+        )
+
+        return audio_bytes, duration, False
 
+    def generate_many(self, texts, voice='en-US-Standard-F', language_code='en-US'):
+        """
+        Generate audio for many texts, resolving cache hits in one pass
+
+        All cache hits are looked up together; only the misses are sent to
+        the API, up to max_workers at a time within the rate limits, and new
+        audio is written to the cache in one batch. A failed text doesn't
+        stop the others: they are still synthesized and cached.
+
+        Args:
+            texts: List of texts to convert to speech
+            voice: Voice name (e.g., 'en-US-Standard-F')
+            language_code: Language code (e.g., 'en-US')
+
+        Returns:
+            list: (audio_bytes, duration, cache_hit) per text, in order
+
+        Raises:
+            TrackGenerationError: If any text could not be generated
+                (reported for the first one, with all failures in errors
+                and every text's result, None where it failed, in results)
+        """
+        keys, fallbacks = self._batch_keys(texts, voice, language_code)
+        cached = self.cache.get_many(keys, fallbacks=fallbacks, tenant=self.tenant)
+        misses = self._batch_misses(texts, keys, cached, voice, language_code)
+
+        synthesized, failed = {}, {}
         try:
-            # Extract language code from voice name if not provided
-            if '-' in voice:
-                voice_parts = voice.split('-')
-                language_code = f"{voice_parts[0]}-{voice_parts[1]}"
+            self._synthesize_many(misses, voice, language_code, synthesized, failed)
+        finally:
+            self.cache.set_many(synthesized, tenant=self.tenant)
 
-            # Prepare request
-            url = f"{self.base_url}/text:synthesize?key={self.api_key}"
+        return self._batch_results(keys, cached, synthesized, failed)
 
-            headers = {
-                'Content-Type': 'application/json'
-            }
+    def _batch_keys(self, texts, voice, language_code):
+        """Cache keys of texts, and their legacy keys as lookup fallbacks"""
+        keys = [self._generate_cache_key(text, voice, language_code) for text in texts]
+        fallbacks = {
+            key: self._legacy_cache_key(text, voice) for text, key in zip(texts, keys)
+        }
+        return keys, fallbacks
+
+    def _batch_misses(self, texts, keys, cached, voice, language_code):
+        """
+        Canonical text of each missed key; stale hits are queued for refresh
+
+        Returns:
+            dict: cache key -> text (a text repeated in the batch appears once)
+        """
+        misses = {}
+        for text, key in zip(texts, keys):
+            text = canonical_text(text)
+            if cached.get(key):
+                if cached[key].get('stale'):
+                    self._revalidate(key, text, voice, language_code)
+            else:
+                misses.setdefault(key, text)
+        return misses
+
+    def _batch_results(self, keys, cached, synthesized, failed):
+        """
+        (audio_bytes, duration, cache_hit) per key, in order
+
+        Raises:
+            TrackGenerationError: If any key failed
+        """
+        results = []
+        errors = {}
+        returned = set()
+        for i, key in enumerate(keys):
+            if cached.get(key):
+                results.append((cached[key]['audio'], cached[key]['duration'], True))
+            elif key in synthesized:
+                value = synthesized[key]
+                # Repeats of a text synthesized earlier in the batch count as hits
+                results.append((value['audio'], value['duration'], key in returned))
+                returned.add(key)
+            else:
+                errors[i] = str(failed[key])
+                results.append(None)
+
+        if errors:
+            first = min(errors)
+            raise TrackGenerationError(
+                first, errors[first], results, errors
+            ) from failed[keys[first]]
+        return results
+
+    def _synthesize_many(self, misses, voice, language_code, synthesized, failed):
+        """
+        Synthesize misses concurrently, up to max_workers requests at a time
 
-            data = {
-                'input': {
-                    'text': text
-                },
-                'voice': {
-                    'languageCode': language_code,
-                    'name': voice
-                },
-                'audioConfig': {
-                    'audioEncoding': 'MP3',
-                    'speakingRate': 1.0,
-                    'pitch': 0.0,
-                    'volumeGainDb': 0.0
-                }
+        Args:
+            misses: dict of cache key -> canonical text
+            synthesized: Filled with cache key -> cache value as results arrive
+            failed: Filled with cache key -> exception
+        """
+        if not misses:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(misses))) as pool:
+            futures = {
+                pool.submit(self._synthesize_key, key, text, voice, language_code): key
+                for key, text in misses.items()
             }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    audio_bytes, duration = future.result()
+                except Exception as e:
+                    failed[key] = e
+                    continue
+                synthesized[key] = self._cache_value(misses[key], voice, audio_bytes, duration)
+
+    def _revalidate(self, key, text, voice, language_code):
+        """Queue background regeneration of a stale entry
+
+        The stale audio has already been served; without an API key it
+        keeps being served until the cache's hard TTL.
+        """
+        if not self.api_key:
+            return
+        text = canonical_text(text)
 
-            # Make request
-            response = requests.post(url, json=data, headers=headers)
+        def refresh():
+            audio_bytes, duration = self._synthesize_key(key, text, voice, language_code)
+            self.cache.set(
+                key, self._cache_value(text, voice, audio_bytes, duration), tenant=self.tenant
+            )
 
-            # Check response
-            if response.status_code != 200:
-                error_msg = response.json().get('error', {}).get('message', 'Unknown error')
-                raise Exception(f"API request failed: {error_msg}")
+        self.revalidator.submit(key, refresh)
+
+    def _cache_value(self, text, voice, audio_bytes, duration):
+        """Cache entry for generated audio"""
+        return {
+            'audio': audio_bytes,
+            'duration': duration,
+            'text_preview': text[:100],
+            'voice': voice,
+            # Characters billed, for cost-aware eviction
+            'chars': len(text)
+        }
 
-            # Extract audio content
-            result = response.json()
-            audio_content_base64 = result.get('audioContent')
+    def _synthesize_key(self, key, text, voice, language_code):
+        """
+        Synthesize audio for a cache miss, failing fast on a recent failure
 
-            if not audio_content_base64:
-                raise Exception("No audio content in response")
+        A request that failed within its TTL (see FAILURE_TTLS) raises the
+        same error again without calling the API; new failures are
+        remembered under the audio cache key (see _failure_key).
 
-            # Decode base64 audio
-            audio_bytes = base64.b64decode(audio_content_base64)
-            duration = estimate_duration(text)
+        Returns:
+            tuple: (audio_bytes, duration)
+        """
+        self._raise_remembered_failure(key)
+        try:
+            return self._synthesize(text, voice, language_code)
+        except SynthesisError as e:
+            self._remember_failure(key, e)
+            raise
+
+    def _failure_key(self, key, kind):
+        """Negative cache key of a failure of the given kind
+
+        Permanent failures depend only on the request, so every tenant
+        shares them. Transient ones (429, quota, 5xx, network) are usually
+        about one API key's limits and are remembered per tenant, so one
+        tenant's exhausted quota doesn't fail requests for the others.
+        """
+        return key if kind == 'permanent' else (self.tenant, key)
+
+    def _raise_remembered_failure(self, key):
+        """Raise key's failure again if it is still within its TTL"""
+        for kind in FAILURE_TTLS:
+            failure = self.failures.get(self._failure_key(key, kind))
+            if failure is not None:
+                raise SynthesisError(failure.message, failure.status_code, cached=True)
+
+    def _remember_failure(self, key, error):
+        """Remember a SynthesisError for its kind's TTL (or Retry-After, capped)"""
+        if error.kind is not None:
+            ttl = FAILURE_TTLS[error.kind]
+            if error.kind == 'transient' and error.retry_after:
+                ttl = min(max(ttl, error.retry_after), FAILURE_TTLS['permanent'])
+            self.failures.put(
+                self._failure_key(key, error.kind), error.kind, str(error), ttl, error.status_code
+            )
 
-            # Cache for future use
-            self.cache.set(cache_key, {
-                'audio': audio_bytes,
-                'duration': duration,
-                'text_preview': text[:100],
-                'voice': voice
-            })
+    def _synthesize(self, text, voice, language_code):
+        """
+        Call the synthesize endpoint (no caching)
 
-            return audio_bytes, duration, False
+        Returns:
+            tuple: (audio_bytes, duration)
+        """
+        url, data = self._synthesize_request(text, voice, language_code)
+
+        # Wait for our turn under the request and character quotas
+        self.rate_limiter.acquire(len(text))
+
+        try:
+            response = self.http.post(url, json=data, headers={'Content-Type': 'application/json'})
+            return self._synthesize_result(response, text)
 
         except requests.exceptions.RequestException as e:
-            raise Exception(f"Network error: {str(e)}")
+            raise SynthesisError(f"Network error: {str(e)}") from e
         except Exception as e:
-            raise Exception(f"TTS generation failed: {str(e)}")
+            raise SynthesisError(
+                f"TTS generation failed: {str(e)}",
+                status_code=getattr(e, 'status_code', None),
+                retry_after=getattr(e, 'retry_after', None)
+            ) from e
+
+    def _synthesize_request(self, text, voice, language_code):
+        """
+        URL and JSON body of a synthesize request
+
+        Returns:
+            tuple: (url, data)
+        """
+        # Check API key (only needed for new audio generation)
+        if not self.api_key:
+            raise Exception(
+                "No API key provided. Cannot generate new audio. "
+                "Please enter your Google Cloud TTS API key."
+            )
+
+        url = f"{self.base_url}/text:synthesize?key={self.api_key}"
+        data = {
+            'input': {
+                'text': text
+            },
+            'voice': {
+                'languageCode': self._language_code(voice, language_code),
+                'name': voice
+            },
+            'audioConfig': self.audio_config
+        }
+        return url, data
+
+    def _synthesize_result(self, response, text):
+        """
+        Audio from a synthesize response
+
+        Returns:
+            tuple: (audio_bytes, duration)
+        """
+        # Check response
+        if response.status_code != 200:
+            raise SynthesisError(
+                f"API request failed: {self._error_message(response)}",
+                status_code=response.status_code,
+                retry_after=self._retry_after(response)
+            )
+
+        # Extract audio content
+        result = response.json()
+        audio_content_base64 = result.get('audioContent')
+
+        if not audio_content_base64:
+            raise SynthesisError("No audio content in response")
+
+        # Decode base64 audio
+        audio_bytes = base64.b64decode(audio_content_base64)
+        duration = estimate_duration(text)
+
+        return audio_bytes, duration
+
+    def _error_message(self, response):
+        """Error message from an API error reply (which may not be JSON)"""
+        try:
+            return response.json().get('error', {}).get('message', 'Unknown error')
+        except ValueError:
+            return f"HTTP {response.status_code}"
+
+    def _retry_after(self, response):
+        """Retry-After header in seconds, or None if absent or a date"""
+        try:
+            return int(response.headers.get('Retry-After', ''))
+        except ValueError:
+            return None
 
     def get_available_voices(self, language_code='en'):
         """
@@ -121,60 +439,102 @@ class TTSEngine:
             return []
 
         try:
-            # Make request to list voices
-            url = f"{self.base_url}/voices?key={self.api_key}"
-
-            if language_code:
-                url += f"&languageCode={language_code}"
-
-            response = requests.get(url)
+            response = self.http.get(self._voices_url(language_code))
 
             if response.status_code != 200:
                 print(f"Error fetching voices: {response.status_code}")
                 return []
 
-            result = response.json()
-            all_voices = result.get('voices', [])
-
-            voices = []
-            for voice in all_voices:
-                voice_name = voice.get('name', '')
-
-                # Filter for Standard, WaveNet, and Neural2 voices (en-US, en-GB, en-AU)
-                if any(voice_name.startswith(prefix) for prefix in [
-                    'en-US-Standard-', 'en-GB-Standard-', 'en-AU-Standard-',
-                    'en-US-Wavenet-', 'en-GB-Wavenet-', 'en-AU-Wavenet-',
-                    'en-US-Neural2-', 'en-GB-Neural2-', 'en-AU-Neural2-'
-                ]):
-                    language_codes = voice.get('languageCodes', [])
-                    ssml_gender = voice.get('ssmlGender', 'NEUTRAL')
-
-                    voices.append({
-                        'name': voice_name,
-                        'language_code': language_codes[0] if language_codes else 'en-US',
-                        'ssml_gender': self._format_gender(ssml_gender),
-                        'description': self._format_voice_description(voice)
-                    })
-
-            return sorted(voices, key=lambda x: x['name'])
+            return self._parse_voices(response.json())
 
         except Exception as e:
             print(f"Error fetching voices: {e}")
             return []
 
-    def _generate_cache_key(self, text, voice):
+    def _voices_url(self, language_code):
+        """URL listing the voices for a language code filter"""
+        url = f"{self.base_url}/voices?key={self.api_key}"
+
+        if language_code:
+            url += f"&languageCode={language_code}"
+        return url
+
+    def _parse_voices(self, result):
+        """Supported voices from a voices list response, sorted by name"""
+        all_voices = result.get('voices', [])
+
+        voices = []
+        for voice in all_voices:
+            voice_name = voice.get('name', '')
+
+            # Filter for Standard, WaveNet, and Neural2 voices (en-US, en-GB, en-AU)
+            if any(voice_name.startswith(prefix) for prefix in [
+                'en-US-Standard-', 'en-GB-Standard-', 'en-AU-Standard-',
+                'en-US-Wavenet-', 'en-GB-Wavenet-', 'en-AU-Wavenet-',
+                'en-US-Neural2-', 'en-GB-Neural2-', 'en-AU-Neural2-'
+            ]):
+                language_codes = voice.get('languageCodes', [])
+                ssml_gender = voice.get('ssmlGender', 'NEUTRAL')
+
+                voices.append({
+                    'name': voice_name,
+                    'language_code': language_codes[0] if language_codes else 'en-US',
+                    'ssml_gender': self._format_gender(ssml_gender),
+                    'description': self._format_voice_description(voice)
+                })
+
+        return sorted(voices, key=lambda x: x['name'])
+
+    def _language_code(self, voice, language_code):
+        """Language code a request is sent with (taken from the voice name if it has one)"""
+        if '-' in voice:
+            voice_parts = voice.split('-')
+            return f"{voice_parts[0]}-{voice_parts[1]}"
+        return language_code
+
+    def _generate_cache_key(self, text, voice, language_code='en-US'):
         """
-        Generate cache key from text and voice (same as PWA)
+        Generate cache key from the canonical text and the full request
 
         Args:
             text: Text string
             voice: Voice name
+            language_code: Language code (if the voice name has none)
+
+        Returns:
+            str: SHA256 hash (see modules.cache_keys)
+        """
+        return cache_key(text, voice, self._language_code(voice, language_code), self.audio_config)
+
+    def _legacy_cache_key(self, text, voice):
+        """Key this text had before canonical keys, or None
+
+        Old keys only ever covered the default audio config.
+        """
+        if self.audio_config != make_audio_config(DEFAULT_AUDIO_CONFIG):
+            return None
+        return legacy_cache_key(text, voice)
+
+    def cache_keys(self, texts, voices):
+        """
+        Cache keys (current and legacy) of texts in each of voices
+
+        Args:
+            texts: Texts as given to generate_audio
+            voices: Voice names
 
         Returns:
-            str: SHA256 hash of text + voice
+            set: Cache keys
         """
-        combined = f"{text}_{voice}"
-        return hashlib.sha256(combined.encode()).hexdigest()
+        keys = set()
+        for text in texts:
+            for voice in voices:
+                keys.add(self._generate_cache_key(text, voice))
+                # Entries not yet looked up since keys became canonical are
+                # still stored under their old key
+                keys.add(self._legacy_cache_key(text, voice))
+        keys.discard(None)
+        return keys
 
     def _format_gender(self, ssml_gender):
         """Format SSML gender string"""
@@ -231,10 +591,25 @@ class TTSEngine:
         """Get cache statistics with hit rate calculation"""
         stats = self.cache.get_stats()
 
-        # Calculate hit rate
+        # Calculate hit rate, overall and per tier (L1 memory, L2 disk, remote)
         if stats.get('total_requests', 0) > 0:
             stats['hit_rate'] = (stats['cache_hits'] / stats['total_requests']) * 100
+            stats['l1_hit_rate'] = (stats['l1_hits'] / stats['total_requests']) * 100
+            stats['l2_hit_rate'] = (stats['l2_hits'] / stats['total_requests']) * 100
+            stats['remote_hit_rate'] = (stats['remote_hits'] / stats['total_requests']) * 100
         else:
             stats['hit_rate'] = 0.0
+            stats['l1_hit_rate'] = 0.0
+            stats['l2_hit_rate'] = 0.0
+            stats['remote_hit_rate'] = 0.0
+
+        # Requests answered from the negative cache
+        stats['failures'] = self.failures.get_stats()
+        # Stale entries served and their background refreshes
+        stats['revalidation'] = self.revalidator.get_stats()
+        # API requests and the connections opened for them
+        stats['http'] = self.http.get_stats()
+        # Requests held back by this key's rate limits
+        stats['rate_limit'] = self.rate_limiter.get_stats()
 
         return stats
@@ -0,0 +1,254 @@
+"""
+Minimal asyncio HTTP/1.1 client with keep-alive connection reuse
+Enough for the Google Cloud TTS REST API (JSON in, JSON out) without blocking
+the event loop; no extra dependency
+"""
+import asyncio
+import json as jsonlib
+import ssl
+import time
+import weakref
+from urllib.parse import urlsplit
+
+from utils.cache_metrics import latency_summary, record_latency
+
+# (connect, read) timeouts in seconds, as for the blocking client
+DEFAULT_TIMEOUT = (3.05, 30)
+
+
+class AsyncHttpError(Exception):
+    """The server closed the connection or sent a malformed response"""
+
+
+class _ConnectionClosed(AsyncHttpError):
+    """Closed before any of the response arrived"""
+
+
+# What a request may raise when the network or the server fails
+NETWORK_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, AsyncHttpError)
+
+
+class _Headers(dict):
+    """Response headers with case-insensitive lookup"""
+
+    def __getitem__(self, name):
+        return super().__getitem__(name.lower())
+
+    def get(self, name, default=None):
+        return super().get(name.lower(), default)
+
+    def __contains__(self, name):
+        return super().__contains__(name.lower())
+
+
+class AsyncResponse:
+    """Status, headers and body of a response (the parts of requests.Response used here)"""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+
+class AsyncHttpClient:
+    """HTTP/1.1 client on asyncio streams, reusing connections per origin
+
+    Connections belong to the event loop they were opened on, so use one
+    client per loop (see get_shared_async_http_client). Up to
+    max_idle connections per origin are kept open between requests. A
+    request on a kept connection that the server has meanwhile closed is
+    retried on another one, as the server never processed it.
+    """
+
+    def __init__(self, max_idle=16, timeout=DEFAULT_TIMEOUT, ssl_context=None):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.stats = {'errors': 0}
+        # (scheme, host, port) -> idle (reader, writer) pairs
+        self._idle = {}
+
+    async def request(self, method, url, json=None, headers=None, timeout=None):
+        """Send a request and read the whole response
+
+        Raises:
+            One of NETWORK_ERRORS
+        """
+        connect_timeout, read_timeout = timeout or self.timeout
+        parts = urlsplit(url)
+        scheme = parts.scheme
+        port = parts.port or (443 if scheme == 'https' else 80)
+        origin = (scheme, parts.hostname, port)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+        body = jsonlib.dumps(json).encode() if json is not None else b''
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{port}"
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}",
+                 f"Content-Length: {len(body)}", "Accept-Encoding: identity"]
+        if json is not None:
+            lines.append("Content-Type: application/json")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()
+                  if name.lower() not in ('host', 'content-length', 'content-type')]
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+        start = time.perf_counter()
+        try:
+            while True:
+                conn, reused = await self._acquire(origin, connect_timeout)
+                try:
+                    response, keep_alive = await asyncio.wait_for(
+                        self._roundtrip(conn, message, method), read_timeout
+                    )
+                except (_ConnectionClosed, ConnectionError):
+                    self._close(conn)
+                    if reused:
+                        # Server dropped the idle connection; try a fresh one
+                        continue
+                    raise
+                except BaseException:
+                    self._close(conn)
+                    raise
+                if keep_alive:
+                    self._release(origin, conn)
+                else:
+                    self._close(conn)
+                return response
+        except NETWORK_ERRORS:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            record_latency(self.stats, 'request', time.perf_counter() - start)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def _acquire(self, origin, connect_timeout):
+        """An idle connection to origin, or a new one; returns (conn, reused)"""
+        idle = self._idle.get(origin)
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            writer.close()
+
+        scheme, host, port = origin
+        start = time.perf_counter()
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(
+                host, port,
+                ssl=self.ssl_context if scheme == 'https' else None,
+                server_hostname=host if scheme == 'https' else None
+            ),
+            connect_timeout
+        )
+        # TCP connect plus, for HTTPS, the TLS handshake
+        record_latency(self.stats, 'handshake', time.perf_counter() - start)
+        return conn, False
+
+    def _release(self, origin, conn):
+        idle = self._idle.setdefault(origin, [])
+        if len(idle) < self.max_idle:
+            idle.append(conn)
+        else:
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        conn[1].close()
+
+    async def _roundtrip(self, conn, message, method):
+        """Write a request and read its response; returns (response, keep_alive)"""
+        reader, writer = conn
+        writer.write(message)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise _ConnectionClosed("Connection closed before the response")
+        try:
+            version, status = status_line.decode('latin-1').split(None, 2)[:2]
+            status_code = int(status)
+        except ValueError:
+            raise AsyncHttpError(f"Malformed status line: {status_line!r}")
+
+        headers = _Headers()
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n'):
+                break
+            if not line:
+                raise AsyncHttpError("Connection closed in headers")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('Connection', '').lower() != 'close'
+        if method == 'HEAD' or status_code in (204, 304) or 100 <= status_code < 200:
+            content = b''
+        elif headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            content = await self._read_chunked(reader)
+        elif 'Content-Length' in headers:
+            content = await reader.readexactly(int(headers['Content-Length']))
+        else:
+            # Body runs to the end of the connection
+            content = await reader.read()
+            keep_alive = False
+
+        return AsyncResponse(status_code, headers, content), keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b';', 1)[0], 16)
+            except ValueError:
+                raise AsyncHttpError(f"Malformed chunk size: {size_line!r}")
+            if size == 0:
+                # Trailers, up to the blank line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    def get_stats(self):
+        """Request and new-connection counts with their latency summaries (as HttpClient)"""
+        request = latency_summary(self.stats, 'request')
+        handshake = latency_summary(self.stats, 'handshake')
+        return {
+            'requests': request['count'],
+            'connections': handshake['count'],
+            'errors': self.stats['errors'],
+            'request': request,
+            'handshake': handshake
+        }
+
+    async def close(self):
+        """Close all idle connections"""
+        for idle in self._idle.values():
+            for conn in idle:
+                self._close(conn)
+        self._idle.clear()
+
+
+_shared_clients = weakref.WeakKeyDictionary()
+
+
+def get_shared_async_http_client():
+    """Get the client of the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    client = _shared_clients.get(loop)
+    if client is None:
+        client = _shared_clients[loop] = AsyncHttpClient()
+    return client
@@ -0,0 +1,45 @@
+"""
+Cache backend interface
+What TTSEngine and the cache tools need from an audio cache store
+"""
+
+
+class CacheBackend:
+    """Key -> audio entry store
+
+    Values are dicts with 'audio' bytes and 'duration', 'voice' and
+    'text_preview'. CacheManager (local disk, the default) and RespBackend
+    (a shared Redis-protocol server, see utils.resp_backend) implement it;
+    CacheManager can also sit in front of another backend as its near cache.
+
+    Subclasses implement get, set, delete and get_stats; the batch methods
+    default to one call per key.
+    """
+
+    def get(self, key, track_stats=True):
+        """Cached value dict for key, or None"""
+        raise NotImplementedError
+
+    def get_many(self, keys, track_stats=True):
+        """dict: key -> cached value dict, or None for a miss"""
+        return {key: self.get(key, track_stats=track_stats) for key in dict.fromkeys(keys)}
+
+    def set(self, key, value):
+        """Store value under key"""
+        raise NotImplementedError
+
+    def set_many(self, items):
+        """Store a dict (or iterable of pairs) of key -> value"""
+        for key, value in dict(items).items():
+            self.set(key, value)
+
+    def delete(self, key):
+        """Remove key (no-op if absent)"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Persist anything written behind"""
+
+    def get_stats(self):
+        """dict of backend statistics"""
+        raise NotImplementedError
@@ -0,0 +1,924 @@
+"""
+Cache stress tests and benchmarks
+Run from the project root, e.g.: python -m utils.cache_bench stress --processes 4
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import cache_manager
+from utils.cache_manager import CacheManager
+from utils.cache_policy import synthesis_cost
+from utils.resp_backend import RespBackend, RespClient
+
+
+def _payload(key, size=2048):
+    """Deterministic audio payload for key, so corruption is detectable"""
+    digest = hashlib.sha256(key.encode()).digest()
+    return (digest * (size // len(digest) + 1))[:size]
+
+
+def _stress_worker(cache_dir, index_backend, worker_id, ops, shared_keys, seed, storage='files',
+                   max_size_mb=None):
+    """Mixed get/set/delete on shared keys plus set-only owned keys
+
+    With a small max_size_mb, sets also evict other processes' entries.
+
+    Returns:
+        tuple: (owned_keys, corrupt_reads)
+    """
+    rng = random.Random(seed)
+    cache = CacheManager(
+        cache_dir=cache_dir, index_backend=index_backend, storage=storage,
+        **({'max_size_mb': max_size_mb} if max_size_mb is not None else {})
+    )
+    owned_keys = []
+    corrupt_reads = 0
+
+    for i in range(ops):
+        op = rng.random()
+        key = f"shared-{rng.randrange(shared_keys)}"
+
+        if op < 0.5:
+            data = cache.get(key)
+            if data is not None and data['audio'] != _payload(key):
+                corrupt_reads += 1
+        elif op < 0.75:
+            cache.set(key, {'audio': _payload(key), 'duration': 1.0, 'voice': 'v', 'text_preview': key})
+        elif op < 0.85:
+            cache.delete(key)
+        else:
+            owned = f"owned-{worker_id}-{i}"
+            cache.set(owned, {'audio': _payload(owned), 'duration': 1.0, 'voice': 'v', 'text_preview': owned})
+            owned_keys.append(owned)
+
+    cache.flush()
+    return owned_keys, corrupt_reads
+
+
+def _stress_pass(processes, ops, shared_keys, index_backend, cache_dir, storage, max_size_mb):
+    """One multi-process run against cache_dir, then verification
+
+    Returns:
+        dict: 'seconds', 'owned_keys', 'missing', 'evictions', 'size_mb',
+            'corrupt_reads' and 'bad_entries'
+    """
+    # Create the cache (and index) once before the workers start
+    CacheManager(cache_dir=cache_dir, index_backend=index_backend).flush()
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(_stress_worker, [
+            (cache_dir, index_backend, worker_id, ops, shared_keys, worker_id, storage, max_size_mb)
+            for worker_id in range(processes)
+        ])
+    elapsed = time.perf_counter() - start
+
+    owned_keys = [key for keys, _ in results for key in keys]
+    cache = CacheManager(cache_dir=cache_dir, index_backend=index_backend)
+
+    # Every remaining row, owned or shared, must have an intact file
+    bad_entries = 0
+    for key in cache.index.keys():
+        data = cache.get(key, track_stats=False)
+        if data is None or data['audio'] != _payload(key):
+            bad_entries += 1
+
+    return {
+        'seconds': elapsed,
+        'owned_keys': len(owned_keys),
+        'missing': sum(key not in cache.index for key in owned_keys),
+        'evictions': cache.stats.get('evictions', 0),
+        'size_mb': cache.index.total_size() / (1024 * 1024),
+        'corrupt_reads': sum(corrupt for _, corrupt in results),
+        'bad_entries': bad_entries
+    }
+
+
+def run_stress(processes=4, ops=300, shared_keys=50, index_backend='sqlite', cache_dir=None,
+               storage='files', max_size_mb=0.2):
+    """Run N processes against one cache directory and verify the result
+
+    Two passes, each in a fresh cache directory:
+    - unbounded: every owned key written by any process must still be
+      indexed at the end (a missing one is a lost write)
+    - bounded to max_size_mb, small enough that sets evict entries while
+      other processes read and write them; owned keys may be evicted
+    Both check that no read returned corrupt audio and that every indexed
+    entry has an intact file. max_size_mb=None runs the unbounded pass only.
+
+    Returns:
+        dict: Summary with 'lost', 'evicted', 'corrupt_reads', 'bad_entries' and 'ok'
+    """
+    tmp_dir = None
+    if cache_dir is None:
+        tmp_dir = cache_dir = tempfile.mkdtemp(prefix='cache-stress-')
+
+    args = (processes, ops, shared_keys, index_backend)
+    unbounded = _stress_pass(*args, os.path.join(cache_dir, 'unbounded'), storage, None)
+    bounded = None
+    if max_size_mb is not None:
+        bounded = _stress_pass(*args, os.path.join(cache_dir, 'bounded'), storage, max_size_mb)
+
+    if tmp_dir:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    passes = [unbounded] + ([bounded] if bounded else [])
+    corrupt_reads = sum(result['corrupt_reads'] for result in passes)
+    bad_entries = sum(result['bad_entries'] for result in passes)
+    return {
+        'processes': processes,
+        'storage': storage,
+        'ops_per_process': ops,
+        'seconds': sum(result['seconds'] for result in passes),
+        'max_size_mb': max_size_mb,
+        'size_mb': round(bounded['size_mb'], 3) if bounded else None,
+        'evictions': bounded['evictions'] if bounded else 0,
+        'owned_keys': sum(result['owned_keys'] for result in passes),
+        'evicted': bounded['missing'] if bounded else 0,
+        'lost': unbounded['missing'],
+        'corrupt_reads': corrupt_reads,
+        'bad_entries': bad_entries,
+        'ok': not unbounded['missing'] and not corrupt_reads and not bad_entries
+    }
+
+
+def run_thread_contention(thread_counts=(1, 2, 4, 8), ops=2000, keys=200,
+                          write_ratio=0.1, index_backend='sqlite', use_l1=False):
+    """Benchmark one shared CacheManager under N concurrent threads
+
+    Each thread runs `ops` operations on random keys (mostly gets, some
+    sets). The L1 memory tier is off by default so every get reaches the
+    index and disk.
+
+    Returns:
+        list: One dict per thread count with ops/s and latency percentiles
+    """
+    tmp_dir = tempfile.mkdtemp(prefix='cache-threads-')
+    cache = CacheManager(
+        cache_dir=tmp_dir,
+        index_backend=index_backend,
+        l1_max_mb=32 if use_l1 else 0
+    )
+    key_names = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(keys)]
+    for key in key_names:
+        cache.set(key, {'audio': _payload(key, 16 * 1024), 'duration': 1.0, 'voice': 'v', 'text_preview': key})
+
+    results = []
+    for thread_count in thread_counts:
+        latencies = []
+        latencies_lock = threading.Lock()
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local = []
+            for _ in range(ops):
+                key = rng.choice(key_names)
+                start = time.perf_counter()
+                if rng.random() < write_ratio:
+                    cache.set(key, {'audio': _payload(key, 16 * 1024), 'duration': 1.0, 'voice': 'v', 'text_preview': key})
+                else:
+                    data = cache.get(key)
+                    if data is not None and data['audio'] != _payload(key, 16 * 1024):
+                        errors.append(key)
+                local.append(time.perf_counter() - start)
+            with latencies_lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(thread_count)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        results.append({
+            'threads': thread_count,
+            'ops_per_sec': len(latencies) / elapsed,
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+            'errors': len(errors)
+        })
+
+    cache.flush()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """In-memory stand-in for a Redis server, for local testing
+
+    Speaks enough RESP2 for RespBackend: PING, AUTH, SELECT, GET, MGET,
+    SET (with EX/PX), DEL, EXISTS, DBSIZE, FLUSHDB and QUIT. Keys expire
+    lazily on access.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _RespHandler)
+        self.data = {}
+        self.data_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        """Serve from a background thread; returns self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def _lookup(self, key):
+        """Value for key, or None (called with data_lock held)"""
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self.data[key]
+            return None
+        return value
+
+    def command(self, args):
+        """Run one command; returns a reply (exceptions become error replies)"""
+        name = args[0].upper()
+        with self.data_lock:
+            if name == b'PING':
+                return 'PONG'
+            if name in (b'AUTH', b'SELECT', b'QUIT'):
+                return 'OK'
+            if name == b'GET':
+                return self._lookup(args[1])
+            if name == b'MGET':
+                return [self._lookup(key) for key in args[1:]]
+            if name == b'SET':
+                expires_at = None
+                options = [arg.upper() for arg in args[3::2]]
+                for option, amount in zip(options, args[4::2]):
+                    if option == b'EX':
+                        expires_at = time.monotonic() + int(amount)
+                    elif option == b'PX':
+                        expires_at = time.monotonic() + int(amount) / 1000
+                self.data[args[1]] = (args[2], expires_at)
+                return 'OK'
+            if name == b'DEL':
+                return sum(self.data.pop(key, None) is not None for key in args[1:])
+            if name == b'EXISTS':
+                return sum(self._lookup(key) is not None for key in args[1:])
+            if name == b'DBSIZE':
+                return len(self.data)
+            if name == b'FLUSHDB':
+                self.data.clear()
+                return 'OK'
+        raise ValueError(f"unknown command '{name.decode()}'")
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _encode(self, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, str):
+            return b'+' + reply.encode() + b'\r\n'
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, bytes):
+            return b'$%d\r\n' % len(reply) + reply + b'\r\n'
+        return b'*%d\r\n' % len(reply) + b''.join(self._encode(item) for item in reply)
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if not args:
+                return
+            try:
+                reply = self._encode(self.server.command(args))
+            except Exception as e:
+                reply = b'-ERR ' + str(e).encode() + b'\r\n'
+            self.wfile.write(reply)
+            if args[0].upper() == b'QUIT':
+                return
+
+
+def run_shared(entries=200, size=16 * 1024, url=None):
+    """Two hosts' caches sharing one RESP server
+
+    Node A writes `entries` entries; node B (its own cache directory) then
+    reads them all twice: first from the remote backend, then from its
+    own near cache (the L1 memory tier is off for both).
+
+    Returns:
+        dict: Timings and the hit counts node B saw per tier
+    """
+    server = None
+    if url is None:
+        server = RespServer().start()
+        url = server.url
+
+    dirs = [tempfile.mkdtemp(prefix='cache-shared-') for _ in range(2)]
+    node_a, node_b = [
+        CacheManager(
+            cache_dir=d,
+            remote=RespBackend(RespClient.from_url(url)),
+            l1_max_mb=0,
+            janitor_interval=None
+        )
+        for d in dirs
+    ]
+    keys = [hashlib.sha256(f"shared-{i}".encode()).hexdigest() for i in range(entries)]
+
+    start = time.perf_counter()
+    for key in keys:
+        node_a.set(key, {'audio': _payload(key, size), 'duration': 1.0, 'voice': 'v', 'text_preview': key})
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    remote_ok = all(node_b.get(key)['audio'] == _payload(key, size) for key in keys)
+    remote_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    near_ok = all(node_b.get(key)['audio'] == _payload(key, size) for key in keys)
+    near_seconds = time.perf_counter() - start
+
+    stats = node_b.get_stats()
+    for d in dirs:
+        shutil.rmtree(d, ignore_errors=True)
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'entries': entries,
+        'write_ms_per_entry': write_seconds / entries * 1000,
+        'remote_read_ms_per_entry': remote_seconds / entries * 1000,
+        'near_read_ms_per_entry': near_seconds / entries * 1000,
+        'remote_hits': stats['remote_hits'],
+        'l2_hits': stats['l2_hits'],
+        'ok': remote_ok and near_ok and stats['remote_hits'] == entries
+    }
+
+
+def load_corpus_texts():
+    """English sentences of the sample playlists (sample*.csv, data/sample_data.json)"""
+    texts = []
+    for path in ('sample1.csv', 'sample2.csv', 'sample3.csv'):
+        with open(path, encoding='utf-8') as f:
+            texts.extend(row['english'].strip() for row in csv.DictReader(f))
+    with open('data/sample_data.json', encoding='utf-8') as f:
+        texts.extend(track['english'] for track in json.load(f))
+    return texts
+
+
+def build_trace(days=14, seed=0, one_off_size=300):
+    """Synthetic access trace: a class replaying the same sentences daily
+
+    Every day the sample sentences are played three times (Neural2 voice).
+    Every fourth day, between the first and second replay, someone plays a
+    large one-off playlist of new sentences (Standard voice).
+
+    Returns:
+        list: (day, text, voice) requests in order
+    """
+    rng = random.Random(seed)
+    daily = load_corpus_texts()
+    words = sorted({word for text in daily for word in text.split()})
+
+    trace = []
+    for day in range(days):
+        for replay in range(3):
+            trace.extend((day, text, 'en-US-Neural2-F') for text in rng.sample(daily, len(daily)))
+            if replay == 0 and day % 4 == 2:
+                for _ in range(one_off_size):
+                    text = ' '.join(rng.choice(words) for _ in range(rng.randint(6, 14)))
+                    trace.append((day, text, 'en-US-Standard-F'))
+    return trace
+
+
+def load_trace(path):
+    """Trace file: one request per line, 'day<TAB>voice<TAB>text'"""
+    trace = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            day, voice, text = line.rstrip('\n').split('\t', 2)
+            trace.append((int(day), text, voice))
+    return trace
+
+
+@contextmanager
+def _virtual_clock():
+    """Let the cache see trace time instead of wall time
+
+    Eviction order and TTLs depend on datetime.now() in the cache manager;
+    replaying two weeks in seconds needs the clock moved per request.
+    """
+    class TraceClock(datetime):
+        offset = 0
+
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(seconds=cls.offset)
+
+    saved = cache_manager.datetime
+    cache_manager.datetime = TraceClock
+    try:
+        yield TraceClock
+    finally:
+        cache_manager.datetime = saved
+
+
+def run_policy_replay(trace, policies=('lru', 'tinylfu', 'gds'), max_size_mb=1.0):
+    """Replay an access trace against a cache per eviction policy
+
+    Each request is a get; a miss is "synthesized" (audio sized like real
+    MP3 output for the text) and set. Cost is the API price of the
+    characters, by voice tier.
+
+    Returns:
+        list: One dict per policy with hit rate and API cost saved
+    """
+    results = []
+    for policy in policies:
+        tmp_dir = tempfile.mkdtemp(prefix='cache-policy-')
+        cache = CacheManager(
+            cache_dir=tmp_dir,
+            max_size_mb=max_size_mb,
+            l1_max_mb=0,
+            janitor_interval=None,
+            eviction_policy=policy
+        )
+        hits = 0
+        total_cost = saved_cost = 0.0
+
+        with _virtual_clock() as clock:
+            for i, (day, text, voice) in enumerate(trace):
+                clock.offset = day * 86400 + i
+                key = hashlib.sha256(f"{text}_{voice}".encode()).hexdigest()
+                value = {
+                    'audio': _payload(key, int(len(text) * 1024 / 3.75)),
+                    'duration': len(text) / 15,
+                    'voice': voice,
+                    'text_preview': text[:100],
+                    'chars': len(text)
+                }
+                cost = synthesis_cost(value)
+                total_cost += cost
+                if cache.get(key) is not None:
+                    hits += 1
+                    saved_cost += cost
+                else:
+                    cache.set(key, value)
+
+        cache.flush()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        results.append({
+            'policy': policy,
+            'requests': len(trace),
+            'hit_rate': hits / len(trace) * 100,
+            'cost_usd': total_cost - saved_cost,
+            'saved_percent': saved_cost / total_cost * 100 if total_cost else 0.0
+        })
+    return results
+
+
+def _disk_usage(cache_dir):
+    """(files, bytes allocated on disk) of entry storage, excluding the index"""
+    files = allocated = 0
+    for root, dirs, names in os.walk(cache_dir):
+        dirs[:] = [d for d in dirs if d != '.locks']
+        for name in names:
+            if name.startswith('index.') or name.startswith('.'):
+                continue
+            files += 1
+            allocated += os.stat(os.path.join(root, name)).st_blocks * 512
+    return files, allocated
+
+
+def run_storage_bench(entries=2000, size=24 * 1024, storages=('files', 'segments'),
+                      segment_size_mb=4, seed=0):
+    """Compare the storage engines on writes, reads and churn
+
+    Per engine: write `entries` entries of about `size` bytes, read them all
+    in random order (L1 off), then churn: delete a third and overwrite
+    another third. Disk usage (allocated blocks) and file count are
+    measured after churn and, for segments, after compaction; every
+    surviving entry is read back and checked at the end.
+
+    Returns:
+        list: One dict per engine
+    """
+    rng = random.Random(seed)
+    keys = [hashlib.sha256(f"storage-{i}".encode()).hexdigest() for i in range(entries)]
+    # MP3 sizes vary; 50-150% of size
+    sizes = {key: int(size * rng.uniform(0.5, 1.5)) for key in keys}
+    read_order = rng.sample(keys, len(keys))
+    deleted = set(rng.sample(keys, len(keys) // 3))
+    rewritten = rng.sample([key for key in keys if key not in deleted], len(keys) // 3)
+
+    def value(key, version=0):
+        return {
+            'audio': _payload(f"{key}-{version}", sizes[key]),
+            'duration': 1.0,
+            'voice': 'v',
+            'text_preview': key
+        }
+
+    results = []
+    for storage in storages:
+        tmp_dir = tempfile.mkdtemp(prefix='cache-storage-')
+        cache = CacheManager(
+            cache_dir=tmp_dir,
+            max_size_mb=entries * size * 2 / (1024 * 1024),
+            l1_max_mb=0,
+            janitor_interval=None,
+            storage=storage,
+            segment_size_mb=segment_size_mb
+        )
+        row = {'storage': storage}
+
+        start = time.perf_counter()
+        for key in keys:
+            cache.set(key, value(key))
+        row['writes_per_sec'] = entries / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for key in read_order:
+            cache.get(key)
+        row['reads_per_sec'] = entries / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for key in deleted:
+            cache.delete(key)
+        for key in rewritten:
+            cache.set(key, value(key, 1))
+        row['churn_per_sec'] = (len(deleted) + len(rewritten)) / (time.perf_counter() - start)
+
+        live_bytes = cache.index.total_size()
+        row['files'], allocated = _disk_usage(tmp_dir)
+        row['disk_mb'] = allocated / (1024 * 1024)
+        row['overhead_percent'] = (allocated / live_bytes - 1) * 100
+
+        # Compact everything written so far, as the janitor would once
+        # the segments have aged past its grace period
+        start = time.perf_counter()
+        cache.segments.seal()
+        cache.compact_segments(grace_seconds=0)
+        cache.segments.purge_retired(delay=0)
+        row['compact_seconds'] = time.perf_counter() - start
+        row['files_compacted'], allocated = _disk_usage(tmp_dir)
+        row['disk_mb_compacted'] = allocated / (1024 * 1024)
+
+        rewritten_set = set(rewritten)
+        row['ok'] = all(
+            (cache.get(key, track_stats=False) is None) == (key in deleted) and
+            (key in deleted or cache.get(key, track_stats=False)['audio'] ==
+             value(key, int(key in rewritten_set))['audio'])
+            for key in keys
+        )
+
+        cache.flush()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        results.append(row)
+    return results
+
+
+class MockTtsServer(ThreadingHTTPServer):
+    """Stand-in for the Google Cloud TTS REST API, for local benchmarks
+
+    Answers text:synthesize after `latency` seconds with `audio_size`
+    bytes of fake audio, and voices with an empty list. Keeps connections
+    alive (HTTP/1.1).
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, audio_size=8 * 1024):
+        super().__init__((host, port), _MockTtsHandler)
+        self.latency = latency
+        self.audio = base64.b64encode(os.urandom(audio_size)).decode()
+        self.requests = 0
+        self.connections = 0
+        self.count_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Serve from a background thread; returns self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _MockTtsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.count_lock:
+            self.server.connections += 1
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.count_lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        self._reply({'audioContent': self.server.audio})
+
+    def do_GET(self):
+        self._reply({'voices': []})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_engine_bench(sessions=16, texts=20, latency=0.05, modes=('threads', 'facade', 'async'),
+                     max_workers=6):
+    """Cold-playlist throughput of the thread-based and asyncio engines
+
+    Each of `sessions` concurrent sessions generates `texts` uncached
+    texts through generate_many against a local MockTtsServer. Modes:
+    'threads' is TTSEngine called from one thread per session, 'facade'
+    SyncTTSEngine called the same way, 'async' AsyncTTSEngine with every
+    session on one event loop. Rate limits are lifted so only the engines
+    are measured.
+
+    Returns:
+        list: One dict per mode
+    """
+    from modules.async_tts_engine import AsyncTTSEngine, SyncTTSEngine
+    from modules.tts_engine import TTSEngine
+
+    server = MockTtsServer(latency=latency).start()
+    limits = {'max_workers': max_workers, 'requests_per_second': 10 ** 6,
+              'chars_per_minute': 10 ** 9}
+    engine_classes = {'threads': TTSEngine, 'facade': SyncTTSEngine, 'async': AsyncTTSEngine}
+
+    results = []
+    for mode in modes:
+        tmp_dir = tempfile.mkdtemp(prefix='engine-bench-')
+        engines = []
+        for i in range(sessions):
+            engine = engine_classes[mode](api_key=f"bench-{mode}-{i}", cache_dir=tmp_dir, **limits)
+            engine.base_url = server.url
+            engines.append(engine)
+        playlists = [
+            [f"{mode} session {i} sentence {j}." for j in range(texts)] for i in range(sessions)
+        ]
+        session_seconds = []
+        errors = []
+        peak_threads = threading.active_count()
+        requests_before, connections_before = server.requests, server.connections
+
+        def run_session(engine, playlist):
+            start = time.perf_counter()
+            try:
+                engine.generate_many(playlist)
+            except Exception as e:
+                errors.append(str(e))
+            session_seconds.append(time.perf_counter() - start)
+
+        async def run_session_async(engine, playlist):
+            start = time.perf_counter()
+            try:
+                await engine.generate_many(playlist)
+            except Exception as e:
+                errors.append(str(e))
+            session_seconds.append(time.perf_counter() - start)
+
+        async def run_all_async():
+            await asyncio.gather(*(
+                run_session_async(engine, playlist) for engine, playlist in zip(engines, playlists)
+            ))
+
+        start = time.perf_counter()
+        if mode == 'async':
+            runner = threading.Thread(target=asyncio.run, args=(run_all_async(),))
+            workers = [runner]
+        else:
+            workers = [
+                threading.Thread(target=run_session, args=(engine, playlist))
+                for engine, playlist in zip(engines, playlists)
+            ]
+        for worker in workers:
+            worker.start()
+        while any(worker.is_alive() for worker in workers):
+            peak_threads = max(peak_threads, threading.active_count())
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - start
+
+        session_seconds.sort()
+        results.append({
+            'mode': mode,
+            'requests_per_sec': (server.requests - requests_before) / elapsed,
+            'session_p50_ms': session_seconds[len(session_seconds) // 2] * 1000,
+            'session_max_ms': session_seconds[-1] * 1000,
+            'connections': server.connections - connections_before,
+            'peak_threads': peak_threads,
+            'errors': len(errors)
+        })
+        engines[0].cache.flush()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    server.shutdown()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache stress tests and benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stress = subparsers.add_parser('stress', help="Multi-process get/set/delete consistency test")
+    stress.add_argument('--processes', type=int, default=4)
+    stress.add_argument('--ops', type=int, default=300)
+    stress.add_argument('--shared-keys', type=int, default=50)
+    stress.add_argument('--index-backend', choices=['sqlite', 'pickle'], default='sqlite')
+    stress.add_argument('--cache-dir', default=None)
+    stress.add_argument('--storage', choices=['files', 'segments'], default='files')
+    stress.add_argument('--max-size-mb', type=float, default=0.2,
+                        help="Size limit of the eviction pass (0 = skip it; an unbounded "
+                             "pass always runs)")
+
+    threads = subparsers.add_parser('threads', help="Multithreaded contention benchmark")
+    threads.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    threads.add_argument('--ops', type=int, default=2000)
+    threads.add_argument('--keys', type=int, default=200)
+    threads.add_argument('--write-ratio', type=float, default=0.1)
+    threads.add_argument('--index-backend', choices=['sqlite', 'pickle'], default='sqlite')
+    threads.add_argument('--l1', action='store_true', help="Enable the in-memory L1 tier")
+
+    policies = subparsers.add_parser('policies', help="Replay an access trace per eviction policy")
+    policies.add_argument('--trace', help="Trace file (default: synthetic trace from the sample playlists)")
+    policies.add_argument('--days', type=int, default=14)
+    policies.add_argument('--max-size-mb', type=float, default=1.0)
+    policies.add_argument('--policies', nargs='+', default=['lru', 'tinylfu', 'gds'])
+
+    storage = subparsers.add_parser('storage', help="Compare file-per-entry and segment storage")
+    storage.add_argument('--entries', type=int, default=2000)
+    storage.add_argument('--size-kb', type=int, default=24)
+    storage.add_argument('--segment-size-mb', type=float, default=4)
+
+    shared = subparsers.add_parser('shared', help="Two hosts sharing hits through a RESP server")
+    shared.add_argument('--entries', type=int, default=200)
+    shared.add_argument('--url', default=None,
+                        help="redis:// URL of a real server (default: local stand-in)")
+
+    resp_server = subparsers.add_parser('resp-server', help="Run the stand-in RESP server")
+    resp_server.add_argument('--host', default='127.0.0.1')
+    resp_server.add_argument('--port', type=int, default=6379)
+
+    engines = subparsers.add_parser('engines', help="Thread-based vs asyncio engine throughput")
+    engines.add_argument('--sessions', type=int, default=16)
+    engines.add_argument('--texts', type=int, default=20)
+    engines.add_argument('--latency-ms', type=float, default=50,
+                         help="Mock API response time")
+    engines.add_argument('--max-workers', type=int, default=6)
+    engines.add_argument('--modes', nargs='+', default=['threads', 'facade', 'async'])
+
+    tts_server = subparsers.add_parser('tts-server', help="Run the mock TTS API server")
+    tts_server.add_argument('--host', default='127.0.0.1')
+    tts_server.add_argument('--port', type=int, default=8080)
+    tts_server.add_argument('--latency-ms', type=float, default=50)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'stress':
+        result = run_stress(
+            processes=args.processes,
+            ops=args.ops,
+            shared_keys=args.shared_keys,
+            index_backend=args.index_backend,
+            cache_dir=args.cache_dir,
+            storage=args.storage,
+            max_size_mb=args.max_size_mb or None
+        )
+        for name, value in result.items():
+            print(f"{name}: {value}")
+        return 0 if result['ok'] else 1
+
+    if args.command == 'threads':
+        results = run_thread_contention(
+            thread_counts=args.threads,
+            ops=args.ops,
+            keys=args.keys,
+            write_ratio=args.write_ratio,
+            index_backend=args.index_backend,
+            use_l1=args.l1
+        )
+        print(f"{'threads':>8} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for row in results:
+            print(f"{row['threads']:>8} {row['ops_per_sec']:>10.0f} {row['p50_ms']:>8.3f} "
+                  f"{row['p99_ms']:>8.3f} {row['errors']:>7}")
+        return 0 if not any(row['errors'] for row in results) else 1
+
+    if args.command == 'policies':
+        trace = load_trace(args.trace) if args.trace else build_trace(days=args.days)
+        results = run_policy_replay(trace, policies=args.policies, max_size_mb=args.max_size_mb)
+        print(f"{'policy':>8} {'requests':>9} {'hit %':>7} {'API $':>9} {'saved %':>8}")
+        for row in results:
+            print(f"{row['policy']:>8} {row['requests']:>9} {row['hit_rate']:>7.1f} "
+                  f"{row['cost_usd']:>9.4f} {row['saved_percent']:>8.1f}")
+        return 0
+
+    if args.command == 'storage':
+        results = run_storage_bench(
+            entries=args.entries,
+            size=args.size_kb * 1024,
+            segment_size_mb=args.segment_size_mb
+        )
+        print(f"{'storage':>9} {'writes/s':>9} {'reads/s':>9} {'churn/s':>9} {'files':>6} "
+              f"{'disk MB':>8} {'over %':>7} {'compact s':>10} {'files':>6} {'disk MB':>8} {'ok':>3}")
+        for row in results:
+            print(f"{row['storage']:>9} {row['writes_per_sec']:>9.0f} {row['reads_per_sec']:>9.0f} "
+                  f"{row['churn_per_sec']:>9.0f} {row['files']:>6} {row['disk_mb']:>8.1f} "
+                  f"{row['overhead_percent']:>7.1f} {row['compact_seconds']:>10.3f} "
+                  f"{row['files_compacted']:>6} {row['disk_mb_compacted']:>8.1f} "
+                  f"{'yes' if row['ok'] else 'no':>3}")
+        return 0 if all(row['ok'] for row in results) else 1
+
+    if args.command == 'shared':
+        result = run_shared(entries=args.entries, url=args.url)
+        for name, value in result.items():
+            print(f"{name}: {value}")
+        return 0 if result['ok'] else 1
+
+    if args.command == 'engines':
+        results = run_engine_bench(
+            sessions=args.sessions,
+            texts=args.texts,
+            latency=args.latency_ms / 1000,
+            modes=args.modes,
+            max_workers=args.max_workers
+        )
+        print(f"{'mode':>8} {'req/s':>8} {'p50 ms':>8} {'max ms':>8} {'conns':>6} "
+              f"{'threads':>8} {'errors':>7}")
+        for row in results:
+            print(f"{row['mode']:>8} {row['requests_per_sec']:>8.0f} {row['session_p50_ms']:>8.0f} "
+                  f"{row['session_max_ms']:>8.0f} {row['connections']:>6} "
+                  f"{row['peak_threads']:>8} {row['errors']:>7}")
+        return 0 if not any(row['errors'] for row in results) else 1
+
+    if args.command == 'tts-server':
+        server = MockTtsServer(args.host, args.port, latency=args.latency_ms / 1000)
+        print(f"Serving {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == 'resp-server':
+        server = RespServer(args.host, args.port)
+        print(f"Serving {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
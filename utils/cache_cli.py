@@ -0,0 +1,233 @@
+"""
+Command-line tools for the audio cache
+Run from the project root, e.g.:
+    python -m utils.cache_cli export --voice en-US-Standard-F -o seed.pack
+    python -m utils.cache_cli import seed.pack
+    python -m utils.cache_cli scrub --repair
+    python -m utils.cache_cli compact
+    python -m utils.cache_cli delete --voice en-US-Standard-F --unused --dry-run
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from utils.cache_manager import get_cache_manager
+from utils.cache_pack import PackError
+
+
+def _playlist_keys(playlist_name, voices, db_path, cache_dir):
+    """Cache keys (current and legacy) for every track of a saved playlist in the given voices"""
+    from modules.storage import StorageManager
+    from modules.tts_engine import TTSEngine
+
+    if not Path(db_path).is_file():
+        raise SystemExit(f"Playlist database not found: {db_path}")
+    tracks = StorageManager(db_path=db_path).load_playlist(playlist_name)
+    if tracks is None:
+        raise SystemExit(f"Playlist not found: {playlist_name}")
+
+    engine = TTSEngine(cache_dir=cache_dir)
+    return engine.cache_keys([track['english'] for track in tracks], voices)
+
+
+def _saved_playlist_keys(voices, db_path, cache_dir):
+    """Cache keys of every track of every saved playlist in the given voices
+
+    Exits if the playlist database is missing or unreadable: deleting
+    'unused' entries against an empty playlist set would delete them all.
+    """
+    # StorageManager creates a missing database; don't let a wrong path do that
+    if not Path(db_path).is_file():
+        raise SystemExit(f"Playlist database not found: {db_path}")
+
+    import sqlite3
+    from modules.storage import StorageManager
+    from modules.tts_engine import TTSEngine
+
+    try:
+        texts = StorageManager(db_path=db_path).list_track_texts()
+    except (sqlite3.Error, ValueError, KeyError) as e:
+        raise SystemExit(f"Can't read playlist database {db_path}: {e}")
+    return TTSEngine(cache_dir=cache_dir).cache_keys(texts, voices)
+
+
+def cmd_export(args, cache):
+    keys = None
+    if args.playlist:
+        voices = [args.voice] if args.voice else cache.voices()
+        keys = _playlist_keys(args.playlist, voices, args.db, args.cache_dir)
+
+    selected = cache.select_keys(voice=args.voice, keys=keys, recent=args.recent)
+
+    if args.output == '-':
+        count = cache.export_pack(sys.stdout.buffer, selected)
+    else:
+        with open(args.output, 'wb') as f:
+            count = cache.export_pack(f, selected)
+
+    print(f"Exported {count} entries", file=sys.stderr)
+    return 0
+
+
+def cmd_import(args, cache):
+    try:
+        if args.pack == '-':
+            result = cache.import_pack(sys.stdin.buffer)
+        else:
+            with open(args.pack, 'rb') as f:
+                result = cache.import_pack(f)
+    except PackError as e:
+        # Entries read before the error passed their own checksums and were kept
+        print(f"Import stopped: {e}", file=sys.stderr)
+        return 2
+
+    print(
+        f"Imported {result['imported']}, skipped {result['skipped']} already present, "
+        f"{result['corrupt']} corrupt",
+        file=sys.stderr
+    )
+    return 0 if not result['corrupt'] else 1
+
+
+def cmd_scrub(args, cache):
+    cache.scrubber.bytes_per_second = int(args.rate * 1024 * 1024)
+    report = cache.scrubber.run(budget=args.budget, repair=args.repair)
+
+    problems = report['missing'] + report['truncated'] + report['corrupt'] + report['orphans']
+    print(
+        f"Checked {report['checked']} entries ({report['bytes'] / (1024 * 1024):.1f} MB): "
+        f"{report['missing']} missing, {report['truncated']} truncated, "
+        f"{report['corrupt']} corrupt, {report['orphans']} orphaned files",
+        file=sys.stderr
+    )
+    if args.repair and report['repaired']:
+        print(f"Repaired {report['repaired']}", file=sys.stderr)
+    if not report['done']:
+        print("Budget reached; run again to continue", file=sys.stderr)
+    return 0 if args.repair or not problems else 1
+
+
+def cmd_compact(args, cache):
+    # A running server may still append to a segment idle for less than
+    # idle_seal; compacting it would lose those records
+    if args.grace <= cache.segments.idle_seal:
+        print(
+            f"--grace must be more than {cache.segments.idle_seal:g} seconds "
+            f"(the idle time after which a segment is sealed)",
+            file=sys.stderr
+        )
+        return 2
+
+    result = cache.compact_segments(
+        budget=args.budget,
+        live_ratio=args.live_ratio,
+        grace_seconds=args.grace
+    )
+    # Compacted segments are normally deleted on a later pass. Another
+    # process may have looked up an entry's old location just before it
+    # moved, so wait out the same retire delay before deleting them.
+    if result['compacted']:
+        print(
+            f"Waiting {cache.segments.retire_delay:g} seconds before deleting "
+            f"compacted segments",
+            file=sys.stderr
+        )
+        time.sleep(cache.segments.retire_delay)
+        result['freed'] += cache.segments.purge_retired()
+    print(
+        f"Compacted {result['compacted']} segments ({result['moved']} entries moved), "
+        f"freed {result['freed'] / (1024 * 1024):.1f} MB",
+        file=sys.stderr
+    )
+    return 0
+
+
+def cmd_delete(args, cache):
+    now = datetime.now()
+    keep = None
+    if args.unused:
+        voices = [args.voice] if args.voice else cache.voices()
+        keep = _saved_playlist_keys(voices, args.db, args.cache_dir)
+
+    result = cache.delete_matching(
+        voice=args.voice,
+        created_before=now - timedelta(days=args.older_than) if args.older_than else None,
+        created_after=now - timedelta(days=args.newer_than) if args.newer_than else None,
+        min_size=int(args.min_size_kb * 1024) if args.min_size_kb else None,
+        search=args.search,
+        keep=keep,
+        dry_run=args.dry_run
+    )
+    verb = "Would delete" if args.dry_run else "Deleted"
+    print(
+        f"{verb} {result['entries']} entries ({result['bytes'] / (1024 * 1024):.1f} MB)",
+        file=sys.stderr
+    )
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audio cache tools")
+    parser.add_argument('--cache-dir', default='data/cache')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export = subparsers.add_parser('export', help="Export entries into a cache pack")
+    export.add_argument('-o', '--output', default='-', help="Pack file ('-' for stdout)")
+    export.add_argument('--voice', help="Only entries generated with this voice")
+    export.add_argument('--playlist', help="Only tracks of this saved playlist")
+    export.add_argument('--db', default='data/playlists.db', help="Playlist database")
+    export.add_argument('--recent', type=int, help="Only the N most recently used entries")
+
+    import_ = subparsers.add_parser('import', help="Import a cache pack")
+    import_.add_argument('pack', help="Pack file ('-' for stdin)")
+
+    scrub = subparsers.add_parser('scrub', help="Check entries against the index (fsck)")
+    scrub.add_argument('--repair', action='store_true',
+                       help="Remove broken entries and orphaned files")
+    scrub.add_argument('--budget', type=float,
+                       help="Stop after this many seconds and resume from there next run")
+    scrub.add_argument('--rate', type=float, default=0,
+                       help="Read at most this many MB/s (0 = unlimited)")
+
+    compact = subparsers.add_parser('compact', help="Reclaim space in segment files")
+    compact.add_argument('--budget', type=float, help="Stop after this many seconds")
+    compact.add_argument('--live-ratio', type=float, default=0.5,
+                         help="Compact segments with less than this fraction still in use")
+    compact.add_argument('--grace', type=float, default=3600,
+                         help="Skip segments modified within this many seconds "
+                              "(more than the segment idle-seal time)")
+
+    delete = subparsers.add_parser('delete', help="Delete entries matching every given filter")
+    delete.add_argument('--voice', help="Only entries generated with this voice")
+    delete.add_argument('--older-than', type=float, help="Only entries created over N days ago")
+    delete.add_argument('--newer-than', type=float, help="Only entries created in the last N days")
+    delete.add_argument('--min-size-kb', type=float, help="Only entries of at least N KB")
+    delete.add_argument('--search', help="Only entries whose text contains this")
+    delete.add_argument('--unused', action='store_true',
+                        help="Only entries not used by any saved playlist")
+    delete.add_argument('--db', default='data/playlists.db', help="Playlist database")
+    delete.add_argument('--dry-run', action='store_true',
+                        help="Only report what would be deleted")
+
+    args = parser.parse_args(argv)
+    cache = get_cache_manager(cache_dir=args.cache_dir, janitor_interval=None)
+
+    try:
+        if args.command == 'export':
+            return cmd_export(args, cache)
+        if args.command == 'import':
+            return cmd_import(args, cache)
+        if args.command == 'scrub':
+            return cmd_scrub(args, cache)
+        if args.command == 'compact':
+            return cmd_compact(args, cache)
+        if args.command == 'delete':
+            return cmd_delete(args, cache)
+    finally:
+        cache.flush()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
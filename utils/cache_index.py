@@ -0,0 +1,1030 @@
+"""
+Cache index backends for CacheManager
+Keeps per-entry metadata (timestamps, size) and the persistent hit/miss stats
+
+Eviction order is by priority: last access time plus the entry's `weight`
+(seconds of extra retention, set by the eviction policy; 0 = plain LRU).
+
+Entries can also be referenced by tenants (see CacheManager's tenant
+quotas): each reference has its own last access time, and every tenant
+referencing an entry is charged its full size.
+"""
+import heapq
+import json
+import pickle
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from utils.cache_metrics import record_latency
+from utils.file_lock import atomic_write, get_file_lock
+
+# Orders entries can be browsed in (see query)
+SORT_COLUMNS = ('last_accessed', 'created_at', 'size')
+
+
+def _empty_stats():
+    """Default persistent stats counters"""
+    return {
+        'total_requests': 0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'l1_hits': 0,
+        'l2_hits': 0
+    }
+
+
+class PickleIndex:
+    """Index kept as one pickled dict, with an append-only access journal
+
+    last_accessed updates are written behind: buffered accesses are appended
+    to the journal in batches and folded into index.pkl after a number of
+    journal records, after a time interval, or on flush().
+
+    Tenant references live in each entry's metadata ('tenants': tenant ->
+    access timestamp) and are merged into the on-disk index on commit.
+    """
+
+    def __init__(self, index_file, journal_file, journal_batch=16,
+                 checkpoint_every=500, checkpoint_interval=60):
+        self.index_file = index_file
+        self.journal_file = journal_file
+        self.journal_batch = journal_batch
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+
+        # Serializes index/journal writes across processes sharing the cache
+        self.lock = get_file_lock(index_file.with_name('.index.lock'))
+
+        with self.lock:
+            self.entries, self.stats = self._load()
+            self._dirty = self._fold_journal(self.entries) > 0
+
+        # Local changes since the last commit, merged into the on-disk index
+        self._written = set()
+        self._removed = {}
+        self._stats_base = dict(self.stats)
+        # key -> {tenant: timestamp or None (dropped)}
+        self._ref_changes = {}
+
+        self._pending_access = {}
+        self._journal_records = 0
+        self._last_checkpoint = time.monotonic()
+        self._reset_accounting()
+
+    def _load(self):
+        """Load cache index and stats from disk"""
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, 'rb') as f:
+                    data = pickle.load(f)
+
+                # Handle new format with stats
+                if isinstance(data, dict) and 'index' in data and 'stats' in data:
+                    return data['index'], data['stats']
+                # Handle old format (backward compatibility)
+                else:
+                    return data, _empty_stats()
+            except Exception:
+                return {}, _empty_stats()
+        return {}, _empty_stats()
+
+    def commit(self):
+        """Merge local changes into the on-disk index and save it
+
+        Under the cross-process lock the current index.pkl and the shared
+        journal are re-read; this process's puts, removes, newer access
+        times and stat increments are applied on top, and the result is
+        written atomically. The journal is then truncated.
+        """
+        start = time.perf_counter()
+        with self.lock:
+            merged, disk_stats = self._load()
+
+            # Don't drop an entry another process re-created after our removal
+            for key, removed_at in self._removed.items():
+                other = merged.get(key)
+                if other is not None and other['created_at'] <= removed_at:
+                    del merged[key]
+            for key in self._written:
+                if key in self.entries:
+                    merged[key] = self.entries[key]
+            for key, metadata in self.entries.items():
+                other = merged.get(key)
+                if other is not None and metadata['last_accessed'] > other['last_accessed']:
+                    other['last_accessed'] = metadata['last_accessed']
+            for key, changes in self._ref_changes.items():
+                other = merged.get(key)
+                if other is not None:
+                    self._apply_ref_changes(other, changes)
+            self._fold_journal(merged)
+
+            for name, value in self.stats.items():
+                disk_stats[name] = disk_stats.get(name, 0) + value - self._stats_base.get(name, 0)
+
+            atomic_write(self.index_file, pickle.dumps({
+                'index': merged,
+                'stats': disk_stats
+            }))
+            if self.journal_file.exists():
+                self.journal_file.write_bytes(b'')
+
+        self._merge_accounting(merged)
+        self.entries = merged
+        self.stats.clear()
+        self.stats.update(disk_stats)
+        self._stats_base = dict(disk_stats)
+        self._written.clear()
+        self._removed.clear()
+        self._ref_changes.clear()
+        self._pending_access.clear()
+        self._journal_records = 0
+        self._dirty = False
+        self._last_checkpoint = time.monotonic()
+        if len(self._lru_heap) > 2 * len(self.entries) + 64:
+            self._rebuild_heap()
+        # Saved with the next commit
+        record_latency(self.stats, 'index_save', time.perf_counter() - start)
+
+    def flush(self):
+        """Fold buffered accesses and stats into index.pkl"""
+        if self._dirty:
+            self.commit()
+
+    def mark_dirty(self):
+        """Note an in-memory change (e.g. stats) to persist on next flush"""
+        self._dirty = True
+
+    def _fold_journal(self, entries):
+        """Apply journaled access times to entries; returns records applied"""
+        try:
+            lines = self.journal_file.read_text().splitlines()
+        except OSError:
+            return 0
+
+        applied = 0
+        for line in lines:
+            # A torn final line from a crash is simply skipped
+            try:
+                key, timestamp = line.split('\t')
+                accessed = datetime.fromtimestamp(float(timestamp))
+            except ValueError:
+                continue
+
+            metadata = entries.get(key)
+            if metadata and accessed > metadata['last_accessed']:
+                metadata['last_accessed'] = accessed
+                applied += 1
+        return applied
+
+    def _merge_accounting(self, merged):
+        """Carry the byte total and priority heap over to merged entries
+
+        Local puts, removes and touches are already accounted for; only
+        entries another process added, removed, resized or accessed
+        differ here. Heap records of unchanged entries stay valid.
+        """
+        for key, metadata in self.entries.items():
+            if key not in merged:
+                self._total_size -= metadata['size']
+
+        for key, metadata in merged.items():
+            current = self.entries.get(key)
+            if current is None:
+                self._total_size += metadata['size']
+            else:
+                self._total_size += metadata['size'] - current['size']
+                if self._priority(metadata) == self._priority(current):
+                    continue
+            heapq.heappush(self._lru_heap, (self._priority(metadata), key))
+
+    def _reset_accounting(self):
+        """Recompute the running byte total and the recency heap"""
+        self._total_size = sum(meta['size'] for meta in self.entries.values())
+        self._rebuild_heap()
+
+    @staticmethod
+    def _priority(metadata):
+        """Eviction priority: last access plus weight, lowest evicted first"""
+        return metadata['last_accessed'].timestamp() + metadata.get('weight', 0)
+
+    def _rebuild_heap(self):
+        """Rebuild the priority heap from current entries"""
+        self._lru_heap = [
+            (self._priority(meta), key) for key, meta in self.entries.items()
+        ]
+        heapq.heapify(self._lru_heap)
+
+    def _append_journal(self):
+        """Append buffered accesses to the journal in a single write"""
+        if not self._pending_access:
+            return
+
+        lines = ''.join(
+            f"{key}\t{accessed.timestamp()}\n"
+            for key, accessed in self._pending_access.items()
+        )
+        try:
+            with self.lock, open(self.journal_file, 'a') as f:
+                f.write(lines)
+        except OSError as e:
+            print(f"Cache journal write error: {e}")
+            return
+
+        self._journal_records += len(self._pending_access)
+        self._pending_access.clear()
+
+    def get(self, key):
+        """Get metadata dict for key, or None"""
+        return self.entries.get(key)
+
+    def get_many(self, keys):
+        """Get {key: metadata} for the keys that are present"""
+        return {key: self.entries[key] for key in keys if key in self.entries}
+
+    def _push_recency(self, key, metadata):
+        """Push a priority record; superseded records are skipped lazily"""
+        heapq.heappush(self._lru_heap, (self._priority(metadata), key))
+
+        # Drop stale records once they outnumber live entries
+        if len(self._lru_heap) > 2 * len(self.entries) + 64:
+            self._rebuild_heap()
+
+    def put(self, key, metadata):
+        """Insert or replace metadata for key (keeping its tenant references)"""
+        old = self.entries.get(key)
+        if old is not None:
+            self._total_size -= old['size']
+            if old.get('tenants'):
+                metadata = dict(metadata, tenants=dict(old['tenants'], **metadata.get('tenants', {})))
+        self.entries[key] = metadata
+        self._written.add(key)
+        self._removed.pop(key, None)
+        self._total_size += metadata['size']
+        self._push_recency(key, metadata)
+
+    def put_many(self, items):
+        """Insert many (key, metadata) pairs"""
+        for key, metadata in items:
+            self.put(key, metadata)
+
+    def remove(self, key):
+        """Remove key from the index (no-op if absent)"""
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self._total_size -= old['size']
+        self._removed[key] = datetime.now()
+        self._written.discard(key)
+        self._pending_access.pop(key, None)
+
+    def remove_many(self, keys):
+        """Remove many keys (saved by the next commit)"""
+        for key in keys:
+            self.remove(key)
+
+    def touch(self, key, accessed, tenant=None):
+        """Record an access (referencing key for tenant); written behind via the journal"""
+        metadata = self.entries.get(key)
+        if metadata is None:
+            return
+        metadata['last_accessed'] = accessed
+        self._push_recency(key, metadata)
+        if tenant is not None:
+            self._change_ref(key, tenant, accessed.timestamp())
+        self._pending_access[key] = accessed
+        self._dirty = True
+
+        if len(self._pending_access) >= self.journal_batch:
+            self._append_journal()
+
+        if (self._journal_records >= self.checkpoint_every or
+                time.monotonic() - self._last_checkpoint >= self.checkpoint_interval):
+            self.commit()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def keys(self):
+        return list(self.entries.keys())
+
+    def items(self):
+        return list(self.entries.items())
+
+    def scan(self, after='', limit=100):
+        """Up to limit (key, metadata) pairs with key > after, in key order"""
+        keys = heapq.nsmallest(limit, (key for key in self.entries if key > after))
+        return [(key, self.entries[key]) for key in keys]
+
+    def total_size(self):
+        """Total bytes of all entries (running total)"""
+        return self._total_size
+
+    def query(self, search=None, sort='last_accessed', descending=True, offset=0, limit=20):
+        """One page of (key, metadata) pairs, optionally filtered by text preview substring
+
+        Returns:
+            tuple: (number of matching entries, list of (key, metadata))
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        needle = search.lower() if search else None
+        matches = [
+            (key, metadata) for key, metadata in self.entries.items()
+            if needle is None or needle in metadata.get('text_preview', '').lower()
+        ]
+        matches.sort(key=lambda item: item[1][sort], reverse=descending)
+        return len(matches), matches[offset:offset + limit]
+
+    def count_created_before(self, cutoff):
+        return sum(metadata['created_at'] < cutoff for metadata in self.entries.values())
+
+    def matching(self, voice=None, created_before=None, created_after=None, min_size=None,
+                 search=None):
+        """(key, size) of every entry matching all the given filters (see SqliteIndex)"""
+        needle = search.lower() if search else None
+        return [
+            (key, metadata['size']) for key, metadata in self.entries.items()
+            if (voice is None or metadata.get('voice') == voice) and
+            (created_before is None or metadata['created_at'] < created_before) and
+            (created_after is None or metadata['created_at'] >= created_after) and
+            (min_size is None or metadata['size'] >= min_size) and
+            (needle is None or needle in metadata.get('text_preview', '').lower())
+        ]
+
+    def voices(self):
+        """Distinct voices of the entries, sorted"""
+        return sorted({metadata.get('voice') for metadata in self.entries.values()} - {None, ''})
+
+    def missing_metadata(self, limit=100):
+        """Keys of legacy .pkl entries whose voice/text preview aren't indexed yet"""
+        keys = [
+            key for key, metadata in self.entries.items()
+            if 'format' not in metadata and 'text_preview' not in metadata
+        ]
+        return keys[:limit]
+
+    def eviction_victims(self, bytes_needed, peek=False):
+        """Lowest-priority (key, size) pairs covering bytes_needed
+
+        Pops only the returned victims (plus stale heap records); callers
+        are expected to remove every returned key, unless peek is set.
+        """
+        victims = []
+        records = []
+        freed = 0
+        while self._lru_heap and freed < bytes_needed:
+            priority, key = heapq.heappop(self._lru_heap)
+            metadata = self.entries.get(key)
+            if metadata is None or self._priority(metadata) != priority:
+                continue
+            victims.append((key, metadata['size']))
+            records.append((priority, key))
+            freed += metadata['size']
+
+        if peek:
+            for record in records:
+                heapq.heappush(self._lru_heap, record)
+        return victims
+
+    def expired_keys(self, cutoff, limit=None):
+        """Keys created before cutoff (at most limit of them)"""
+        expired = [
+            key for key, metadata in self.entries.items()
+            if metadata['created_at'] < cutoff
+        ]
+        return expired[:limit] if limit else expired
+
+    @staticmethod
+    def _apply_ref_changes(metadata, changes):
+        tenants = dict(metadata.get('tenants', {}))
+        for tenant, timestamp in changes.items():
+            if timestamp is None:
+                tenants.pop(tenant, None)
+            else:
+                tenants[tenant] = max(timestamp, tenants.get(tenant, 0))
+        metadata['tenants'] = tenants
+
+    def _change_ref(self, key, tenant, timestamp):
+        """Add/refresh (timestamp) or drop (None) a reference, merged on commit"""
+        self._ref_changes.setdefault(key, {})[tenant] = timestamp
+        metadata = self.entries.get(key)
+        if metadata is not None:
+            self._apply_ref_changes(metadata, {tenant: timestamp})
+        self._dirty = True
+
+    def add_refs(self, tenant, keys, accessed):
+        """Reference present keys for tenant"""
+        for key in keys:
+            if key in self.entries:
+                self._change_ref(key, tenant, accessed.timestamp())
+
+    def remove_refs(self, tenant, keys):
+        """Drop tenant's references to keys
+
+        Returns:
+            list: Those keys no tenant references any more
+        """
+        unreferenced = []
+        for key in keys:
+            self._change_ref(key, tenant, None)
+            metadata = self.entries.get(key)
+            if metadata is not None and not metadata.get('tenants'):
+                unreferenced.append(key)
+        return unreferenced
+
+    def tenant_usage(self, tenant=None):
+        """{tenant: {'items': n, 'bytes': n}}, for one tenant or all"""
+        usage = {}
+        for metadata in self.entries.values():
+            for name in metadata.get('tenants', {}):
+                if tenant is None or name == tenant:
+                    totals = usage.setdefault(name, {'items': 0, 'bytes': 0})
+                    totals['items'] += 1
+                    totals['bytes'] += metadata['size']
+        return usage
+
+    def tenant_victims(self, tenant, bytes_needed):
+        """Tenant's least recently used (key, size) references covering bytes_needed"""
+        refs = sorted(
+            (metadata['tenants'][tenant], key, metadata['size'])
+            for key, metadata in self.entries.items()
+            if tenant in metadata.get('tenants', {})
+        )
+
+        victims = []
+        freed = 0
+        for _, key, size in refs:
+            if freed >= bytes_needed:
+                break
+            victims.append((key, size))
+            freed += size
+        return victims
+
+    def close(self):
+        self.flush()
+
+
+class SqliteIndex:
+    """Index kept in a SQLite table with indexed LRU/TTL/size columns
+
+    Totals are maintained by triggers so item count and byte size are O(1).
+    last_accessed updates are buffered and written in one transaction after
+    a batch of accesses or a time interval, or on flush().
+    """
+
+    # Columns with their own index; everything else lives in the meta JSON
+    _COLUMNS = ('created_at', 'last_accessed', 'size', 'weight')
+
+    def __init__(self, db_file, journal_batch=16, checkpoint_interval=60):
+        self.db_file = db_file
+        self.journal_batch = journal_batch
+        self.checkpoint_interval = checkpoint_interval
+
+        # Other processes may hold the write lock briefly; wait for them
+        # Autocommit mode: single statements commit immediately and batches
+        # use explicit transactions, so no write lock is held between calls
+        self.conn = sqlite3.connect(
+            str(db_file), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._init_db()
+        self.stats = self._load_stats()
+        self._stats_base = dict(self.stats)
+        self._pending_access = {}
+        # (tenant, key) -> access time, written with _pending_access
+        self._pending_refs = {}
+        self._dirty = False
+        self._last_checkpoint = time.monotonic()
+
+    def _init_db(self):
+        """Create entries table, indexes, running totals and stats"""
+        cursor = self.conn.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+
+        cursor.executescript('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                size INTEGER NOT NULL,
+                meta TEXT NOT NULL DEFAULT '{}',
+                weight REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_last_accessed ON entries(last_accessed);
+            CREATE INDEX IF NOT EXISTS idx_entries_created_at ON entries(created_at);
+            CREATE INDEX IF NOT EXISTS idx_entries_size ON entries(size);
+
+            CREATE TABLE IF NOT EXISTS totals (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                items INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO totals (id, items, bytes) VALUES (1, 0, 0);
+
+            CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+                UPDATE totals SET items = items + 1, bytes = bytes + NEW.size WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+                UPDATE totals SET items = items - 1, bytes = bytes - OLD.size WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries BEGIN
+                UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 1;
+            END;
+
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS refs (
+                tenant TEXT NOT NULL,
+                key TEXT NOT NULL,
+                last_accessed REAL NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (tenant, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_refs_key ON refs(key);
+            CREATE INDEX IF NOT EXISTS idx_refs_tenant_accessed ON refs(tenant, last_accessed);
+
+            CREATE TABLE IF NOT EXISTS tenant_totals (
+                tenant TEXT PRIMARY KEY,
+                items INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            );
+
+            CREATE TRIGGER IF NOT EXISTS refs_insert AFTER INSERT ON refs BEGIN
+                INSERT OR IGNORE INTO tenant_totals (tenant, items, bytes) VALUES (NEW.tenant, 0, 0);
+                UPDATE tenant_totals SET items = items + 1, bytes = bytes + NEW.size
+                    WHERE tenant = NEW.tenant;
+            END;
+            CREATE TRIGGER IF NOT EXISTS refs_delete AFTER DELETE ON refs BEGIN
+                UPDATE tenant_totals SET items = items - 1, bytes = bytes - OLD.size
+                    WHERE tenant = OLD.tenant;
+            END;
+            CREATE TRIGGER IF NOT EXISTS refs_resize AFTER UPDATE OF size ON refs BEGIN
+                UPDATE tenant_totals SET bytes = bytes - OLD.size + NEW.size
+                    WHERE tenant = NEW.tenant;
+            END;
+
+            -- References follow their entry: resized with it, removed with it
+            CREATE TRIGGER IF NOT EXISTS entries_resize_refs AFTER UPDATE OF size ON entries BEGIN
+                UPDATE refs SET size = NEW.size WHERE key = NEW.key;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_delete_refs AFTER DELETE ON entries BEGIN
+                DELETE FROM refs WHERE key = OLD.key;
+            END;
+        ''')
+
+        # Databases created before eviction weights existed
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(entries)')]
+        if 'weight' not in columns:
+            try:
+                cursor.execute('ALTER TABLE entries ADD COLUMN weight REAL NOT NULL DEFAULT 0')
+            except sqlite3.OperationalError:
+                # Added by another process in the meantime
+                pass
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_entries_priority ON entries(last_accessed + weight)'
+        )
+
+        self._search_index = self._init_search_index(cursor)
+
+    def _init_search_index(self, cursor):
+        """Trigram full-text index over text previews, kept in sync by triggers
+
+        Needs FTS5 with the trigram tokenizer (SQLite 3.34+); without it
+        search scans the table instead.
+
+        Returns:
+            bool: Whether the index is available
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'entries_text'"
+        ).fetchone()
+        if not exists:
+            try:
+                with self._transaction():
+                    cursor.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS entries_text "
+                        "USING fts5(text, tokenize='trigram')"
+                    )
+                    # Entries written before the index existed
+                    cursor.execute(
+                        "INSERT INTO entries_text (rowid, text) "
+                        "SELECT rowid, json_extract(meta, '$.text_preview') FROM entries "
+                        "WHERE rowid NOT IN (SELECT rowid FROM entries_text)"
+                    )
+            except sqlite3.OperationalError:
+                return False
+
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS entries_text_insert AFTER INSERT ON entries BEGIN
+                INSERT INTO entries_text (rowid, text)
+                    VALUES (NEW.rowid, json_extract(NEW.meta, '$.text_preview'));
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_text_update AFTER UPDATE OF meta ON entries BEGIN
+                UPDATE entries_text SET text = json_extract(NEW.meta, '$.text_preview')
+                    WHERE rowid = NEW.rowid;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_text_delete AFTER DELETE ON entries BEGIN
+                DELETE FROM entries_text WHERE rowid = OLD.rowid;
+            END;
+        ''')
+        return True
+
+    def _load_stats(self):
+        """Load persistent stats counters"""
+        stats = _empty_stats()
+        for name, value in self.conn.execute('SELECT name, value FROM stats'):
+            stats[name] = value
+        return stats
+
+    def is_empty(self):
+        """True if the table has never been populated"""
+        return self.conn.execute('SELECT items FROM totals WHERE id = 1').fetchone()[0] == 0
+
+    def _row_to_metadata(self, row):
+        created_at, last_accessed, size, weight, meta = row
+        metadata = json.loads(meta)
+        metadata['created_at'] = datetime.fromtimestamp(created_at)
+        metadata['last_accessed'] = datetime.fromtimestamp(last_accessed)
+        metadata['size'] = size
+        metadata['weight'] = weight
+        return metadata
+
+    @contextmanager
+    def _transaction(self):
+        """Run a batch of statements in one write transaction"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def commit(self):
+        """Write buffered accesses and stats in one transaction
+
+        Stats are written as increments since the last commit so that
+        processes sharing the database don't overwrite each other's counts.
+        """
+        start = time.perf_counter()
+        with self._transaction():
+            self._write_pending()
+
+        self.stats.update(self._load_stats())
+        self._stats_base = dict(self.stats)
+        self._dirty = False
+        self._last_checkpoint = time.monotonic()
+        # Saved with the next commit
+        record_latency(self.stats, 'index_save', time.perf_counter() - start)
+
+    def _write_pending(self):
+        """Write buffered access times, tenant references and stat increments"""
+        if self._pending_access:
+            self.conn.executemany(
+                'UPDATE entries SET last_accessed = ? WHERE key = ? AND last_accessed < ?',
+                [(ts, key, ts) for key, ts in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+
+        if self._pending_refs:
+            self._upsert_refs(
+                (tenant, key, ts) for (tenant, key), ts in self._pending_refs.items()
+            )
+            self._pending_refs.clear()
+
+        self.conn.executemany(
+            'INSERT INTO stats (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            [
+                (name, value - self._stats_base.get(name, 0))
+                for name, value in self.stats.items()
+                if value != self._stats_base.get(name, 0)
+            ]
+        )
+
+    def flush(self):
+        """Persist buffered accesses and stats if anything changed"""
+        if self._dirty or self._pending_access or self._pending_refs:
+            self.commit()
+
+    def mark_dirty(self):
+        """Note an in-memory change (e.g. stats) to persist on next flush"""
+        self._dirty = True
+
+    def get(self, key):
+        """Get metadata dict for key, or None"""
+        row = self.conn.execute(
+            'SELECT created_at, last_accessed, size, weight, meta FROM entries WHERE key = ?',
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        metadata = self._row_to_metadata(row)
+        if key in self._pending_access:
+            metadata['last_accessed'] = datetime.fromtimestamp(self._pending_access[key])
+        return metadata
+
+    def get_many(self, keys):
+        """Get {key: metadata} for the keys that are present, in few queries"""
+        keys = list(keys)
+        found = {}
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.conn.execute(
+                'SELECT key, created_at, last_accessed, size, weight, meta FROM entries '
+                f'WHERE key IN ({placeholders})',
+                chunk
+            ):
+                metadata = self._row_to_metadata(row[1:])
+                if row[0] in self._pending_access:
+                    metadata['last_accessed'] = datetime.fromtimestamp(self._pending_access[row[0]])
+                found[row[0]] = metadata
+        return found
+
+    def put(self, key, metadata):
+        """Insert or replace metadata for key"""
+        extra = {k: v for k, v in metadata.items() if k not in self._COLUMNS}
+        self.conn.execute(
+            'INSERT INTO entries (key, created_at, last_accessed, size, weight, meta) '
+            'VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET created_at = excluded.created_at, '
+            'last_accessed = excluded.last_accessed, size = excluded.size, '
+            'weight = excluded.weight, meta = excluded.meta',
+            (
+                key,
+                metadata['created_at'].timestamp(),
+                metadata['last_accessed'].timestamp(),
+                metadata['size'],
+                metadata.get('weight', 0),
+                json.dumps(extra)
+            )
+        )
+        self._pending_access.pop(key, None)
+
+    def put_many(self, items):
+        """Insert many (key, metadata) pairs in one transaction"""
+        with self._transaction():
+            for key, metadata in items:
+                self.put(key, metadata)
+
+    def remove(self, key):
+        """Remove key from the index (no-op if absent)"""
+        self.conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+        self._pending_access.pop(key, None)
+
+    def remove_many(self, keys):
+        """Remove many keys in one transaction"""
+        with self._transaction():
+            self.conn.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key in keys])
+        for key in keys:
+            self._pending_access.pop(key, None)
+
+    def touch(self, key, accessed, tenant=None):
+        """Record an access (referencing key for tenant); written behind in batches"""
+        self._pending_access[key] = accessed.timestamp()
+        if tenant is not None:
+            self._pending_refs[(tenant, key)] = accessed.timestamp()
+
+        if (len(self._pending_access) >= self.journal_batch or
+                time.monotonic() - self._last_checkpoint >= self.checkpoint_interval):
+            self.commit()
+
+    def __contains__(self, key):
+        return self.conn.execute(
+            'SELECT 1 FROM entries WHERE key = ?', (key,)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute('SELECT items FROM totals WHERE id = 1').fetchone()[0]
+
+    def keys(self):
+        return [row[0] for row in self.conn.execute('SELECT key FROM entries')]
+
+    def items(self):
+        self.flush()
+        return [
+            (row[0], self._row_to_metadata(row[1:]))
+            for row in self.conn.execute(
+                'SELECT key, created_at, last_accessed, size, weight, meta FROM entries'
+            )
+        ]
+
+    def scan(self, after='', limit=100):
+        """Up to limit (key, metadata) pairs with key > after, in key order"""
+        return [
+            (row[0], self._row_to_metadata(row[1:]))
+            for row in self.conn.execute(
+                'SELECT key, created_at, last_accessed, size, weight, meta FROM entries '
+                'WHERE key > ? ORDER BY key LIMIT ?',
+                (after, limit)
+            )
+        ]
+
+    def total_size(self):
+        """Total bytes of all entries"""
+        return self.conn.execute('SELECT bytes FROM totals WHERE id = 1').fetchone()[0]
+
+    def _search_clause(self, search):
+        """Condition and parameters matching a text preview substring"""
+        if self._search_index and len(search) >= 3:
+            return (
+                'rowid IN (SELECT rowid FROM entries_text WHERE entries_text MATCH ?)',
+                ['"' + search.replace('"', '""') + '"']
+            )
+        # Shorter than one trigram (or no full-text index): scan
+        pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return (
+            "json_extract(meta, '$.text_preview') LIKE ? ESCAPE '\\'",
+            [f'%{pattern}%']
+        )
+
+    def query(self, search=None, sort='last_accessed', descending=True, offset=0, limit=20):
+        """One page of (key, metadata) pairs, optionally filtered by text preview substring
+
+        Sorting uses the column indexes and search the trigram index, so a
+        page costs about the same however large the table is.
+
+        Returns:
+            tuple: (number of matching entries, list of (key, metadata))
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        # Sorting by last access needs the buffered access times
+        self.flush()
+
+        where, params = '', []
+        if search:
+            condition, params = self._search_clause(search)
+            where = f'WHERE {condition}'
+        if where:
+            total = self.conn.execute(f'SELECT COUNT(*) FROM entries {where}', params).fetchone()[0]
+        else:
+            total = len(self)
+
+        rows = self.conn.execute(
+            'SELECT key, created_at, last_accessed, size, weight, meta FROM entries '
+            f'{where} ORDER BY {sort} {"DESC" if descending else "ASC"} LIMIT ? OFFSET ?',
+            params + [limit, offset]
+        )
+        return total, [(row[0], self._row_to_metadata(row[1:])) for row in rows]
+
+    def count_created_before(self, cutoff):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM entries WHERE created_at < ?', (cutoff.timestamp(),)
+        ).fetchone()[0]
+
+    def matching(self, voice=None, created_before=None, created_after=None, min_size=None,
+                 search=None):
+        """(key, size) of every entry matching all the given filters
+
+        Args:
+            voice: Generated with this voice
+            created_before: Created before this datetime
+            created_after: Created at or after this datetime
+            min_size: At least this many bytes
+            search: Case-insensitive substring of the text preview
+        """
+        conditions, params = [], []
+        if voice is not None:
+            conditions.append("json_extract(meta, '$.voice') = ?")
+            params.append(voice)
+        if created_before is not None:
+            conditions.append('created_at < ?')
+            params.append(created_before.timestamp())
+        if created_after is not None:
+            conditions.append('created_at >= ?')
+            params.append(created_after.timestamp())
+        if min_size is not None:
+            conditions.append('size >= ?')
+            params.append(min_size)
+        if search:
+            condition, search_params = self._search_clause(search)
+            conditions.append(condition)
+            params.extend(search_params)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self.conn.execute(f'SELECT key, size FROM entries {where}', params).fetchall()
+
+    def voices(self):
+        """Distinct voices of the entries, sorted"""
+        return [
+            row[0] for row in self.conn.execute(
+                "SELECT DISTINCT json_extract(meta, '$.voice') AS voice FROM entries "
+                "WHERE voice IS NOT NULL AND voice != '' ORDER BY voice"
+            )
+        ]
+
+    def missing_metadata(self, limit=100):
+        """Keys of legacy .pkl entries whose voice/text preview aren't indexed yet
+
+        Rows migrated from an index.pkl that predates raw .mp3 entries
+        carry only timestamps and size.
+        """
+        return [
+            row[0] for row in self.conn.execute(
+                "SELECT key FROM entries WHERE json_type(meta, '$.format') IS NULL "
+                "AND json_type(meta, '$.text_preview') IS NULL LIMIT ?",
+                (limit,)
+            )
+        ]
+
+    def eviction_victims(self, bytes_needed, peek=False):
+        """Lowest-priority (key, size) pairs covering bytes_needed
+
+        Never modifies the index, so peek makes no difference here.
+        """
+        self.flush()
+        cursor = self.conn.execute('SELECT key, size FROM entries ORDER BY last_accessed + weight')
+
+        victims = []
+        freed = 0
+        for key, size in cursor:
+            if freed >= bytes_needed:
+                break
+            victims.append((key, size))
+            freed += size
+        cursor.close()
+        return victims
+
+    def expired_keys(self, cutoff, limit=None):
+        """Keys created before cutoff, oldest first (at most limit of them)"""
+        return [
+            row[0] for row in self.conn.execute(
+                'SELECT key FROM entries WHERE created_at < ? ORDER BY created_at LIMIT ?',
+                (cutoff.timestamp(), limit or -1)
+            )
+        ]
+
+    def _upsert_refs(self, refs):
+        """Insert or refresh (tenant, key, access timestamp) references to present entries"""
+        self.conn.executemany(
+            'INSERT INTO refs (tenant, key, last_accessed, size) '
+            'SELECT ?, key, ?, size FROM entries WHERE key = ? '
+            'ON CONFLICT(tenant, key) DO UPDATE SET '
+            'last_accessed = MAX(last_accessed, excluded.last_accessed)',
+            [(tenant, ts, key) for tenant, key, ts in refs]
+        )
+
+    def add_refs(self, tenant, keys, accessed):
+        """Reference present keys for tenant (committed immediately)"""
+        with self._transaction():
+            self._upsert_refs((tenant, key, accessed.timestamp()) for key in keys)
+
+    def remove_refs(self, tenant, keys):
+        """Drop tenant's references to keys
+
+        Returns:
+            list: Those keys no tenant references any more
+        """
+        keys = list(keys)
+        with self._transaction():
+            self.conn.executemany(
+                'DELETE FROM refs WHERE tenant = ? AND key = ?',
+                [(tenant, key) for key in keys]
+            )
+            for key in keys:
+                self._pending_refs.pop((tenant, key), None)
+        return [
+            key for key in keys
+            if self.conn.execute('SELECT 1 FROM refs WHERE key = ? LIMIT 1', (key,)).fetchone() is None
+        ]
+
+    def tenant_usage(self, tenant=None):
+        """{tenant: {'items': n, 'bytes': n}}, for one tenant or all"""
+        if tenant is None:
+            rows = self.conn.execute('SELECT tenant, items, bytes FROM tenant_totals WHERE items > 0')
+        else:
+            rows = self.conn.execute(
+                'SELECT tenant, items, bytes FROM tenant_totals WHERE tenant = ?', (tenant,)
+            )
+        return {name: {'items': items, 'bytes': size} for name, items, size in rows}
+
+    def tenant_victims(self, tenant, bytes_needed):
+        """Tenant's least recently used (key, size) references covering bytes_needed"""
+        self.flush()
+        cursor = self.conn.execute(
+            'SELECT key, size FROM refs WHERE tenant = ? ORDER BY last_accessed', (tenant,)
+        )
+
+        victims = []
+        freed = 0
+        for key, size in cursor:
+            if freed >= bytes_needed:
+                break
+            victims.append((key, size))
+            freed += size
+        cursor.close()
+        return victims
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,141 @@
+"""
+Background janitor for the audio cache
+Expires entries past their TTL, removes orphaned files, compacts segment
+files and scrubs entries for corruption, a bounded slice at a time
+"""
+import threading
+import time
+
+
+class CacheJanitor:
+    """Rate-limited background cleanup for one CacheManager
+
+    Each pass runs for at most `budget` seconds: it removes expired entries
+    (oldest first, in small batches), fills in index rows migrated without
+    their legacy entries' metadata (see CacheManager.backfill_metadata),
+    then continues scanning shard
+    directories for files no index row points to from where the previous
+    pass stopped, then compacts segment files (see utils.segment_store),
+    then spends what is left verifying entries with the manager's scrubber
+    (see utils.cache_scrub). Passes run every `interval` seconds; processes
+    sharing the cache directory skip a pass if another one ran it recently.
+    """
+
+    # Files younger than this may belong to a set() still in progress
+    ORPHAN_GRACE_SECONDS = 3600
+
+    def __init__(self, manager, interval=600, budget=0.25, batch_size=100, first_delay=5):
+        self.manager = manager
+        self.interval = interval
+        self.budget = budget
+        self.batch_size = batch_size
+        self.first_delay = first_delay
+
+        self.stamp_file = manager.cache_dir / '.janitor'
+        self._shard_cursor = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread (no-op if already running)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after its current pass"""
+        self._stop.set()
+
+    def _run(self):
+        delay = self.first_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            if not self._claim_pass():
+                continue
+            try:
+                self.run_pass()
+            except Exception as e:
+                print(f"Cache janitor error: {e}")
+
+    def _claim_pass(self):
+        """True if no process has run a pass within the last interval"""
+        try:
+            if time.time() - self.stamp_file.stat().st_mtime < self.interval:
+                return False
+        except FileNotFoundError:
+            pass
+        self.stamp_file.touch()
+        return True
+
+    def run_pass(self, budget=None):
+        """Run one bounded cleanup pass
+
+        Args:
+            budget: Seconds to spend (default: self.budget)
+
+        Returns:
+            dict: {'expired': n, 'backfilled': n, 'orphans': n, 'compacted': n,
+                'scrubbed': n, 'broken': n}
+        """
+        deadline = time.monotonic() + (budget if budget is not None else self.budget)
+
+        expired = 0
+        while time.monotonic() < deadline:
+            removed = self.manager.remove_expired(limit=self.batch_size)
+            expired += removed
+            if removed < self.batch_size:
+                break
+
+        # Index rows migrated without their legacy entries' metadata
+        backfilled = 0
+        while time.monotonic() < deadline:
+            examined = self.manager.backfill_metadata(limit=self.batch_size)
+            backfilled += examined
+            if examined < self.batch_size:
+                break
+
+        # Orphan scanning gets at most half of what is left, so scrubbing
+        # still progresses on caches with many shard directories
+        orphans = 0
+        now = time.monotonic()
+        if now < deadline:
+            orphans = self._remove_orphans(now + (deadline - now) / 2)
+
+        # Compaction likewise gets at most half of what is left
+        compacted = 0
+        now = time.monotonic()
+        if now < deadline:
+            report = self.manager.compact_segments(
+                budget=(deadline - now) / 2,
+                grace_seconds=self.ORPHAN_GRACE_SECONDS
+            )
+            compacted = report['compacted']
+
+        scrubbed = broken = 0
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            # Orphans are already handled above
+            report = self.manager.scrubber.run(budget=remaining, repair=True, orphans=False)
+            scrubbed = report['checked']
+            broken = report['missing'] + report['truncated'] + report['corrupt']
+
+        return {
+            'expired': expired,
+            'backfilled': backfilled,
+            'orphans': orphans,
+            'compacted': compacted,
+            'scrubbed': scrubbed,
+            'broken': broken
+        }
+
+    def _remove_orphans(self, deadline):
+        """Scan shard directories from the saved cursor until the deadline"""
+        if not self._shard_cursor:
+            self._shard_cursor = self.manager.shard_dirs()
+
+        removed = 0
+        while self._shard_cursor and time.monotonic() < deadline:
+            shard = self._shard_cursor.pop()
+            removed += self.manager.remove_orphans_in(shard, self.ORPHAN_GRACE_SECONDS)
+        return removed
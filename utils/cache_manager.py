@@ -2,203 +2,1533 @@
 Cache Manager with LRU eviction and TTL support
 Stores audio files with metadata for efficient retrieval
 """
+import atexit
+import mmap
+import os
 import pickle
+import threading
+import time
+import weakref
+import zlib
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
 from datetime import datetime, timedelta
 import shutil
+from utils.cache_backend import CacheBackend
+from utils.cache_index import PickleIndex, SqliteIndex
+from utils.cache_janitor import CacheJanitor
+from utils.cache_metrics import add_counter, metrics_summary, record_latency
+from utils.cache_pack import PackReader, PackWriter
+from utils.cache_policy import make_policy
+from utils.cache_scrub import CacheScrubber
+from utils.file_lock import FileLock, atomic_write, get_file_lock
+from utils.memory_cache import MemoryCache, get_shared_memory_cache
+from utils.resp_backend import RespBackend
+from utils.segment_store import SegmentError, SegmentStore
 
 
-class CacheManager:
-    """Disk-based cache with LRU eviction and TTL"""
+# Number of cross-process lock files entry writes/deletes are striped over
+KEY_LOCK_STRIPES = 64
 
-    def __init__(self, cache_dir='data/cache', max_size_mb=100, ttl_days=30):
+# Cache directories with a layout migration in progress
+_migrating_dirs = set()
+_migration_lock = threading.Lock()
+
+# Process-wide managers by cache directory (see get_cache_manager)
+_shared_managers = {}
+_shared_managers_lock = threading.Lock()
+
+# Live cache managers, flushed once at interpreter shutdown
+_open_managers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_managers():
+    """Fold pending access updates of every live manager into its index"""
+    for manager in list(_open_managers):
+        try:
+            manager.flush()
+        except Exception:
+            pass
+
+
+class CacheManager(CacheBackend):
+    """Disk-based cache with LRU eviction and TTL
+
+    The default cache backend. Given a `remote` backend (e.g. a RespBackend
+    shared by several hosts) it becomes that backend's near cache: local
+    misses are looked up remotely and kept on disk, and writes go to both.
+
+    Reads and writes may name a tenant (e.g. derived from the session's API
+    key). Entries are still stored once per key and shared by every tenant,
+    but each tenant's references count against its own byte quota: a
+    tenant over quota first gives up its own least recently used
+    references, and an entry is removed only once no tenant references it.
+    Hits reference the entries read as well, and those count toward the
+    reader's usage, but the quota is enforced only after the tenant's
+    writes: a read never evicts anything.
+    """
+
+    def __init__(self, cache_dir='data/cache', max_size_mb=100, ttl_days=30, hard_ttl_days=None,
+                 index_backend='sqlite', journal_batch=16, checkpoint_every=500,
+                 checkpoint_interval=60, l1_max_mb=32, janitor_interval=600,
+                 janitor_budget=0.25, remote=None, eviction_policy='lru', storage='files',
+                 segment_size_mb=16, tenant_quota_mb=None):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.max_size_mb = max_size_mb
+        # Bytes one tenant's references may total (default: half the cache)
+        self.tenant_quota_mb = tenant_quota_mb if tenant_quota_mb is not None else max_size_mb / 2
+        # Entries older than ttl_days are stale: still served (flagged
+        # 'stale' so the caller can regenerate them) until hard_ttl_days
+        # (default 3 x ttl_days), when they are removed
         self.ttl_days = ttl_days
+        self.hard_ttl_days = hard_ttl_days if hard_ttl_days is not None else ttl_days * 3
 
-        # Index file for metadata and stats
+        # Index of entry metadata and stats:
+        # - 'sqlite': index.db with indexed LRU/TTL queries (default)
+        # - 'pickle': index.pkl plus access.log write-behind journal
         self.index_file = self.cache_dir / 'index.pkl'
-        self.index, self.stats = self._load_index()
+        self.journal_file = self.cache_dir / 'access.log'
+        self.db_file = self.cache_dir / 'index.db'
+        self._lock_dir = self.cache_dir / '.locks'
+        self._lock_dir.mkdir(exist_ok=True)
+
+        # Guards the index, its connection and the stats counters. Held
+        # only for in-memory/index updates, never during entry file I/O.
+        self._lock = threading.RLock()
+
+        load_start = time.perf_counter()
+        if index_backend == 'sqlite':
+            self.index = self._open_sqlite_index(journal_batch, checkpoint_interval)
+        elif index_backend == 'pickle':
+            self.index = PickleIndex(
+                self.index_file, self.journal_file,
+                journal_batch=journal_batch,
+                checkpoint_every=checkpoint_every,
+                checkpoint_interval=checkpoint_interval
+            )
+        else:
+            raise ValueError(f"Unknown cache index backend: {index_backend}")
+
+        self.stats = self.index.stats
+        for name in ('l1_hits', 'l2_hits', 'remote_hits', 'legacy_hits', 'stale_hits'):
+            self.stats.setdefault(name, 0)
+        record_latency(self.stats, 'index_load', time.perf_counter() - load_start)
+        _open_managers.add(self)
+
+        # L1: in-memory tier shared by all managers in this process,
+        # namespaced by cache directory. This disk cache is L2.
+        if l1_max_mb > 0:
+            self.l1 = get_shared_memory_cache(int(l1_max_mb * 1024 * 1024))
+        else:
+            self.l1 = MemoryCache(0)
+        self._l1_namespace = str(self.cache_dir.resolve())
+
+        # Shared backend behind this cache (None = local only)
+        self.remote = remote
+
+        # Which entries make room for new ones: 'lru', 'tinylfu' (frequency
+        # admission) or 'gds' (cost-aware), see utils.cache_policy
+        self.policy = make_policy(eviction_policy)
 
-        # Clean expired entries on init
-        self._clean_expired()
+        # Where new audio is written:
+        # - 'files': one .mp3 per entry, sharded ab/cd/<key>.mp3 (default)
+        # - 'segments': appended to large segment files, read through mmap
+        #   (see utils.segment_store); the janitor compacts them
+        # Each index row records where its audio is, so entries written
+        # with either engine stay readable after switching.
+        if storage not in ('files', 'segments'):
+            raise ValueError(f"Unknown cache storage: {storage}")
+        self.storage = storage
+        self.segments = SegmentStore(
+            self.cache_dir / 'segments',
+            segment_size=int(segment_size_mb * 1024 * 1024)
+        )
 
-    def _load_index(self):
-        """Load cache index and stats from disk"""
-        if self.index_file.exists():
+        # Move entries from the old flat layout into shards, online
+        self.layout_marker = self.cache_dir / 'layout-sharded'
+        self.start_layout_migration()
+
+        # Set once no migrated rows lack legacy entry metadata (see backfill_metadata)
+        self._metadata_backfilled = False
+
+        # Integrity checks (fsck), run by the janitor and on demand
+        self.scrubber = CacheScrubber(self)
+
+        # Expiry, orphan cleanup and scrubbing run in the background, a
+        # bounded slice at a time; get() only checks the key being read
+        self.janitor = None
+        if janitor_interval:
+            self.janitor = CacheJanitor(self, interval=janitor_interval, budget=janitor_budget)
+            self.janitor.start()
+
+    def _open_sqlite_index(self, journal_batch, checkpoint_interval):
+        """Open index.db, migrating an existing index.pkl on first open"""
+        index = SqliteIndex(
+            self.db_file,
+            journal_batch=journal_batch,
+            checkpoint_interval=checkpoint_interval
+        )
+
+        if self.index_file.exists() and index.is_empty():
+            with FileLock(self.cache_dir / '.migrate.lock'):
+                # Another process may have migrated while we waited
+                if self.index_file.exists() and index.is_empty():
+                    legacy = PickleIndex(self.index_file, self.journal_file)
+                    index.put_many(legacy.items())
+                    index.stats.update(legacy.stats)
+                    index.commit()
+
+                    # Keep the old files around, renamed, so migration runs only once
+                    self.index_file.rename(self.index_file.with_suffix('.pkl.migrated'))
+                    if self.journal_file.exists():
+                        self.journal_file.unlink()
+
+        return index
+
+    def flush(self):
+        """Persist buffered access updates and stats"""
+        with self._lock:
+            self.index.flush()
+
+    def _entry_file(self, key, suffix='.mp3'):
+        """Path of the audio file (or legacy .pkl entry) for key
+
+        Entries are sharded two levels deep on the key prefix: ab/cd/<key>.mp3
+        """
+        return self.cache_dir / key[:2] / key[2:4] / f"{key}{suffix}"
+
+    def _flat_entry_file(self, key, suffix='.mp3'):
+        """Path of an entry in the old single-directory layout"""
+        return self.cache_dir / f"{key}{suffix}"
+
+    def _open_entry(self, key, suffix='.mp3'):
+        """Open an entry file in either layout
+
+        The sharded path is tried again last, in case a running layout
+        migration moved the file between the first two attempts.
+        """
+        sharded = self._entry_file(key, suffix)
+        for path in (sharded, self._flat_entry_file(key, suffix), sharded):
             try:
-                with open(self.index_file, 'rb') as f:
-                    data = pickle.load(f)
+                return open(path, 'rb')
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(sharded)
 
-                # Handle new format with stats
-                if isinstance(data, dict) and 'index' in data and 'stats' in data:
-                    return data['index'], data['stats']
-                # Handle old format (backward compatibility)
-                else:
-                    return data, {
-                        'total_requests': 0,
-                        'cache_hits': 0,
-                        'cache_misses': 0
-                    }
-            except Exception:
-                return {}, {
-                    'total_requests': 0,
-                    'cache_hits': 0,
-                    'cache_misses': 0
-                }
-        return {}, {
-            'total_requests': 0,
-            'cache_hits': 0,
-            'cache_misses': 0
-        }
+    def _unlink_entry_files(self, key, suffix):
+        """Remove an entry file from both layouts"""
+        for cache_file in (self._entry_file(key, suffix), self._flat_entry_file(key, suffix)):
+            try:
+                cache_file.unlink()
+            except FileNotFoundError:
+                pass
+
+    def migrate_layout(self, max_entries=None):
+        """Move flat-layout entry files into the sharded layout
+
+        Safe to run while the cache is serving: files are hard-linked into
+        place (never overwriting a newer sharded copy) and then unlinked, and
+        reads fall back to the flat path.
+
+        Args:
+            max_entries: Stop after moving this many files (None = all)
+
+        Returns:
+            int: Number of files moved
+        """
+        moved = 0
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                key, suffix = os.path.splitext(entry.name)
+                if (suffix not in ('.mp3', '.pkl') or entry.name == self.index_file.name
+                        or not entry.is_file()):
+                    continue
+
+                target = self._entry_file(key, suffix)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(entry.path, target)
+                except FileExistsError:
+                    # A newer copy was already written to the shard
+                    pass
+                except FileNotFoundError:
+                    continue
+                except OSError:
+                    # No hard link support on this filesystem
+                    if not target.exists():
+                        os.replace(entry.path, target)
+                        moved += 1
+                        continue
+
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+                moved += 1
+
+                if max_entries and moved >= max_entries:
+                    return moved
+
+        self.layout_marker.touch()
+        return moved
+
+    def start_layout_migration(self, batch_size=200, pause=0.05):
+        """Migrate flat entries in a background thread, one batch at a time"""
+        if self.layout_marker.exists():
+            return
+
+        with _migration_lock:
+            if self._l1_namespace in _migrating_dirs:
+                return
+            _migrating_dirs.add(self._l1_namespace)
+
+        thread = threading.Thread(
+            target=self._run_layout_migration,
+            args=(batch_size, pause),
+            daemon=True
+        )
+        thread.start()
+
+    def _run_layout_migration(self, batch_size, pause):
+        try:
+            while self.migrate_layout(max_entries=batch_size) >= batch_size:
+                time.sleep(pause)
+        except Exception as e:
+            print(f"Cache layout migration error: {e}")
+        finally:
+            with _migration_lock:
+                _migrating_dirs.discard(self._l1_namespace)
+
+    def _read_audio(self, key, metadata, zero_copy):
+        """Read raw audio, optionally as an mmap-backed memoryview"""
+        if metadata.get('format') == 'segment':
+            return self.segments.read(metadata, key, metadata['size'], zero_copy)
 
-    def _save_index(self):
-        """Save cache index and stats to disk"""
-        with open(self.index_file, 'wb') as f:
-            pickle.dump({
-                'index': self.index,
-                'stats': self.stats
-            }, f)
+        with self._open_entry(key) as f:
+            if not zero_copy:
+                return f.read()
 
-    def get(self, key, track_stats=True):
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return memoryview(b'')
+            # The map stays valid after the file is closed
+            return memoryview(mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ))
+
+    def _read_entry(self, key, metadata, zero_copy):
+        """Read entry in either format; legacy .pkl entries are rewritten as .mp3"""
+        if metadata.get('format') in ('mp3', 'segment'):
+            audio = self._read_audio(key, metadata, zero_copy)
+            return {
+                'audio': audio,
+                'duration': metadata.get('duration'),
+                'text_preview': metadata.get('text_preview', ''),
+                'voice': metadata.get('voice', '')
+            }
+
+        with self._open_entry(key, '.pkl') as f:
+            data = pickle.load(f)
+
+        # Lazily convert to the raw format on first read
+        try:
+            with self._key_lock(key):
+                self._write_entry(
+                    key, data, created_at=metadata['created_at'],
+                    last_accessed=metadata.get('last_accessed')
+                )
+                self._unlink_entry_files(key, '.pkl')
+        except Exception as e:
+            print(f"Cache rewrite error: {e}")
+
+        if zero_copy:
+            data = dict(data, audio=memoryview(data['audio']))
+        return data
+
+    def get(self, key, track_stats=True, zero_copy=False, fallback=None, tenant=None):
         """Get item from cache
 
         Args:
             key: Cache key
             track_stats: Whether to track this request in stats (default: True)
+            zero_copy: Return audio as an mmap-backed memoryview instead of bytes
+            fallback: Older key for the same entry, looked up on a miss; an
+                entry found there is copied under key
+            tenant: Tenant the entry is referenced for (None = no quota accounting)
+
+        Returns:
+            dict: {'audio', 'duration', 'text_preview', 'voice', 'stale'}
+                or None; 'stale' is True past the soft TTL
         """
-        # Track total requests (only if tracking is enabled)
-        if track_stats:
-            self.stats['total_requests'] += 1
+        start = time.perf_counter()
+        self.policy.record_access(key)
+        data = self._get(key, track_stats, zero_copy, fallback, tenant)
+        with self._lock:
+            record_latency(self.stats, 'get', time.perf_counter() - start)
+        return data
 
-        if key not in self.index:
-            if track_stats:
-                self.stats['cache_misses'] += 1
-            return None
+    def _get(self, key, track_stats, zero_copy, fallback=None, tenant=None):
+        # L1: memory tier
+        l1_key = (self._l1_namespace, key)
+        cached = self.l1.get(l1_key)
+        if cached is not None:
+            created_at, data = cached
+            freshness = self.freshness(created_at)
+            if freshness != 'expired':
+                stale = freshness == 'stale'
+                self._record_hit(key, 'l1_hits', track_stats, stale=stale, tenant=tenant)
+                data = dict(data, stale=stale)
+                if zero_copy:
+                    data['audio'] = memoryview(data['audio'])
+                return data
+            self.l1.discard(l1_key)
+
+        # L2: disk
+        data = self._get_disk(key, track_stats, zero_copy, tenant)
+        if data is not None:
+            return data
 
-        metadata = self.index[key]
+        # Remote backend; a hit is kept on disk as the near copy, with the
+        # record's creation time so its TTL doesn't restart on every host
+        if self.remote is not None:
+            data = self.remote.get(key, track_stats=track_stats)
+            if data is not None:
+                created_at = data.pop('created_at', None) or datetime.now()
+                freshness = self.freshness(created_at)
+                if freshness != 'expired':
+                    self._set_local(key, data, tenant, created_at)
+                    stale = freshness == 'stale'
+                    self._record_hit(key, 'remote_hits', track_stats, stale=stale, tenant=tenant)
+                    data = dict(data, stale=stale)
+                    if zero_copy:
+                        data['audio'] = memoryview(data['audio'])
+                    return data
 
-        # Check expiry
-        if datetime.now() - metadata['created_at'] > timedelta(days=self.ttl_days):
-            self.delete(key)
-            if track_stats:
-                self.stats['cache_misses'] += 1
+        # Entry stored under an older key scheme
+        if fallback is not None:
+            data = self._get(fallback, False, zero_copy)
+            if data is not None:
+                self._move_legacy({key: (fallback, data)}, tenant)
+                self._record_hit(key, 'legacy_hits', track_stats, tenant=tenant)
+                return data
+
+        self._record_miss(track_stats, tenant)
+        return None
+
+    def _get_disk(self, key, track_stats, zero_copy, tenant=None):
+        """Read an entry from disk, or None; records hits but not misses"""
+        with self._lock:
+            metadata = self.index.get(key)
+
+        if metadata is None:
             return None
 
-        # Load from disk
-        cache_file = self.cache_dir / f"{key}.pkl"
-        if not cache_file.exists():
-            del self.index[key]
-            self._save_index()
-            if track_stats:
-                self.stats['cache_misses'] += 1
+        # Check expiry (stale entries are still served)
+        freshness = self.freshness(metadata['created_at'])
+        if freshness == 'expired':
+            self._delete_local(key)
             return None
 
+        # Load from disk (outside the index lock)
+        read_start = time.perf_counter()
         try:
-            with open(cache_file, 'rb') as f:
-                data = pickle.load(f)
+            data = self._read_entry(key, metadata, zero_copy)
+        except FileNotFoundError:
+            self._drop_missing(key)
+            return None
+        except Exception:
+            self._delete_local(key)
+            return None
+
+        read_seconds = time.perf_counter() - read_start
 
-            # Update last accessed
-            metadata['last_accessed'] = datetime.now()
-            self._save_index()
+        stale = freshness == 'stale'
+        self._record_hit(
+            key, 'l2_hits', track_stats, read=(read_seconds, len(data['audio'])), stale=stale,
+            tenant=tenant
+        )
+        self._promote(key, data, metadata['created_at'])
+        data['stale'] = stale
+        return data
 
-            # Track cache hit (only if tracking is enabled)
+    def freshness(self, created_at, now=None):
+        """'fresh', 'stale' (past ttl_days, still served) or 'expired' (past hard_ttl_days)"""
+        age = (now or datetime.now()) - created_at
+        if age > timedelta(days=self.hard_ttl_days):
+            return 'expired'
+        if age > timedelta(days=self.ttl_days):
+            return 'stale'
+        return 'fresh'
+
+    def _record_hit(self, key, tier, track_stats, read=None, stale=False, tenant=None):
+        """Update last accessed (written behind), hit stats and disk read metrics"""
+        with self._lock:
+            self.index.touch(key, datetime.now(), tenant)
+            if read is not None:
+                record_latency(self.stats, 'disk_read', read[0])
+                add_counter(self.stats, 'bytes_read', read[1])
             if track_stats:
+                self.stats['total_requests'] += 1
                 self.stats['cache_hits'] += 1
-            return data
-        except Exception:
-            self.delete(key)
-            if track_stats:
+                self.stats[tier] += 1
+                if stale:
+                    self.stats['stale_hits'] += 1
+                if tenant is not None:
+                    add_counter(self.stats, f'tenant_hits.{tenant}', 1)
+                self.index.mark_dirty()
+
+    def _record_miss(self, track_stats, tenant=None):
+        """Update miss stats"""
+        if track_stats:
+            with self._lock:
+                self.stats['total_requests'] += 1
                 self.stats['cache_misses'] += 1
-            return None
+                if tenant is not None:
+                    add_counter(self.stats, f'tenant_misses.{tenant}', 1)
+                self.index.mark_dirty()
 
-    def set(self, key, value):
-        """Set item in cache with LRU eviction"""
-        # Enforce size limit before adding
-        self._enforce_size_limit(value)
+    def _promote(self, key, data, created_at):
+        """Copy an entry into the L1 memory tier"""
+        audio = bytes(data['audio'])
+        self.l1.put(
+            (self._l1_namespace, key),
+            (created_at, dict(data, audio=audio)),
+            len(audio)
+        )
 
-        # Save to disk
-        cache_file = self.cache_dir / f"{key}.pkl"
-        try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(value, f)
-
-            # Update index
-            self.index[key] = {
-                'created_at': datetime.now(),
-                'last_accessed': datetime.now(),
-                'size': cache_file.stat().st_size
+    def _write_audio(self, key, audio):
+        """Store audio with the selected storage engine (outside the index lock)
+
+        Returns:
+            dict: Where the audio is, merged into the entry's index row
+        """
+        if self.storage == 'segments':
+            return dict(self.segments.append(key, audio), format='segment')
+
+        # A plain .mp3, written atomically
+        cache_file = self._entry_file(key)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(cache_file, audio)
+        return {'format': 'mp3'}
+
+    def _write_audio_many(self, items):
+        """Store several entries' audio; a failed write only skips its entry
+
+        Returns:
+            dict: key -> location (see _write_audio) for the entries written
+        """
+        if self.storage == 'segments':
+            try:
+                locations = self.segments.append_many(
+                    (key, value['audio']) for key, value in items.items()
+                )
+            except Exception as e:
+                print(f"Cache write error: {e}")
+                return {}
+            return {
+                key: dict(location, format='segment')
+                for key, location in zip(items, locations)
             }
-            self._save_index()
-        except Exception as e:
-            print(f"Cache write error: {e}")
-            if cache_file.exists():
-                cache_file.unlink()
+
+        written = {}
+        for key, value in items.items():
+            try:
+                written[key] = self._write_audio(key, value['audio'])
+            except Exception as e:
+                print(f"Cache write error: {e}")
+                self._unlink_entry_files(key, '.mp3')
+        return written
+
+    def _entry_metadata(self, value, created_at=None, location=None, last_accessed=None):
+        """Index row for an entry written from value to location (default: .mp3 file)"""
+        now = datetime.now()
+        size = len(value['audio'])
+        return {
+            'created_at': created_at or now,
+            'last_accessed': last_accessed or now,
+            'size': size,
+            'weight': self.policy.weight(value, size),
+            'crc32': zlib.crc32(value['audio']),
+            'format': 'mp3',
+            'duration': value.get('duration'),
+            'voice': value.get('voice', ''),
+            'text_preview': value.get('text_preview', ''),
+            'chars': value.get('chars'),
+            **(location or {})
+        }
+
+    def _write_entry(self, key, value, created_at=None, last_accessed=None):
+        """Store audio and commit its metadata as an index row
+
+        Called with the key's lock held.
+        """
+        location = self._write_audio(key, value['audio'])
+        with self._lock:
+            self.index.put(key, self._entry_metadata(value, created_at, location, last_accessed))
+            self.index.commit()
+            add_counter(self.stats, 'bytes_written', len(value['audio']))
+
+    def set(self, key, value, tenant=None):
+        """Set item in cache, evicting per the eviction policy
+
+        Args:
+            key: Cache key
+            value: dict with 'audio' bytes and 'duration', 'voice', 'text_preview'
+            tenant: Tenant the entry is referenced for (None = no quota accounting)
+        """
+        start = time.perf_counter()
+        self._set_local(key, value, tenant)
+        if self.remote is not None:
+            self.remote.set(key, value)
+
+        with self._lock:
+            record_latency(self.stats, 'set', time.perf_counter() - start)
+
+    def _set_local(self, key, value, tenant=None, created_at=None):
+        """Write an entry to disk and L1 only (created now, unless created_at is given)"""
+        # Enforce the size limit before adding; the entry's size is exactly
+        # the number of audio bytes written
+        if not self._enforce_size_limit(len(value['audio']), [key]):
+            return
+
+        with self._key_lock(key):
+            try:
+                self._write_entry(key, value, created_at)
+                self._promote(key, value, created_at or datetime.now())
+            except Exception as e:
+                print(f"Cache write error: {e}")
+                self._unlink_entry_files(key, '.mp3')
+                return
+            if tenant is not None:
+                with self._lock:
+                    self.index.add_refs(tenant, [key], datetime.now())
+
+        # The tenant's quota is enforced with the new reference counted
+        if tenant is not None:
+            self._enforce_tenant_quota(tenant)
+
+    def get_many(self, keys, track_stats=True, fallbacks=None, tenant=None):
+        """Get many items, resolving all hits in one pass
+
+        Index rows are fetched together and the index is persisted once
+        at the end, instead of once per key.
+
+        Args:
+            keys: Cache keys
+            track_stats: Whether to track these requests in stats
+            fallbacks: dict of key -> older key for the same entry, looked
+                up for misses; entries found there are copied under key
+            tenant: Tenant the entries are referenced for
+
+        Returns:
+            dict: key -> cached value dict, or None for a miss
+        """
+        results = {}
+        hits = []
+        stale_hits = 0
+        remaining = []
+        now = datetime.now()
+
+        # L1: memory tier
+        for key in dict.fromkeys(keys):
+            self.policy.record_access(key)
+            cached = self.l1.get((self._l1_namespace, key))
+            freshness = self.freshness(cached[0], now) if cached is not None else 'expired'
+            if freshness != 'expired':
+                results[key] = dict(cached[1], stale=freshness == 'stale')
+                hits.append((key, 'l1_hits'))
+                stale_hits += freshness == 'stale'
+            else:
+                remaining.append(key)
+
+        # L2: disk
+        with self._lock:
+            metadata_by_key = self.index.get_many(remaining)
+
+        expired = []
+        missing = []
+        reads = []
+        for key in remaining:
+            metadata = metadata_by_key.get(key)
+            results[key] = None
+            if metadata is None:
+                continue
+            freshness = self.freshness(metadata['created_at'], now)
+            if freshness == 'expired':
+                expired.append(key)
+                continue
+            read_start = time.perf_counter()
+            try:
+                data = self._read_entry(key, metadata, zero_copy=False)
+            except FileNotFoundError:
+                missing.append(key)
+                continue
+            except Exception:
+                expired.append(key)
+                continue
+            reads.append((time.perf_counter() - read_start, len(data['audio'])))
+            self._promote(key, data, metadata['created_at'])
+            results[key] = dict(data, stale=freshness == 'stale')
+            hits.append((key, 'l2_hits'))
+            stale_hits += freshness == 'stale'
+
+        for key in missing:
+            self._drop_missing(key)
+        self._remove_entries(expired)
+
+        # Remote backend for what is still missing, kept on disk as near
+        # copies with their records' creation times
+        if self.remote is not None:
+            missed = [key for key in remaining if results[key] is None]
+            found = {}
+            created = {}
+            for key, value in self.remote.get_many(missed, track_stats=track_stats).items():
+                if value is None:
+                    continue
+                created[key] = value.pop('created_at', None) or now
+                freshness = self.freshness(created[key], now)
+                if freshness != 'expired':
+                    found[key] = value
+                    stale_hits += freshness == 'stale'
+            if found:
+                self._set_many_local(found, tenant, created)
+                results.update(
+                    (key, dict(value, stale=self.freshness(created[key], now) == 'stale'))
+                    for key, value in found.items()
+                )
+                hits.extend((key, 'remote_hits') for key in found)
+
+        # Entries stored under an older key scheme
+        if fallbacks:
+            pending = {
+                fallbacks[key]: key
+                for key in remaining if results[key] is None and fallbacks.get(key)
+            }
+            old = self.get_many(pending, track_stats=False) if pending else {}
+            found = {pending[old_key]: value for old_key, value in old.items() if value is not None}
+            if found:
+                self._move_legacy(
+                    {key: (old_key, old[old_key]) for old_key, key in pending.items() if key in found},
+                    tenant
+                )
+                results.update(found)
+                hits.extend((key, 'legacy_hits') for key in found)
+
+        with self._lock:
+            for seconds, size in reads:
+                record_latency(self.stats, 'disk_read', seconds)
+                add_counter(self.stats, 'bytes_read', size)
+            for key, tier in hits:
+                self.index.touch(key, now, tenant)
+                if track_stats:
+                    self.stats[tier] += 1
+            if track_stats:
+                self.stats['total_requests'] += len(results)
+                self.stats['cache_hits'] += len(hits)
+                self.stats['stale_hits'] += stale_hits
+                if tenant is not None:
+                    add_counter(self.stats, f'tenant_hits.{tenant}', len(hits))
+                    add_counter(self.stats, f'tenant_misses.{tenant}', len(results) - len(hits))
+                self.stats['cache_misses'] += len(results) - len(hits)
+                self.index.mark_dirty()
+            self.index.flush()
+
+        return results
+
+    def _move_legacy(self, found, tenant=None):
+        """Move entries found under older keys to their current keys
+
+        Each entry keeps its created_at, so a stale one is still refreshed
+        on schedule. The old key is deleted once the new one is stored
+        (not if the eviction policy declined it).
+
+        Args:
+            found: dict of key -> (old key, value read under the old key)
+        """
+        with self._lock:
+            rows = self.index.get_many(old_key for old_key, _ in found.values())
+        created = {
+            key: rows[old_key]['created_at']
+            for key, (old_key, _) in found.items() if old_key in rows
+        }
+        items = {
+            key: {name: field for name, field in value.items() if name != 'stale'}
+            for key, (_, value) in found.items()
+        }
+        for value in items.values():
+            value['audio'] = bytes(value['audio'])
+
+        self._set_many_local(items, tenant, created)
+        if self.remote is not None:
+            self.remote.set_many({
+                key: dict(value, created_at=created[key]) if key in created else value
+                for key, value in items.items()
+            })
+
+        with self._lock:
+            moved = [old_key for key, (old_key, _) in found.items() if key in self.index]
+        self._remove_entries(moved)
+        if self.remote is not None:
+            for old_key in moved:
+                self.remote.delete(old_key)
+
+    def set_many(self, items, tenant=None):
+        """Set many items with one eviction pass and one index commit
+
+        Args:
+            items: dict (or iterable of pairs) of key -> value dict
+            tenant: Tenant the entries are referenced for
+        """
+        items = dict(items)
+        if not items:
+            return
+
+        self._set_many_local(items, tenant)
+        if self.remote is not None:
+            self.remote.set_many(items)
+
+    def _set_many_local(self, items, tenant=None, created_at=None):
+        """Write entries to disk and L1 only, with one index commit
+
+        created_at optionally maps keys to their creation time (default: now).
+        """
+        created_at = created_at or {}
+        new_size = sum(len(value['audio']) for value in items.values())
+        if not self._enforce_size_limit(new_size, items):
+            return
+
+        with self._key_locks(items):
+            written = self._write_audio_many(items)
+
+            with self._lock:
+                self.index.put_many(
+                    (key, self._entry_metadata(items[key], created_at.get(key), location))
+                    for key, location in written.items()
+                )
+                self.index.commit()
+                if tenant is not None:
+                    self.index.add_refs(tenant, written, datetime.now())
+                add_counter(self.stats, 'bytes_written', sum(len(items[key]['audio']) for key in written))
+
+        now = datetime.now()
+        for key in written:
+            self._promote(key, items[key], created_at.get(key, now))
+
+        # After the write, so a batch larger than the quota is trimmed too
+        if tenant is not None:
+            self._enforce_tenant_quota(tenant)
+
+    @contextmanager
+    def _key_locks(self, keys):
+        """Hold the stripe locks of several keys, acquired in a fixed order"""
+        stripes = sorted({self._key_stripe(key) for key in keys})
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._stripe_lock(stripe))
+            yield
+
+    def _key_stripe(self, key):
+        return zlib.crc32(key.encode()) % KEY_LOCK_STRIPES
+
+    def _stripe_lock(self, stripe):
+        return get_file_lock(self._lock_dir / f"{stripe:02x}.lock")
+
+    def _key_lock(self, key):
+        """Lock for one of KEY_LOCK_STRIPES key stripes
+
+        Serializes threads (and processes) changing the same entry's file
+        and index row; different stripes never block each other. Never
+        acquired while the index lock or an index transaction is held.
+        """
+        return self._stripe_lock(self._key_stripe(key))
+
+    def _drop_missing(self, key):
+        """Remove the index row of an entry whose file has disappeared"""
+        with self._key_lock(key):
+            # A concurrent set (or segment compaction) may have just
+            # (re)written the entry
+            with self._lock:
+                metadata = self.index.get(key)
+            if metadata is not None and metadata.get('format') == 'segment':
+                if self.segments.exists(metadata['segment']):
+                    return
+            else:
+                for suffix in ('.mp3', '.pkl'):
+                    if (self._entry_file(key, suffix).exists() or
+                            self._flat_entry_file(key, suffix).exists()):
+                        return
+            with self._lock:
+                self.index.remove(key)
+                self.index.commit()
+            self.l1.discard((self._l1_namespace, key))
+
+    def _remove_entry(self, key):
+        """Remove entry file and index row without committing the index
+
+        Called with the key's lock held.
+        """
+        for suffix in ('.mp3', '.pkl'):
+            self._unlink_entry_files(key, suffix)
+        with self._lock:
+            self.index.remove(key)
+        self.l1.discard((self._l1_namespace, key))
+
+    def _remove_entries(self, keys):
+        """Remove several entries: one unlink pass, one index transaction and commit"""
+        if not keys:
+            return
+        with self._key_locks(keys):
+            for key in keys:
+                for suffix in ('.mp3', '.pkl'):
+                    self._unlink_entry_files(key, suffix)
+                self.l1.discard((self._l1_namespace, key))
+            with self._lock:
+                self.index.remove_many(keys)
+                self.index.commit()
 
     def delete(self, key):
-        """Delete item from cache"""
-        cache_file = self.cache_dir / f"{key}.pkl"
-        if cache_file.exists():
-            cache_file.unlink()
+        """Delete item from cache (and from the remote backend)"""
+        self._delete_local(key)
+        if self.remote is not None:
+            self.remote.delete(key)
 
-        if key in self.index:
-            del self.index[key]
-            self._save_index()
+    def _delete_local(self, key):
+        """Delete an entry from disk and L1 only"""
+        start = time.perf_counter()
+        with self._key_lock(key):
+            self._remove_entry(key)
+            with self._lock:
+                self.index.commit()
+                record_latency(self.stats, 'delete', time.perf_counter() - start)
 
-    def _enforce_size_limit(self, new_value):
-        """Enforce cache size limit using LRU eviction"""
-        # Calculate current size
-        total_size = sum(meta['size'] for meta in self.index.values())
+    def _enforce_size_limit(self, new_size, keys=None):
+        """Make room for new_size bytes, evicting in the index's priority order
 
-        # Estimate new item size (rough approximation)
-        try:
-            new_size = len(pickle.dumps(new_value))
-        except Exception:
-            new_size = 0
+        Uses the index's running byte total and eviction order, so only the
+        evicted entries are touched. With the keys about to be written, the
+        eviction policy may refuse them instead.
 
+        Returns:
+            bool: False if the policy did not admit keys (nothing evicted)
+        """
         max_size_bytes = self.max_size_mb * 1024 * 1024
+        with self._lock:
+            excess = self.index.total_size() + new_size - max_size_bytes
+            if excess <= 0:
+                return True
+            if (keys and self.policy.filters_admission and
+                    not self.policy.admit(keys, self.index.eviction_victims(excess, peek=True))):
+                add_counter(self.stats, 'rejected', len(keys))
+                return False
+            victims = self.index.eviction_victims(excess)
 
-        if total_size + new_size > max_size_bytes:
-            # Sort by last accessed (oldest first)
-            sorted_keys = sorted(
-                self.index.keys(),
-                key=lambda k: self.index[k]['last_accessed']
-            )
+        if not victims:
+            return True
+
+        # Delete lowest-priority (by default least recently used) items until under limit
+        start = time.perf_counter()
+        self._remove_entries([key for key, _ in victims])
+        with self._lock:
+            record_latency(self.stats, 'evict', time.perf_counter() - start)
+            add_counter(self.stats, 'evictions', len(victims))
+        return True
+
+    def _enforce_tenant_quota(self, tenant):
+        """Bring tenant's references back within its quota
+
+        Run after each write, with the written entries' references (and
+        those added by the tenant's reads) counted. Drops the tenant's
+        least recently used references, which may include ones just
+        written if a batch alone exceeds the quota; entries no other
+        tenant references are removed, shared ones stay.
+        """
+        quota = self.tenant_quota_mb * 1024 * 1024
+        with self._lock:
+            # Count references buffered by reads too
+            self.index.flush()
+            usage = self.index.tenant_usage(tenant).get(tenant, {'bytes': 0})['bytes']
+            excess = usage - quota
+            if excess <= 0:
+                return
+            victims = [key for key, _ in self.index.tenant_victims(tenant, excess)]
+            unreferenced = self.index.remove_refs(tenant, victims)
+            self.index.commit()
+            add_counter(self.stats, 'quota_evictions', len(victims))
+
+        self._remove_entries(unreferenced)
+
+    def tenant_stats(self):
+        """Per-tenant usage and hit counts
+
+        Returns:
+            dict: tenant -> {'items', 'size_mb', 'quota_percent', 'hits', 'misses'}
+        """
+        with self._lock:
+            usage = self.index.tenant_usage()
+            stats = dict(self.stats)
+
+        tenants = set(usage) | {
+            name.split('.', 1)[1] for name in stats
+            if name.startswith(('tenant_hits.', 'tenant_misses.'))
+        }
+        quota = self.tenant_quota_mb * 1024 * 1024
+        result = {}
+        for tenant in sorted(tenants):
+            used = usage.get(tenant, {'items': 0, 'bytes': 0})
+            result[tenant] = {
+                'items': used['items'],
+                'size_mb': used['bytes'] / (1024 * 1024),
+                'quota_percent': used['bytes'] / quota * 100 if quota > 0 else 0,
+                'hits': stats.get(f'tenant_hits.{tenant}', 0),
+                'misses': stats.get(f'tenant_misses.{tenant}', 0)
+            }
+        return result
+
+    def remove_expired(self, limit=None):
+        """Remove entries past the hard TTL, oldest first
+
+        Args:
+            limit: Remove at most this many (None = all)
+
+        Returns:
+            int: Number of entries removed
+        """
+        cutoff = datetime.now() - timedelta(days=self.hard_ttl_days)
+        with self._lock:
+            expired_keys = self.index.expired_keys(cutoff, limit=limit)
+
+        self._remove_entries(expired_keys)
+        return len(expired_keys)
+
+    def backfill_metadata(self, limit=100):
+        """Copy voice, text preview, duration and chars of legacy .pkl entries into their index rows
+
+        Rows migrated from an old index.pkl only hold timestamps and size,
+        so until an entry is read (and rewritten as .mp3) it can't be
+        searched, filtered by voice or shown in the Cache Inspector. The
+        janitor runs this a batch at a time until no such rows are left.
+
+        Args:
+            limit: Examine at most this many entries
+
+        Returns:
+            int: Number of entries examined (0 once none are left)
+        """
+        if self._metadata_backfilled:
+            return 0
+        with self._lock:
+            keys = self.index.missing_metadata(limit)
+        if not keys:
+            self._metadata_backfilled = True
+            return 0
+
+        missing = []
+        broken = []
+        for key in keys:
+            with self._key_lock(key):
+                # A concurrent read may have rewritten the entry since
+                with self._lock:
+                    metadata = self.index.get(key)
+                if metadata is None or 'format' in metadata or 'text_preview' in metadata:
+                    continue
+                try:
+                    with self._open_entry(key, '.pkl') as f:
+                        data = pickle.load(f)
+                except FileNotFoundError:
+                    missing.append(key)
+                    continue
+                except Exception:
+                    broken.append(key)
+                    continue
+                with self._lock:
+                    self.index.put(key, dict(
+                        metadata,
+                        weight=self.policy.weight(data, metadata['size']),
+                        duration=data.get('duration'),
+                        voice=data.get('voice', ''),
+                        text_preview=data.get('text_preview', ''),
+                        chars=data.get('chars')
+                    ))
+
+        with self._lock:
+            self.index.commit()
+        for key in missing:
+            self._drop_missing(key)
+        self._remove_entries(broken)
+        return len(keys)
+
+    def shard_dirs(self):
+        """All second-level shard directories, in a stable order"""
+        dirs = []
+        for top in sorted(os.listdir(self.cache_dir)):
+            top_path = self.cache_dir / top
+            if len(top) != 2 or not top_path.is_dir():
+                continue
+            dirs.extend(top_path / sub for sub in sorted(os.listdir(top_path)))
+        return dirs
+
+    def remove_orphans_in(self, directory, grace_seconds=3600, dry_run=False):
+        """Remove files in one shard directory that no index row points to
+
+        Leftover temp files from interrupted writes are removed too. Files
+        younger than grace_seconds are kept, as a set() may be in progress.
+
+        Args:
+            dry_run: Only count the files that would be removed
+
+        Returns:
+            int: Number of files removed (or found, with dry_run)
+        """
+        cutoff = time.time() - grace_seconds
+        candidates = {}
+        removed = 0
+
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return 0
+
+        for entry in entries:
+            try:
+                if not entry.is_file() or entry.stat().st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+
+            if entry.name.startswith('.') and entry.name.endswith('.tmp'):
+                if dry_run:
+                    removed += 1
+                    continue
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                continue
 
-            # Delete oldest items until under limit
-            for key in sorted_keys:
-                if total_size + new_size <= max_size_bytes:
-                    break
+            key, suffix = os.path.splitext(entry.name)
+            if suffix in ('.mp3', '.pkl'):
+                candidates.setdefault(key, []).append(entry.path)
 
-                total_size -= self.index[key]['size']
-                self.delete(key)
+        with self._lock:
+            indexed = self.index.get_many(candidates)
 
-    def _clean_expired(self):
-        """Remove expired entries"""
-        expired_keys = []
-        for key, metadata in self.index.items():
-            if datetime.now() - metadata['created_at'] > timedelta(days=self.ttl_days):
-                expired_keys.append(key)
+        for key, paths in candidates.items():
+            if key in indexed:
+                continue
+            if dry_run:
+                removed += len(paths)
+                continue
+            with self._key_lock(key):
+                with self._lock:
+                    if key in self.index:
+                        continue
+                for path in paths:
+                    try:
+                        os.unlink(path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+        return removed
 
-        for key in expired_keys:
-            self.delete(key)
+    def scan_entries(self, after='', limit=100):
+        """Up to limit (key, metadata) pairs with key > after, in key order"""
+        with self._lock:
+            return self.index.scan(after, limit)
+
+    def verify_entry(self, key, repair=False):
+        """Check one entry's file against its index row
+
+        The file must exist, have the indexed size and match the stored
+        CRC-32. Runs under the key's lock, so a concurrent set() is never
+        mistaken for corruption.
+
+        Args:
+            repair: Remove a broken entry; store the checksum of an intact
+                entry written before checksums were recorded
+
+        Returns:
+            tuple: (status, bytes read); status is 'ok', 'missing',
+                'truncated', 'corrupt' or 'gone' (removed meanwhile)
+        """
+        with self._key_lock(key):
+            with self._lock:
+                metadata = self.index.get(key)
+            if metadata is None:
+                return 'gone', 0
+
+            size = 0
+            if metadata.get('format') == 'segment':
+                try:
+                    record_key, audio, crc = self.segments.read_record(metadata)
+                except FileNotFoundError:
+                    status = 'missing'
+                except EOFError:
+                    status = 'truncated'
+                except SegmentError:
+                    status = 'corrupt'
+                else:
+                    size = len(audio)
+                    if (record_key != key or size != metadata['size'] or
+                            zlib.crc32(audio) != crc or crc != metadata.get('crc32', crc)):
+                        status = 'corrupt'
+                    else:
+                        status = 'ok'
+            elif metadata.get('format') == 'mp3':
+                try:
+                    with self._open_entry(key) as f:
+                        audio = f.read()
+                except FileNotFoundError:
+                    status = 'missing'
+                else:
+                    size = len(audio)
+                    if size < metadata['size']:
+                        status = 'truncated'
+                    elif size != metadata['size']:
+                        status = 'corrupt'
+                    elif 'crc32' in metadata:
+                        status = 'ok' if zlib.crc32(audio) == metadata['crc32'] else 'corrupt'
+                    else:
+                        status = 'ok'
+                        if repair:
+                            with self._lock:
+                                self.index.put(key, dict(metadata, crc32=zlib.crc32(audio)))
+                                self.index.mark_dirty()
+            else:
+                # Legacy pickled entry: intact if it still unpickles
+                try:
+                    with self._open_entry(key, '.pkl') as f:
+                        size = os.fstat(f.fileno()).st_size
+                        pickle.load(f)['audio']
+                    status = 'ok'
+                except FileNotFoundError:
+                    status = 'missing'
+                except Exception:
+                    status = 'corrupt'
+
+            if repair and status != 'ok':
+                self._remove_entry(key)
+                with self._lock:
+                    self.index.commit()
+
+        return status, size
+
+    def compact_segments(self, budget=None, live_ratio=0.5, grace_seconds=3600, batch_size=64):
+        """Reclaim segment space held by removed, replaced or expired entries
+
+        A sealed segment is compacted when less than live_ratio of it is
+        still referenced by index rows, or when it is one of several small
+        segments (under a quarter of segment_size) that can be merged. Its
+        live records are appended to the active segment, their rows are
+        repointed (under the key locks, so concurrent writes win) and the
+        segment is retired, to be deleted on a later pass.
+
+        Args:
+            budget: Seconds to spend (None = until done)
+            grace_seconds: Only segments unmodified for this long
+
+        Returns:
+            dict: {'compacted': segments, 'moved': records, 'freed': bytes}
+        """
+        deadline = time.monotonic() + budget if budget is not None else None
+        result = {'compacted': 0, 'moved': 0, 'freed': self.segments.purge_retired()}
+
+        sealed = self.segments.sealed_segments(grace_seconds)
+        small = [name for name, size in sealed if size < self.segments.segment_size / 4]
+        mergeable = set(small) if len(small) > 1 else set()
+
+        for name, size in sealed:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+            records = list(self.segments.records(name))
+            with self._lock:
+                rows = self.index.get_many({key for _, key, _ in records})
+            live = [
+                (offset, key) for offset, key, _ in records
+                if self._located_at(rows.get(key), name, offset)
+            ]
+            live_bytes = sum(rows[key]['size'] for _, key in live)
+            if live and live_bytes >= live_ratio * size and name not in mergeable:
+                continue
+
+            for i in range(0, len(live), batch_size):
+                result['moved'] += self._move_records(name, live[i:i + batch_size])
+            self.segments.retire(name)
+            result['compacted'] += 1
+
+        return result
+
+    @staticmethod
+    def _located_at(metadata, name, offset):
+        """Whether an index row points at the record at name:offset"""
+        return (metadata is not None and metadata.get('format') == 'segment' and
+                metadata['segment'] == name and metadata['offset'] == offset)
+
+    def _move_records(self, name, records):
+        """Copy (offset, key) records of a segment forward and repoint their rows
+
+        Returns:
+            int: Number of records moved
+        """
+        keys = [key for _, key in records]
+        with self._key_locks(keys):
+            with self._lock:
+                rows = self.index.get_many(keys)
+
+            moving = []
+            for offset, key in records:
+                metadata = rows.get(key)
+                # Rewritten or removed since the segment was scanned
+                if not self._located_at(metadata, name, offset):
+                    continue
+                try:
+                    audio = self.segments.read(metadata, key, metadata['size'])
+                except (OSError, EOFError, SegmentError):
+                    continue
+                moving.append((key, audio))
+
+            if not moving:
+                return 0
+            locations = self.segments.append_many(moving)
+            with self._lock:
+                self.index.put_many(
+                    (key, dict(rows[key], **location))
+                    for (key, _), location in zip(moving, locations)
+                )
+                self.index.commit()
+        return len(moving)
+
+    def select_keys(self, voice=None, keys=None, recent=None):
+        """Select entry keys for export
+
+        Args:
+            voice: Only entries generated with this voice
+            keys: Only these keys (e.g. derived from a playlist)
+            recent: Only the N most recently accessed entries
+
+        Returns:
+            list: Keys, most recently accessed first
+        """
+        wanted = set(keys) if keys is not None else None
+        entries = [
+            (key, metadata) for key, metadata in self.list_entries()
+            if (voice is None or metadata.get('voice') == voice) and
+            (wanted is None or key in wanted)
+        ]
+        entries.sort(key=lambda item: item[1]['last_accessed'], reverse=True)
+        if recent:
+            entries = entries[:recent]
+        return [key for key, _ in entries]
+
+    def export_pack(self, fileobj, keys):
+        """Stream entries into a cache pack (see utils.cache_pack)
+
+        Entries are read straight from storage: exporting doesn't count as
+        an access, so recency, L1, the eviction policy and stats are left
+        untouched. Expired entries are skipped (and left to the janitor).
+
+        Returns:
+            int: Number of entries written
+        """
+        writer = PackWriter(fileobj)
+        now = datetime.now()
+        for key in keys:
+            with self._lock:
+                metadata = self.index.get(key)
+            if metadata is None or self.freshness(metadata['created_at'], now) == 'expired':
+                continue
+            try:
+                data = self._read_entry(key, metadata, zero_copy=False)
+            except Exception:
+                continue
+            writer.write(key, dict(data, chars=metadata.get('chars') or data.get('chars')),
+                         metadata['created_at'], metadata.get('last_accessed'))
+        writer.close()
+        return writer.count
+
+    def import_pack(self, fileobj, batch_size=200):
+        """Bulk-import a cache pack, streaming, committing the index in batches
+
+        Entries already present are skipped, as are records whose checksum
+        doesn't match. Audio is written as records arrive; their index rows
+        are committed every batch_size records, keeping each entry's
+        creation and last access times, and the cache is then evicted back
+        under its size limit, so a pack larger than the cache never fills
+        the disk and its least recently used entries go first.
+
+        Returns:
+            dict: {'imported': n, 'skipped': n, 'corrupt': n}
+        """
+        result = {'imported': 0, 'skipped': 0, 'corrupt': 0}
+        rows = []
+
+        def commit_rows():
+            if not rows:
+                return
+            with self._lock:
+                self.index.put_many(rows)
+                self.index.commit()
+            rows.clear()
+            self._enforce_size_limit(0)
+
+        try:
+            for record in PackReader(fileobj):
+                if not record.valid:
+                    result['corrupt'] += 1
+                    continue
+
+                with self._lock:
+                    present = record.key in self.index
+                if present:
+                    result['skipped'] += 1
+                    continue
+
+                with self._key_lock(record.key):
+                    location = self._write_audio(record.key, record.value['audio'])
+                rows.append((
+                    record.key,
+                    self._entry_metadata(
+                        record.value, record.created_at, location, record.last_accessed
+                    )
+                ))
+                result['imported'] += 1
+
+                if len(rows) >= batch_size:
+                    commit_rows()
+        finally:
+            # Entries that passed their own checksum are kept even if the
+            # stream turns out to be truncated
+            commit_rows()
+
+        return result
+
+    def list_entries(self):
+        """List (key, metadata) pairs of all entries"""
+        with self._lock:
+            return self.index.items()
+
+    def query_entries(self, search=None, sort='last_accessed', descending=True, offset=0, limit=20):
+        """One page of (key, metadata) pairs for browsing, from the index only
+
+        Args:
+            search: Case-insensitive substring of the entries' text preview
+            sort: 'last_accessed', 'created_at' or 'size'
+            offset: Matching entries to skip
+            limit: Page size
+
+        Returns:
+            tuple: (number of matching entries, list of (key, metadata))
+        """
+        with self._lock:
+            return self.index.query(search, sort, descending, offset, limit)
+
+    def voices(self):
+        """Distinct voices of the cached entries"""
+        with self._lock:
+            return self.index.voices()
+
+    def delete_matching(self, voice=None, created_before=None, created_after=None,
+                        min_size=None, search=None, keep=None, dry_run=False):
+        """Delete every entry matching all the given filters, with a single index commit
+
+        Only this host's entries are deleted (a shared remote backend is
+        kept, as in clear()).
+
+        Args:
+            voice: Generated with this voice
+            created_before: Created before this datetime
+            created_after: Created at or after this datetime
+            min_size: At least this many bytes
+            search: Case-insensitive substring of the text preview
+            keep: Keys never deleted (e.g. those of saved playlists); an
+                empty set still applies, None means no such filter
+            dry_run: Only count what would be deleted
+
+        Returns:
+            dict: {'entries', 'bytes'} deleted (or that would be)
+        """
+        with self._lock:
+            matches = self.index.matching(
+                voice=voice, created_before=created_before, created_after=created_after,
+                min_size=min_size, search=search
+            )
+        if keep is not None:
+            matches = [(key, size) for key, size in matches if key not in keep]
+
+        if not dry_run:
+            self._remove_entries([key for key, _ in matches])
+        return {'entries': len(matches), 'bytes': sum(size for _, size in matches)}
+
+    def freshness_counts(self):
+        """Number of 'fresh' and 'stale' entries (expired ones count as stale until removed)"""
+        cutoff = datetime.now() - timedelta(days=self.ttl_days)
+        with self._lock:
+            total = len(self.index)
+            stale = self.index.count_created_before(cutoff)
+        return {'fresh': total - stale, 'stale': stale}
 
     def get_stats(self):
         """Get cache statistics"""
-        total_size = sum(meta['size'] for meta in self.index.values())
+        with self._lock:
+            total_size = self.index.total_size()
+            items = len(self.index)
+            stats = dict(self.stats)
 
         return {
-            'items': len(self.index),
+            'items': items,
             'size_mb': total_size / (1024 * 1024),
             'max_size_mb': self.max_size_mb,
             'usage_percent': (total_size / (self.max_size_mb * 1024 * 1024)) * 100 if self.max_size_mb > 0 else 0,
-            'cache_hits': self.stats['cache_hits'],
-            'cache_misses': self.stats['cache_misses'],
-            'total_requests': self.stats['total_requests']
+            'cache_hits': stats['cache_hits'],
+            'cache_misses': stats['cache_misses'],
+            'total_requests': stats['total_requests'],
+            'l1_hits': stats['l1_hits'],
+            'l2_hits': stats['l2_hits'],
+            'remote_hits': stats['remote_hits'],
+            'legacy_hits': stats['legacy_hits'],
+            'stale_hits': stats['stale_hits'],
+            'ttl_days': self.ttl_days,
+            'hard_ttl_days': self.hard_ttl_days,
+            'eviction_policy': self.policy.name,
+            'rejected': stats.get('rejected', 0),
+            'tenant_quota_mb': self.tenant_quota_mb,
+            'quota_evictions': stats.get('quota_evictions', 0),
+            'tenants': self.tenant_stats(),
+            'remote': self.remote.get_stats() if self.remote is not None else None,
+            'storage': self.storage,
+            'segments': self.segments.get_stats(),
+            'l1_items': len(self.l1),
+            'l1_size_mb': self.l1.size / (1024 * 1024),
+            'l1_max_mb': self.l1.max_bytes / (1024 * 1024),
+            'metrics': metrics_summary(stats)
         }
 
     def clear(self):
-        """Clear all cache"""
-        for key in list(self.index.keys()):
-            self.delete(key)
+        """Clear all cache on this host (a shared remote backend is kept)"""
+        with self._lock:
+            keys = self.index.keys()
+        self._remove_entries(keys)
+
+
+def get_cache_manager(cache_dir='data/cache', remote_url=None, **kwargs):
+    """Get the process-wide CacheManager for cache_dir
+
+    Streamlit runs each session on its own thread; they all share one
+    manager (and its index connection) per cache directory. remote_url
+    (redis://host:port/db) puts a shared RespBackend behind the local disk
+    cache. Arguments only apply when the manager is first created.
+    """
+    path = str(Path(cache_dir).resolve())
+    with _shared_managers_lock:
+        manager = _shared_managers.get(path)
+        if manager is None:
+            if remote_url:
+                # Shared records outlive the soft TTL, so hosts without a
+                # local copy can still serve (and regenerate) stale entries
+                ttl_days = kwargs.get('ttl_days', 30)
+                kwargs['remote'] = RespBackend.from_url(
+                    remote_url, ttl_days=kwargs.get('hard_ttl_days') or ttl_days * 3
+                )
+            manager = _shared_managers[path] = CacheManager(cache_dir=cache_dir, **kwargs)
+        return manager
@@ -0,0 +1,80 @@
+"""
+Low-overhead cache telemetry: latency histograms and byte counters
+Counters live in the cache's persistent stats dict, so they are written
+behind with the rest of the stats and survive restarts
+"""
+
+# Log2 buckets in microseconds: bucket b counts latencies below 2**b us
+# (bucket 0 is < 1 us, the last bucket also takes everything slower)
+LATENCY_BUCKETS = 24
+
+# Operations with a latency histogram
+OPERATIONS = ('get', 'set', 'delete', 'evict', 'index_save', 'index_load', 'disk_read')
+
+
+def record_latency(stats, op, seconds):
+    """Add one latency sample for op to the stats counters
+
+    Callers hold the lock that guards stats.
+    """
+    micros = int(seconds * 1_000_000)
+    bucket = min(micros.bit_length(), LATENCY_BUCKETS - 1)
+    name = f"lat.{op}.{bucket:02d}"
+    stats[name] = stats.get(name, 0) + 1
+    stats[f"lat.{op}.count"] = stats.get(f"lat.{op}.count", 0) + 1
+    stats[f"lat.{op}.total_us"] = stats.get(f"lat.{op}.total_us", 0) + micros
+
+
+def add_counter(stats, name, value=1):
+    """Increment a plain counter (bytes_read, bytes_written, evictions)"""
+    stats[name] = stats.get(name, 0) + value
+
+
+def _bucket_upper_ms(bucket):
+    return (2 ** bucket) / 1000
+
+
+def latency_summary(stats, op):
+    """Summarize one operation's histogram
+
+    Percentiles are reported as the upper bound of the bucket they fall in.
+
+    Returns:
+        dict: count, mean_ms, p50_ms, p95_ms, p99_ms and non-empty buckets
+            as (upper_bound_ms, count) pairs
+    """
+    count = stats.get(f"lat.{op}.count", 0)
+    buckets = [stats.get(f"lat.{op}.{b:02d}", 0) for b in range(LATENCY_BUCKETS)]
+
+    def percentile(fraction):
+        if not count:
+            return 0.0
+        threshold = fraction * count
+        seen = 0
+        for bucket, bucket_count in enumerate(buckets):
+            seen += bucket_count
+            if seen >= threshold:
+                return _bucket_upper_ms(bucket)
+        return _bucket_upper_ms(LATENCY_BUCKETS - 1)
+
+    return {
+        'count': count,
+        'mean_ms': (stats.get(f"lat.{op}.total_us", 0) / count / 1000) if count else 0.0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'buckets': [
+            (_bucket_upper_ms(bucket), bucket_count)
+            for bucket, bucket_count in enumerate(buckets) if bucket_count
+        ]
+    }
+
+
+def metrics_summary(stats):
+    """Latency summaries for all operations plus byte/eviction counters"""
+    return {
+        'latency': {op: latency_summary(stats, op) for op in OPERATIONS},
+        'bytes_read': stats.get('bytes_read', 0),
+        'bytes_written': stats.get('bytes_written', 0),
+        'evictions': stats.get('evictions', 0)
+    }
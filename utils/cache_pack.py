@@ -0,0 +1,154 @@
+"""
+Portable cache pack format for seeding a new node's audio cache
+A single streamable, checksummed file of cache entries
+
+Layout:
+    MAGIC
+    per entry: >I header length, JSON header, audio bytes
+    >I 0, JSON footer {'count', 'digest'}
+
+Each header carries the entry's metadata (including when it was last
+accessed, so an imported cache keeps its recency order) and the SHA-256
+of its audio.
+The footer digest is the SHA-256 over all per-entry digests, so a
+truncated or reordered pack is detected at the end of the stream.
+Remote backends store each entry as one such record (encode_entry).
+"""
+import hashlib
+import json
+import struct
+from datetime import datetime
+
+MAGIC = b'TTSCACHEPACK1\n'
+_LENGTH = struct.Struct('>I')
+
+
+class PackError(Exception):
+    """Malformed or truncated cache pack"""
+
+
+def _entry_header(key, audio, value, created_at, last_accessed=None):
+    """JSON header of one record, and the audio's SHA-256"""
+    checksum = hashlib.sha256(audio).hexdigest()
+    header = json.dumps({
+        'key': key,
+        'size': len(audio),
+        'sha256': checksum,
+        'created_at': created_at.timestamp(),
+        'last_accessed': last_accessed.timestamp() if last_accessed else None,
+        'duration': value.get('duration'),
+        'voice': value.get('voice', ''),
+        'text_preview': value.get('text_preview', ''),
+        'chars': value.get('chars')
+    }).encode()
+    return header, checksum
+
+
+def encode_entry(key, value, created_at):
+    """One record as a standalone blob (used by remote backends)"""
+    audio = bytes(value['audio'])
+    header, _ = _entry_header(key, audio, value, created_at)
+    return _LENGTH.pack(len(header)) + header + audio
+
+
+def decode_entry(data):
+    """Parse a blob from encode_entry into a PackRecord"""
+    if len(data) < _LENGTH.size:
+        raise PackError("Truncated cache entry")
+    (header_length,) = _LENGTH.unpack_from(data)
+    end = _LENGTH.size + header_length
+    header = json.loads(data[_LENGTH.size:end])
+    audio = bytes(data[end:])
+    if len(audio) != header['size']:
+        raise PackError("Truncated cache entry")
+    return PackRecord(header, audio)
+
+
+class PackWriter:
+    """Write entries to a binary file object, one at a time"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.count = 0
+        self._digest = hashlib.sha256()
+        fileobj.write(MAGIC)
+
+    def write(self, key, value, created_at, last_accessed=None):
+        """Append one entry (value: dict with 'audio' and metadata)"""
+        audio = bytes(value['audio'])
+        header, checksum = _entry_header(key, audio, value, created_at, last_accessed)
+
+        self.fileobj.write(_LENGTH.pack(len(header)))
+        self.fileobj.write(header)
+        self.fileobj.write(audio)
+        self._digest.update(checksum.encode())
+        self.count += 1
+
+    def close(self):
+        """Write the footer (the file object is left open)"""
+        footer = json.dumps({'count': self.count, 'digest': self._digest.hexdigest()}).encode()
+        self.fileobj.write(_LENGTH.pack(0))
+        self.fileobj.write(_LENGTH.pack(len(footer)))
+        self.fileobj.write(footer)
+        self.fileobj.flush()
+
+
+class PackRecord:
+    """One entry read from a pack"""
+
+    def __init__(self, header, audio):
+        self.key = header['key']
+        self.created_at = datetime.fromtimestamp(header['created_at'])
+        # Absent from records written before it was added
+        last_accessed = header.get('last_accessed')
+        self.last_accessed = datetime.fromtimestamp(last_accessed) if last_accessed else None
+        self.valid = hashlib.sha256(audio).hexdigest() == header['sha256']
+        self.value = {
+            'audio': audio,
+            'duration': header.get('duration'),
+            'voice': header.get('voice', ''),
+            'text_preview': header.get('text_preview', ''),
+            'chars': header.get('chars')
+        }
+
+
+class PackReader:
+    """Iterate a pack's records from a binary file object, streaming
+
+    Raises PackError on a bad magic, a truncated stream or a footer that
+    doesn't match the records read.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        if self._read_exact(len(MAGIC)) != MAGIC:
+            raise PackError("Not a cache pack")
+
+    def _read_exact(self, size):
+        data = self.fileobj.read(size)
+        while len(data) < size:
+            chunk = self.fileobj.read(size - len(data))
+            if not chunk:
+                raise PackError("Truncated cache pack")
+            data += chunk
+        return data
+
+    def __iter__(self):
+        digest = hashlib.sha256()
+        count = 0
+
+        while True:
+            (header_length,) = _LENGTH.unpack(self._read_exact(_LENGTH.size))
+            if header_length == 0:
+                break
+
+            header = json.loads(self._read_exact(header_length))
+            audio = self._read_exact(header['size'])
+            digest.update(header['sha256'].encode())
+            count += 1
+            yield PackRecord(header, audio)
+
+        (footer_length,) = _LENGTH.unpack(self._read_exact(_LENGTH.size))
+        footer = json.loads(self._read_exact(footer_length))
+        if footer['count'] != count or footer['digest'] != digest.hexdigest():
+            raise PackError("Cache pack checksum mismatch")
@@ -0,0 +1,155 @@
+"""
+Eviction policies for CacheManager
+Decide which entries make room for new ones, and whether a new entry is worth it
+"""
+import re
+
+# Google Cloud TTS list prices, USD per million characters, by voice tier
+VOICE_TIER_PRICES = {
+    'Standard': 4,
+    'Wavenet': 16,
+    'Neural2': 16,
+    'News': 16,
+    'Polyglot': 16,
+    'Journey': 30,
+    'Chirp': 30,
+    'Studio': 160
+}
+
+# Typical MP3 output: ~15 characters of speech per second at 32 kbit/s
+CHARS_PER_KB = 3.75
+
+
+def voice_tier(voice):
+    """Pricing tier of a voice name, e.g. 'en-US-Neural2-F' -> 'Neural2'"""
+    for tier in VOICE_TIER_PRICES:
+        if re.search(rf'-{tier}', voice or '', re.IGNORECASE):
+            return tier
+    return 'Standard'
+
+
+def synthesis_cost(value):
+    """Estimated USD cost of regenerating an entry
+
+    Uses the billed character count when the entry has one, else the
+    length of its text preview.
+    """
+    chars = value.get('chars') or len(value.get('text_preview') or '')
+    return chars * VOICE_TIER_PRICES[voice_tier(value.get('voice'))] / 1_000_000
+
+
+class EvictionPolicy:
+    """Base policy: plain LRU, every new entry admitted
+
+    The index evicts in order of last access plus each entry's weight,
+    so a policy shapes eviction by the weight it gives new entries, and
+    may turn entries away in admit().
+    """
+
+    name = 'lru'
+    # Whether admit() can refuse entries (saves looking up victims twice)
+    filters_admission = False
+
+    def record_access(self, key):
+        """Called for every lookup of key, hit or miss"""
+
+    def weight(self, value, size):
+        """Seconds of extra retention for an entry written from value"""
+        return 0
+
+    def admit(self, keys, victims):
+        """Whether to store keys if that evicts victims ((key, size) pairs)"""
+        return True
+
+
+class TinyLfuPolicy(EvictionPolicy):
+    """LRU with a TinyLFU admission filter
+
+    Lookups are counted in a small count-min sketch whose counters are
+    halved every `sample_size` increments, so frequencies follow recent
+    popularity. A new entry that would evict others is only admitted if it
+    has been requested at least as often as the most requested victim, so a
+    one-off playlist can't flush sentences that are replayed every day.
+    Ties are admitted, which lets new entries replace equally cold ones
+    (the role of W-TinyLFU's admission window).
+
+    Counts live in memory and start over when the process restarts.
+    """
+
+    name = 'tinylfu'
+    filters_admission = True
+
+    _DEPTH = 4
+    _MAX_COUNT = 15
+
+    def __init__(self, width=4096, sample_size=None):
+        self.width = width
+        self.sample_size = sample_size or 10 * width
+        self._rows = [bytearray(width) for _ in range(self._DEPTH)]
+        self._additions = 0
+
+    def _slots(self, key):
+        return [hash((row, key)) % self.width for row in range(self._DEPTH)]
+
+    def record_access(self, key):
+        for row, slot in zip(self._rows, self._slots(key)):
+            if row[slot] < self._MAX_COUNT:
+                row[slot] += 1
+
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            # Age: halve every counter
+            for row in self._rows:
+                row[:] = bytes(count >> 1 for count in row)
+            self._additions //= 2
+
+    def frequency(self, key):
+        """Estimated recent lookup count of key"""
+        return min(row[slot] for row, slot in zip(self._rows, self._slots(key)))
+
+    def admit(self, keys, victims):
+        if not victims:
+            return True
+        candidate = max(self.frequency(key) for key in keys)
+        return candidate >= max(self.frequency(key) for key, _ in victims)
+
+
+class GreedyDualSizePolicy(EvictionPolicy):
+    """Cost-aware GreedyDual-Size eviction
+
+    Each entry's priority is its last access time plus a credit
+    proportional to what it would cost to regenerate per byte it occupies
+    (characters billed times the voice tier's price, over its size). An
+    entry costing as much per KB as a typical Standard-voice sentence gets
+    `credit_seconds` of extra retention; a Neural2 sentence of the same
+    length about four times as much, a short expensive one more per byte
+    than a long cheap one. Aging comes from the clock: every access moves
+    an entry's priority forward, so idle entries are still evicted.
+    """
+
+    name = 'gds'
+
+    def __init__(self, credit_seconds=24 * 3600):
+        self.credit_seconds = credit_seconds
+        self._reference = CHARS_PER_KB * VOICE_TIER_PRICES['Standard'] / 1_000_000
+
+    def weight(self, value, size):
+        cost_per_kb = synthesis_cost(value) / max(size / 1024, 1)
+        return self.credit_seconds * cost_per_kb / self._reference
+
+
+_POLICIES = {
+    'lru': EvictionPolicy,
+    'tinylfu': TinyLfuPolicy,
+    'gds': GreedyDualSizePolicy
+}
+
+
+def make_policy(policy):
+    """Policy instance from a name ('lru', 'tinylfu', 'gds') or an instance"""
+    if isinstance(policy, EvictionPolicy):
+        return policy
+    try:
+        return _POLICIES[policy]()
+    except KeyError:
+        raise ValueError(f"Unknown eviction policy: {policy}")
@@ -0,0 +1,140 @@
+"""
+Integrity scrubber for the audio cache
+Reconciles index rows with entry files and verifies stored checksums,
+a bounded slice at a time
+"""
+import time
+
+from utils.file_lock import get_file_lock
+
+
+# Per-entry check results (see CacheManager.verify_entry)
+PROBLEMS = ('missing', 'truncated', 'corrupt')
+
+
+def _empty_report():
+    return {
+        'checked': 0,
+        'bytes': 0,
+        'missing': 0,
+        'truncated': 0,
+        'corrupt': 0,
+        'orphans': 0,
+        'repaired': 0,
+        'done': False
+    }
+
+
+class CacheScrubber:
+    """Incremental fsck for one CacheManager
+
+    Walks the index in key order from a cursor saved in the cache
+    directory, so a scan of a large cache is spread over many short runs
+    (and survives restarts). Each run stops at a time budget and reads at
+    most `bytes_per_second` of entry data, so it never saturates the disk
+    under live sessions. Orphaned files are found per shard directory once
+    the index walk reaches the end.
+
+    Runs are serialized, across threads (the janitor and on-demand checks
+    share one scrubber) and processes (e.g. the CLI), since they share the
+    cursors.
+    """
+
+    def __init__(self, manager, bytes_per_second=32 * 1024 * 1024, batch_size=100):
+        self.manager = manager
+        self.bytes_per_second = bytes_per_second
+        self.batch_size = batch_size
+
+        self.cursor_file = manager.cache_dir / '.scrub'
+        self._run_lock = get_file_lock(manager.cache_dir / '.scrub.lock')
+        self._shard_cursor = None
+
+    def _load_cursor(self):
+        try:
+            return self.cursor_file.read_text()
+        except FileNotFoundError:
+            return ''
+
+    def _save_cursor(self, key):
+        self.cursor_file.write_text(key)
+
+    def run(self, budget=None, repair=False, orphans=True, orphan_grace=3600):
+        """Check entries from the saved cursor until the budget runs out
+
+        Args:
+            budget: Seconds to spend, resuming from the saved cursor
+                (None = one full pass from the start)
+            repair: Remove broken entries and orphaned files, and store
+                checksums for entries written before they were recorded
+            orphans: Also look for files no index row points to, once the
+                index walk completes
+            orphan_grace: Files younger than this are never orphans
+
+        Returns:
+            dict: Counts of checked entries, bytes read and problems found;
+                'done' is True once a full pass has completed
+        """
+        with self._run_lock:
+            return self._run(budget, repair, orphans, orphan_grace)
+
+    def _run(self, budget, repair, orphans, orphan_grace):
+        start = time.monotonic()
+        deadline = start + budget if budget is not None else None
+        report = _empty_report()
+        if budget is None:
+            cursor = ''
+            self._shard_cursor = None
+        else:
+            cursor = self._load_cursor()
+
+        def out_of_time():
+            return deadline is not None and time.monotonic() >= deadline
+
+        while True:
+            if out_of_time():
+                return report
+            batch = self.manager.scan_entries(cursor, self.batch_size)
+            if not batch:
+                break
+
+            for key, _ in batch:
+                status, size = self.manager.verify_entry(key, repair=repair)
+                cursor = key
+                if status in PROBLEMS:
+                    report[status] += 1
+                    if repair:
+                        report['repaired'] += 1
+                if status != 'gone':
+                    report['checked'] += 1
+                report['bytes'] += size
+                self._throttle(start, report['bytes'])
+                if out_of_time():
+                    break
+
+            self._save_cursor(cursor)
+            self.manager.flush()
+
+        # Index walk finished: look for files no row points to
+        if self._shard_cursor is None:
+            self._shard_cursor = self.manager.shard_dirs() if orphans else []
+        while self._shard_cursor and not out_of_time():
+            shard = self._shard_cursor.pop()
+            found = self.manager.remove_orphans_in(shard, orphan_grace, dry_run=not repair)
+            report['orphans'] += found
+            if repair:
+                report['repaired'] += found
+
+        if not self._shard_cursor:
+            # Full pass complete; the next run starts over
+            self._shard_cursor = None
+            self._save_cursor('')
+            report['done'] = True
+        return report
+
+    def _throttle(self, start, bytes_read):
+        """Sleep as needed to keep reads under bytes_per_second"""
+        if not self.bytes_per_second:
+            return
+        ahead = bytes_read / self.bytes_per_second - (time.monotonic() - start)
+        if ahead > 0:
+            time.sleep(ahead)
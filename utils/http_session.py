@@ -0,0 +1,128 @@
+"""
+Process-wide pooled HTTP session for Google Cloud TTS requests
+Connections are kept alive and reused across requests and engines
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from utils.cache_metrics import latency_summary, record_latency
+
+# (connect, read) timeouts in seconds; synthesizing a long text can take
+# several seconds, opening a connection should not
+DEFAULT_TIMEOUT = (3.05, 30)
+
+
+def _timed_pool_classes(on_connect):
+    """urllib3 pool classes whose new connections report how long connecting took"""
+    classes = {}
+    for scheme, pool_class in (('http', HTTPConnectionPool), ('https', HTTPSConnectionPool)):
+        class TimedConnection(pool_class.ConnectionCls):
+            def connect(self):
+                # TCP connect plus, for HTTPS, the TLS handshake
+                start = time.perf_counter()
+                super().connect()
+                on_connect(time.perf_counter() - start)
+
+        classes[scheme] = type(
+            f"Timed{pool_class.__name__}", (pool_class,), {'ConnectionCls': TimedConnection}
+        )
+    return classes
+
+
+class _TimedAdapter(HTTPAdapter):
+    def __init__(self, on_connect, **kwargs):
+        # Set before HTTPAdapter.__init__, which creates the pool manager
+        self._pool_classes = _timed_pool_classes(on_connect)
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._pool_classes
+
+
+class HttpClient:
+    """requests.Session with a tuned connection pool, default timeouts and timing
+
+    Up to pool_maxsize idle connections per host are kept for reuse, which
+    should cover the threads requesting at once (concurrent Streamlit
+    sessions). Failed connection attempts are retried, since the request
+    was never sent; timeouts and error statuses are not, so the caller
+    sees them.
+    """
+
+    def __init__(self, pool_maxsize=16, timeout=DEFAULT_TIMEOUT, connect_retries=2):
+        self.timeout = timeout
+        self.stats = {'errors': 0}
+        self._lock = threading.Lock()
+
+        adapter = _TimedAdapter(
+            self._record_connect,
+            pool_connections=4,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(
+                total=connect_retries, connect=connect_retries, read=0, redirect=0,
+                status=0, backoff_factor=0.1
+            )
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        """Session.request with the default timeout, timed"""
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                record_latency(self.stats, 'request', time.perf_counter() - start)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _record_connect(self, seconds):
+        with self._lock:
+            record_latency(self.stats, 'handshake', seconds)
+
+    def get_stats(self):
+        """Request and new-connection counts with their latency summaries"""
+        with self._lock:
+            stats = dict(self.stats)
+        request = latency_summary(stats, 'request')
+        handshake = latency_summary(stats, 'handshake')
+        return {
+            'requests': request['count'],
+            'connections': handshake['count'],
+            'errors': stats['errors'],
+            'request': request,
+            'handshake': handshake
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_http_client():
+    """Get the process-wide HTTP client, creating it on first use"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
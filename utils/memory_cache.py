@@ -0,0 +1,65 @@
+"""
+Process-wide in-memory LRU tier for cached audio
+Shared by every CacheManager (and so every Streamlit session) in the server process
+"""
+import threading
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """Thread-safe LRU cache bounded by total bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get value for key (marking it most recently used), or None"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, size):
+        """Insert value, evicting least recently used entries to fit"""
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+            while self._entries and self.size + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+            self._entries[key] = (value, size)
+            self.size += size
+
+    def discard(self, key):
+        """Remove key if present"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_memory_cache(max_bytes):
+    """Get the process-wide memory tier, creating it on first use"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = MemoryCache(max_bytes)
+        return _shared_cache
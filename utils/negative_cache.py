@@ -0,0 +1,80 @@
+"""
+Process-wide negative cache for failed synthesis requests
+Remembers why a request failed, for a short time, so repeats fail fast
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A remembered failure: kind is 'permanent' or 'transient'
+Failure = namedtuple('Failure', 'kind message status_code expires_at')
+
+
+class NegativeCache:
+    """Thread-safe map of key (any hashable) -> Failure with per-entry TTLs
+
+    Bounded by entry count; the oldest failures are dropped first.
+    """
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'stored': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Unexpired Failure for key, or None"""
+        with self._lock:
+            failure = self._entries.get(key)
+            if failure is None:
+                return None
+            if failure.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self.stats['hits'] += 1
+            return failure
+
+    def put(self, key, kind, message, ttl, status_code=None):
+        """Remember that key failed, for ttl seconds"""
+        failure = Failure(kind, message, status_code, time.monotonic() + ttl)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = failure
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats['stored'] += 1
+
+    def discard(self, key):
+        """Forget key's failure if there is one"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Counters plus the unexpired failures by kind"""
+        now = time.monotonic()
+        with self._lock:
+            live = [f for f in self._entries.values() if f.expires_at > now]
+            stats = dict(self.stats)
+        stats['permanent'] = sum(f.kind == 'permanent' for f in live)
+        stats['transient'] = len(live) - stats['permanent']
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_negative_cache():
+    """Get the process-wide negative cache, creating it on first use"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = NegativeCache()
+        return _shared_cache
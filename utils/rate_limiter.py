@@ -0,0 +1,88 @@
+"""
+Token-bucket rate limiting for Google Cloud TTS requests
+Keeps concurrent synthesis under the project's request and character quotas
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Tokens refill at `rate` per second up to `capacity`
+
+    Takers may run the bucket into debt and then wait it off, so requests
+    are served in the order they asked and a large one can't starve.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """Take tokens; returns seconds to wait before they may be used"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+
+class RateLimiter:
+    """Requests per second and characters per minute, one bucket each
+
+    Bursts are limited to one second of requests and ten seconds of
+    characters.
+    """
+
+    def __init__(self, requests_per_second=10, chars_per_minute=150_000):
+        self.requests_per_second = requests_per_second
+        self.chars_per_minute = chars_per_minute
+        self.stats = {'requests': 0, 'throttled': 0, 'wait_seconds': 0.0}
+        self._requests = TokenBucket(requests_per_second, max(1, requests_per_second))
+        self._chars = TokenBucket(chars_per_minute / 60, chars_per_minute / 6)
+        self._lock = threading.Lock()
+
+    def reserve(self, chars):
+        """Reserve a request of `chars` characters; returns seconds to wait before sending it
+
+        For callers that wait without blocking (asyncio.sleep).
+        """
+        wait = max(self._requests.reserve(1), self._chars.reserve(chars))
+        with self._lock:
+            self.stats['requests'] += 1
+            if wait:
+                self.stats['throttled'] += 1
+                self.stats['wait_seconds'] += wait
+        return wait
+
+    def acquire(self, chars):
+        """Block until a request of `chars` characters may be sent"""
+        wait = self.reserve(chars)
+        if wait:
+            time.sleep(wait)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['requests_per_second'] = self.requests_per_second
+        stats['chars_per_minute'] = self.chars_per_minute
+        return stats
+
+
+_shared_limiters = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_rate_limiter(name, **kwargs):
+    """Get the process-wide limiter for name (e.g. a quota-holding tenant)
+
+    Arguments only apply when the limiter is first created.
+    """
+    with _shared_lock:
+        limiter = _shared_limiters.get(name)
+        if limiter is None:
+            limiter = _shared_limiters[name] = RateLimiter(**kwargs)
+        return limiter
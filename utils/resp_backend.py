@@ -0,0 +1,294 @@
+"""
+Shared cache backend on a Redis-protocol (RESP) server
+A minimal socket client plus a CacheBackend storing entries as cache records,
+so replicas on different hosts share each other's synthesized audio
+"""
+import socket
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from utils.cache_backend import CacheBackend
+from utils.cache_pack import PackError, decode_entry, encode_entry
+
+
+class RespError(Exception):
+    """Error reply from the server"""
+
+
+class RespClient:
+    """Minimal blocking RESP2 client with a small connection pool
+
+    Supports the plain request/reply commands the cache needs, sent one at
+    a time (execute) or pipelined (pipeline). Connections are reused across
+    threads; a connection that fails mid-command is discarded.
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None,
+                 timeout=2.0, max_connections=8):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.max_connections = max_connections
+
+        self._idle = []
+        self._idle_lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """Client for redis://[:password@]host[:port][/db]"""
+        parts = urlsplit(url)
+        if parts.scheme != 'redis':
+            raise ValueError(f"Unsupported cache URL: {url}")
+        db = parts.path.strip('/')
+        return cls(
+            host=parts.hostname or 'localhost',
+            port=parts.port or 6379,
+            db=int(db) if db else 0,
+            password=parts.password,
+            **kwargs
+        )
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile('rb'))
+        try:
+            if self.password:
+                self._roundtrip(conn, [('AUTH', self.password)])
+            if self.db:
+                self._roundtrip(conn, [('SELECT', self.db)])
+        except Exception:
+            self._close(conn)
+            raise
+        return conn
+
+    def _acquire(self):
+        with self._idle_lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn):
+        with self._idle_lock:
+            if len(self._idle) < self.max_connections:
+                self._idle.append(conn)
+                return
+        self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        sock, reader = conn
+        try:
+            reader.close()
+            sock.close()
+        except OSError:
+            pass
+
+    @staticmethod
+    def _encode(args):
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode()
+            elif isinstance(arg, int):
+                arg = str(arg).encode()
+            out.append(b'$%d\r\n' % len(arg))
+            out.append(bytes(arg))
+            out.append(b'\r\n')
+        return b''.join(out)
+
+    @staticmethod
+    def _parse_int(line, rest):
+        # A malformed number means the stream is out of sync: the
+        # connection is dropped like any other connection error
+        try:
+            return int(rest)
+        except ValueError:
+            raise ConnectionError(f"Bad reply from cache server: {line[:32]!r}") from None
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            return RespError(rest.decode())
+        if kind == b':':
+            return self._parse_int(line, rest)
+        if kind == b'$':
+            length = self._parse_int(line, rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by cache server")
+            return data[:-2]
+        if kind == b'*':
+            count = self._parse_int(line, rest)
+            if count < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(count)]
+        raise ConnectionError(f"Bad reply from cache server: {line[:32]!r}")
+
+    def _roundtrip(self, conn, commands):
+        sock, reader = conn
+        sock.sendall(b''.join(self._encode(args) for args in commands))
+        replies = [self._read_reply(reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def pipeline(self, commands):
+        """Send several commands in one round trip
+
+        Args:
+            commands: list of argument tuples, e.g. [('GET', 'a'), ('DEL', 'b')]
+
+        Returns:
+            list: One reply per command
+        """
+        if not commands:
+            return []
+        conn = self._acquire()
+        try:
+            replies = self._roundtrip(conn, commands)
+        except RespError:
+            # The connection itself is still in sync
+            self._release(conn)
+            raise
+        except Exception:
+            self._close(conn)
+            raise
+        self._release(conn)
+        return replies
+
+    def execute(self, *args):
+        """Send one command and return its reply"""
+        return self.pipeline([args])[0]
+
+    def close(self):
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+
+class RespBackend(CacheBackend):
+    """Cache entries stored on a Redis-protocol server
+
+    Each entry is one key holding a cache record (see utils.cache_pack),
+    which carries the audio's SHA-256, so a damaged value reads as a miss.
+    Values read back also carry the record's 'created_at'; a value given
+    one keeps it when stored.
+    Entries expire on the server after ttl_days. Server errors never fail
+    a request: they count as misses (or dropped writes), and the server is
+    not contacted again for retry_interval seconds.
+    """
+
+    def __init__(self, client, ttl_days=30, prefix='tts:audio:', retry_interval=30,
+                 batch_size=100):
+        self.client = client
+        self.ttl_seconds = int(ttl_days * 24 * 3600)
+        self.prefix = prefix
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+
+        self.stats = {'hits': 0, 'misses': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+        self._retry_at = 0
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(RespClient.from_url(url), **kwargs)
+
+    def _available(self):
+        return time.monotonic() >= self._retry_at
+
+    def _failed(self, error):
+        print(f"Remote cache error: {error}")
+        self._retry_at = time.monotonic() + self.retry_interval
+        with self._stats_lock:
+            self.stats['errors'] += 1
+
+    def _count(self, hits, misses):
+        with self._stats_lock:
+            self.stats['hits'] += hits
+            self.stats['misses'] += misses
+
+    def _decode(self, key, data):
+        if data is None:
+            return None
+        try:
+            record = decode_entry(data)
+        except (PackError, ValueError, KeyError):
+            return None
+        if not record.valid or record.key != key:
+            return None
+        return dict(record.value, created_at=record.created_at)
+
+    def get(self, key, track_stats=True):
+        return self.get_many([key], track_stats=track_stats)[key]
+
+    def get_many(self, keys, track_stats=True):
+        keys = list(dict.fromkeys(keys))
+        results = dict.fromkeys(keys)
+        if not keys or not self._available():
+            return results
+
+        try:
+            for i in range(0, len(keys), self.batch_size):
+                chunk = keys[i:i + self.batch_size]
+                values = self.client.execute('MGET', *[self.prefix + key for key in chunk])
+                for key, data in zip(chunk, values):
+                    results[key] = self._decode(key, data)
+        except (OSError, RespError) as e:
+            self._failed(e)
+
+        if track_stats:
+            hits = sum(value is not None for value in results.values())
+            self._count(hits, len(results) - hits)
+        return results
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        if not self._available():
+            return
+        now = datetime.now()
+        commands = [
+            ('SET', self.prefix + key, encode_entry(key, value, value.get('created_at') or now),
+             'EX', self.ttl_seconds)
+            for key, value in dict(items).items()
+        ]
+        try:
+            for i in range(0, len(commands), self.batch_size):
+                self.client.pipeline(commands[i:i + self.batch_size])
+        except (OSError, RespError) as e:
+            self._failed(e)
+
+    def delete(self, key):
+        if not self._available():
+            return
+        try:
+            self.client.execute('DEL', self.prefix + key)
+        except (OSError, RespError) as e:
+            self._failed(e)
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['url'] = f"redis://{self.client.host}:{self.client.port}/{self.client.db}"
+        stats['available'] = self._available()
+        return stats
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,86 @@
+"""
+Background regeneration of stale cache entries
+Stale entries are served right away and refreshed here, one at a time
+"""
+import queue
+import threading
+
+
+class Revalidator:
+    """Single worker thread running refresh jobs, at most one per key
+
+    Jobs are plain callables (e.g. synthesize and cache.set). The queue is
+    bounded: past max_pending, new jobs are dropped and the entry simply
+    stays stale until it is requested again.
+    """
+
+    def __init__(self, max_pending=500):
+        self.max_pending = max_pending
+        self.stats = {'queued': 0, 'refreshed': 0, 'failed': 0, 'dropped': 0}
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, key, job):
+        """Queue job to refresh key, unless one is already pending
+
+        Returns:
+            bool: Whether the job was queued
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.stats['dropped'] += 1
+                return False
+            self._pending.add(key)
+            self.stats['queued'] += 1
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+        self._queue.put((key, job))
+        return True
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def _run(self):
+        while True:
+            key, job = self._queue.get()
+            try:
+                job()
+                outcome = 'refreshed'
+            except Exception as e:
+                print(f"Cache refresh error: {e}")
+                outcome = 'failed'
+            with self._lock:
+                self._pending.discard(key)
+                self.stats[outcome] += 1
+            self._queue.task_done()
+
+    def join(self):
+        """Wait until every queued job has run"""
+        self._queue.join()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending)
+        return stats
+
+
+_shared_revalidator = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_revalidator():
+    """Get the process-wide revalidator, creating it on first use"""
+    global _shared_revalidator
+    with _shared_lock:
+        if _shared_revalidator is None:
+            _shared_revalidator = Revalidator()
+        return _shared_revalidator
@@ -0,0 +1,288 @@
+"""
+Log-structured segment storage for cached audio
+Entries are appended to large segment files and read back through mmap
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+
+# Record header: magic, key length, audio length, CRC-32 of the audio;
+# followed by the key (UTF-8) and the audio
+_HEADER = struct.Struct('>4sHII')
+_MAGIC = b'TSR1'
+
+SEGMENT_SUFFIX = '.seg'
+
+
+class SegmentError(Exception):
+    """A segment record is damaged or isn't the one its index row expects"""
+
+
+class SegmentStore:
+    """Append-only segment files holding audio records
+
+    Each store (one per CacheManager) appends to its own active segment,
+    so processes sharing a cache directory never write to the same file.
+    A new segment is started once the active one reaches segment_size or
+    has been idle for idle_seal seconds; segments are never written again
+    after that. Where a record lives ({'segment', 'offset'}) is kept by
+    the caller in the entry's index row.
+
+    Records of removed or replaced entries stay in their segment until
+    CacheManager.compact_segments copies the segment's live records
+    forward and retires it. Retired segments are deleted retire_delay
+    seconds later, so a read that looked up the old location still finds
+    the file.
+    """
+
+    def __init__(self, directory, segment_size=16 * 1024 * 1024, idle_seal=600, retire_delay=60):
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.idle_seal = idle_seal
+        self.retire_delay = retire_delay
+
+        # Active segment: name, unbuffered append handle, size, last write
+        self._active = None
+        self._active_file = None
+        self._active_size = 0
+        self._last_write = 0
+        self._write_lock = threading.Lock()
+
+        # Read-only maps by segment name; replaced (never closed) when a
+        # segment has grown, since zero-copy reads may still reference them
+        self._maps = {}
+        self._maps_lock = threading.Lock()
+
+        # Segment name -> time.monotonic() it was retired
+        self._retired = {}
+
+    def _path(self, name):
+        return self.directory / name
+
+    def _start_segment(self):
+        """Close the active segment and open a new, empty one"""
+        self._close_active()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Names sort by creation time and are unique across processes
+        name = f"{time.time_ns():016x}-{os.getpid()}-{os.urandom(3).hex()}{SEGMENT_SUFFIX}"
+        self._active_file = open(self._path(name), 'xb', buffering=0)
+        self._active = name
+        self._active_size = 0
+
+    def _close_active(self):
+        if self._active_file is not None:
+            self._active_file.close()
+        self._active = None
+        self._active_file = None
+
+    def seal(self):
+        """Stop appending to the active segment; the next write starts a new one"""
+        with self._write_lock:
+            self._close_active()
+
+    @staticmethod
+    def _record(key, audio):
+        key_bytes = key.encode()
+        return b''.join((
+            _HEADER.pack(_MAGIC, len(key_bytes), len(audio), zlib.crc32(audio)),
+            key_bytes,
+            audio
+        ))
+
+    def append(self, key, audio):
+        """Append one record; returns its location {'segment', 'offset'}"""
+        return self.append_many([(key, audio)])[0]
+
+    def append_many(self, items):
+        """Append (key, audio) records, one write per segment touched
+
+        Returns:
+            list: Location dicts, in the order of items
+        """
+        locations = []
+        with self._write_lock:
+            if self._active is not None and time.monotonic() - self._last_write > self.idle_seal:
+                self._close_active()
+            try:
+                pending = []
+                for key, audio in items:
+                    record = self._record(key, audio)
+                    if self._active is None or (
+                            self._active_size and self._active_size + len(record) > self.segment_size):
+                        self._write(pending)
+                        pending = []
+                        self._start_segment()
+                    locations.append({'segment': self._active, 'offset': self._active_size})
+                    pending.append(record)
+                    self._active_size += len(record)
+                self._write(pending)
+            except BaseException:
+                # Size bookkeeping may no longer match the file
+                self._close_active()
+                raise
+            self._last_write = time.monotonic()
+        return locations
+
+    def _write(self, records):
+        if records:
+            data = b''.join(records)
+            view = memoryview(data)
+            while view:
+                view = view[self._active_file.write(view):]
+
+    def _map(self, name, end):
+        """mmap of a segment covering at least `end` bytes"""
+        with self._maps_lock:
+            segment_map = self._maps.get(name)
+            if segment_map is not None and len(segment_map) >= end:
+                return segment_map
+
+            with open(self._path(name), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < end or size == 0:
+                    raise EOFError(f"Segment {name} is shorter than expected")
+                segment_map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._maps[name] = segment_map
+            return segment_map
+
+    def read_record(self, location):
+        """Read the record at a location
+
+        Returns:
+            tuple: (key, audio memoryview, stored CRC-32)
+
+        Raises:
+            FileNotFoundError: The segment is gone
+            EOFError: The segment ends inside the record
+            SegmentError: No record starts at the offset
+        """
+        name, offset = location['segment'], location['offset']
+        segment_map = self._map(name, offset + _HEADER.size)
+        magic, key_length, audio_length, crc = _HEADER.unpack_from(segment_map, offset)
+        if magic != _MAGIC:
+            raise SegmentError(f"No record at {name}:{offset}")
+
+        start = offset + _HEADER.size + key_length
+        end = start + audio_length
+        segment_map = self._map(name, end)
+        view = memoryview(segment_map)
+        key = bytes(view[offset + _HEADER.size:start]).decode()
+        return key, view[start:end], crc
+
+    def read(self, location, key, size, zero_copy=False):
+        """Audio of key's record at a location
+
+        Args:
+            zero_copy: Return an mmap-backed memoryview instead of bytes
+
+        Raises:
+            SegmentError: The record belongs to another key or has the
+                wrong size (plus the errors of read_record)
+        """
+        record_key, audio, _ = self.read_record(location)
+        if record_key != key or len(audio) != size:
+            raise SegmentError(f"Record at {location['segment']}:{location['offset']} is not {key}")
+        return audio if zero_copy else bytes(audio)
+
+    def exists(self, name):
+        return self._path(name).exists()
+
+    def records(self, name):
+        """(offset, key, audio length) of every record in a segment, in order
+
+        Stops at the first damaged or incomplete record (the tail of a
+        segment whose writer crashed).
+        """
+        try:
+            segment_map = self._map(name, self._path(name).stat().st_size)
+        except (FileNotFoundError, EOFError):
+            return
+        offset = 0
+        while offset + _HEADER.size <= len(segment_map):
+            magic, key_length, audio_length, _ = _HEADER.unpack_from(segment_map, offset)
+            end = offset + _HEADER.size + key_length + audio_length
+            if magic != _MAGIC or end > len(segment_map):
+                return
+            key = bytes(segment_map[offset + _HEADER.size:offset + _HEADER.size + key_length]).decode()
+            yield offset, key, audio_length
+            offset = end
+
+    def segments(self):
+        """(name, size, mtime) of every segment, oldest first"""
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        found = []
+        for entry in entries:
+            if not entry.name.endswith(SEGMENT_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            found.append((entry.name, stat.st_size, stat.st_mtime))
+        return sorted(found)
+
+    def sealed_segments(self, grace_seconds):
+        """(name, size) of segments no longer written to and not yet retired
+
+        A segment counts as sealed once unmodified for grace_seconds, which
+        must exceed idle_seal so other processes' active segments are
+        never included.
+        """
+        cutoff = time.time() - grace_seconds
+        with self._write_lock:
+            active = self._active
+        return [
+            (name, size) for name, size, mtime in self.segments()
+            if name != active and name not in self._retired and mtime <= cutoff
+        ]
+
+    def retire(self, name):
+        """Mark a segment as compacted; it is deleted by purge_retired"""
+        self._retired[name] = time.monotonic()
+
+    def purge_retired(self, delay=None):
+        """Delete segments retired at least `delay` seconds ago (default retire_delay)
+
+        Returns:
+            int: Bytes freed
+        """
+        delay = self.retire_delay if delay is None else delay
+        cutoff = time.monotonic() - delay
+        freed = 0
+        for name, retired_at in list(self._retired.items()):
+            if retired_at > cutoff:
+                continue
+            freed += self.remove(name)
+            self._retired.pop(name, None)
+        return freed
+
+    def remove(self, name):
+        """Delete a segment file now; returns its size (0 if already gone)"""
+        with self._maps_lock:
+            # Not closed: zero-copy reads may still hold views into it
+            self._maps.pop(name, None)
+        path = self._path(name)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            # e.g. still mapped on Windows; retried on a later pass
+            print(f"Segment removal error: {e}")
+            return 0
+        return size
+
+    def get_stats(self):
+        segments = self.segments()
+        return {
+            'segments': len(segments),
+            'size_mb': sum(size for _, size, _ in segments) / (1024 * 1024)
+        }